@@ -0,0 +1,112 @@
+# accounts/avatars.py
+"""
+Profile picture processing.
+
+Uploads are re-encoded without their EXIF block (which carries the GPS
+position of most phone photos), capped at MAX_SIZE and stored under a name
+derived from the upload's SHA-256, next to square thumbnails in
+THUMBNAIL_SIZES. The same photo uploaded twice, by one farmer or many, is
+stored once. Because a name never changes content, the media view can let
+browsers cache these files forever (see core.views.serve_media).
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+
+AVATAR_DIR = 'avatars'
+DEFAULT_AVATAR = 'default_profile.png'  # a static file, shared by every profile without a picture
+MAX_SIZE = 1024
+THUMBNAIL_SIZES = {'sm': 48, 'md': 120, 'lg': 240}
+JPEG_OPTIONS = {'quality': 82, 'optimize': True, 'progressive': True}
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+def content_name(digest, size=None):
+    suffix = f'-{size}' if size else ''
+    return f'{AVATAR_DIR}/{digest[:2]}/{digest}{suffix}.jpg'
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(f'{AVATAR_DIR}/')
+
+
+def _to_jpeg(image):
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # JPEG has no alpha; flatten transparent PNGs onto white
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    # No exif= argument, so none of the original metadata is written
+    image.save(buffer, 'JPEG', **JPEG_OPTIONS)
+    return buffer.getvalue()
+
+
+def render_variants(data):
+    """The main image and every thumbnail, as {size or None: jpeg bytes}."""
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as original:
+        original.draft('RGB', (MAX_SIZE, MAX_SIZE))
+        # Apply the EXIF orientation before the EXIF block is dropped
+        image = ImageOps.exif_transpose(original)
+    image.thumbnail((MAX_SIZE, MAX_SIZE), Image.LANCZOS)
+    variants = {None: _to_jpeg(image)}
+    for size, pixels in THUMBNAIL_SIZES.items():
+        variants[size] = _to_jpeg(ImageOps.fit(image, (pixels, pixels), Image.LANCZOS))
+    return variants
+
+
+def _save(name, data):
+    if default_storage.exists(name):
+        return
+    saved = default_storage.save(name, ContentFile(data))
+    if saved != name:
+        # Another request stored the same content first; keep its copy
+        default_storage.delete(saved)
+
+
+def store(uploaded_file):
+    """Stores an upload (and its thumbnails) once per content; returns the stored name."""
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    digest = hashlib.sha256(data).hexdigest()
+    name = content_name(digest)
+    if all(default_storage.exists(content_name(digest, size)) for size in [None, *THUMBNAIL_SIZES]):
+        return name
+    for size, variant in render_variants(data).items():
+        _save(content_name(digest, size), variant)
+    return name
+
+
+def ensure_thumbnails(name):
+    """Renders any thumbnail of a stored picture that is missing (e.g. after adding a size)."""
+    digest = os.path.splitext(os.path.basename(name))[0]
+    missing = [size for size in THUMBNAIL_SIZES if not default_storage.exists(content_name(digest, size))]
+    if not missing:
+        return []
+    with default_storage.open(name) as fh:
+        variants = render_variants(fh.read())
+    for size in missing:
+        _save(content_name(digest, size), variants[size])
+    return missing
+
+
+def avatar_url(name, size='md'):
+    """URL of a stored picture at a thumbnail size; the static default when there is none."""
+    if not name or name == DEFAULT_AVATAR:
+        return static(DEFAULT_AVATAR)
+    if is_content_addressed(name):
+        digest = os.path.splitext(os.path.basename(name))[0]
+        return default_storage.url(content_name(digest, size))
+    # Pictures uploaded before thumbnails existed (see the rebuild_avatars command)
+    return default_storage.url(name)
@@ -2,6 +2,8 @@
 from django import forms
 from phonenumber_field.formfields import PhoneNumberField
 from .models import Profile
+from . import avatars
+from core import places
 
 class PhoneForm(forms.Form):
     phone_number = PhoneNumberField(region="IN", label="Mobile Number") # Set region for placeholder
@@ -18,4 +20,24 @@ class ProfileEditForm(forms.ModelForm):
             'name': 'Full Name',
             'age': 'Age',
             'location': 'Your City or District',
-        }
\ No newline at end of file
+        }
+
+    def clean_profile_picture(self):
+        picture = self.cleaned_data.get('profile_picture')
+        if picture and getattr(picture, 'size', 0) > avatars.MAX_UPLOAD_BYTES:
+            raise forms.ValidationError("Please upload a picture smaller than 10 MB.")
+        return picture
+
+    def save(self, commit=True):
+        profile = super().save(commit=False)
+        picture = self.cleaned_data.get('profile_picture')
+        if 'profile_picture' in self.changed_data and picture:
+            # Store the resized, EXIF-free copy under its content hash instead of the raw upload
+            profile.profile_picture = avatars.store(picture)
+        if 'location' in self.changed_data:
+            # Resolved here, once, so pages and caches use the canonical place instead of the spelling;
+            # profiles left unplaced are retried by manage.py resolve_places, not on every save
+            profile.place = places.resolve(profile.location)
+        if commit:
+            profile.save()
+        return profile
\ No newline at end of file
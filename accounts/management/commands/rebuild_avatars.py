@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from accounts import avatars
+from accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = ('Moves profile pictures uploaded before thumbnails existed to content-addressed storage, '
+            'and renders missing thumbnail sizes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Delete the old full-size uploads once they have been converted.')
+
+    def handle(self, *args, **options):
+        converted = thumbnails = missing = 0
+        for profile in Profile.objects.exclude(profile_picture='').iterator():
+            name = profile.profile_picture.name
+            if name == avatars.DEFAULT_AVATAR:
+                Profile.objects.filter(pk=profile.pk).update(profile_picture='')
+                continue
+            if not default_storage.exists(name):
+                missing += 1
+                self.stderr.write(f'{profile}: {name} is missing from storage')
+                continue
+            if avatars.is_content_addressed(name):
+                thumbnails += bool(avatars.ensure_thumbnails(name))
+                continue
+            with default_storage.open(name) as fh:
+                new_name = avatars.store(fh)
+            Profile.objects.filter(pk=profile.pk).update(profile_picture=new_name)
+            if options['delete_originals'] and not Profile.objects.filter(profile_picture=name).exists():
+                default_storage.delete(name)
+            converted += 1
+        self.stdout.write(f'{converted} picture(s) converted, {thumbnails} with new thumbnails, {missing} missing')
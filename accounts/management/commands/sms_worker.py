@@ -0,0 +1,53 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import sms
+from accounts.views import get_twilio_client
+from core import metrics
+
+PURGE_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = ('Sends the SMS queued in the outbox (OTP codes) with one Twilio client, retrying failures '
+            'with backoff. Runs until stopped; several workers can share the outbox.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sms.BATCH_SIZE,
+                            help='Messages claimed per round.')
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Seconds to wait when nothing is due.')
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is due now, then exit (for cron or tests).')
+
+    def handle(self, *args, **options):
+        client = get_twilio_client()
+        if client is None:
+            raise CommandError('Twilio is not configured (TWILIO_ACCOUNT_SID / TWILIO_AUTH_TOKEN)')
+
+        stopping = []
+        if not options['once']:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *_: stopping.append(True))
+
+        totals = {}
+        last_purge = 0.0
+        try:
+            while not stopping:
+                if time.monotonic() - last_purge > PURGE_SECONDS:
+                    sms.purge()
+                    last_purge = time.monotonic()
+                results = sms.send_due(client, options['batch_size'])
+                for result, count in results.items():
+                    totals[result] = totals.get(result, 0) + count
+                metrics.flush()
+                if not results:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        finally:
+            metrics.flush(force=True)
+        summary = ', '.join(f'{count} {result}' for result, count in sorted(totals.items())) or 'nothing sent'
+        self.stdout.write(f'SMS worker stopped: {summary}')
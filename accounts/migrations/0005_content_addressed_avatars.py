@@ -0,0 +1,30 @@
+# Generated by Django 5.2.2 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+def clear_default_picture(apps, schema_editor):
+    # The default avatar is now a static file; profiles without an upload store nothing
+    Profile = apps.get_model('accounts', 'Profile')
+    Profile.objects.filter(profile_picture='default_profile.png').update(profile_picture='')
+
+
+def restore_default_picture(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    Profile.objects.filter(profile_picture='').update(profile_picture='default_profile.png')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_profile_age_profile_name_profile_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, default='', upload_to='avatars/'),
+        ),
+        migrations.RunPython(clear_default_picture, restore_default_picture),
+    ]
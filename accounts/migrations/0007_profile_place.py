@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def place_known_districts(apps, schema_editor):
+    # Locations that name a district need no geocoding; the rest are resolved when the profile is next saved
+    from core import places
+
+    Place = apps.get_model('core', 'Place')
+    PlaceName = apps.get_model('core', 'PlaceName')
+    Profile = apps.get_model('accounts', 'Profile')
+    for location in Profile.objects.exclude(location='').values_list('location', flat=True).distinct():
+        fields = places.district_fields(location)
+        if fields is None:
+            continue
+        place, _ = Place.objects.get_or_create(key=fields.pop('key'), defaults=fields)
+        PlaceName.objects.get_or_create(name=places.spelling(location), defaults={'place': place})
+        Profile.objects.filter(location=location).update(place=place)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_outbound_sms'),
+        ('core', '0003_place'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='place',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profiles', to='core.place'),
+        ),
+        migrations.RunPython(place_known_districts, migrations.RunPython.noop),
+    ]
@@ -2,22 +2,76 @@
 from django.db import models
 from django.contrib.auth.models import User
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 
+from accounts import avatars
+from core import places
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100, blank=True, default='')
     age = models.PositiveSmallIntegerField(null=True, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', default='default_profile.png', blank=True)
+    # Stored by content hash with thumbnails (accounts/avatars.py); blank means the static default
+    profile_picture = models.ImageField(upload_to='avatars/', default='', blank=True)
     phone_number = PhoneNumberField(unique=True, null=True, blank=True)
     location = models.CharField(max_length=100, blank=True)
+    # Canonical place of ``location`` (core/places.py), resolved by ProfileEditForm or resolve_places; null until resolved
+    place = models.ForeignKey('core.Place', null=True, blank=True, on_delete=models.SET_NULL, related_name='profiles')
 
     def __str__(self):
         return self.user.username
 
+    @property
+    def avatar_url(self):
+        return avatars.avatar_url(self.profile_picture.name, 'md')
+
+    @property
+    def avatar_url_2x(self):
+        return avatars.avatar_url(self.profile_picture.name, 'lg')
+
+    @property
+    def avatar_url_small(self):
+        return avatars.avatar_url(self.profile_picture.name, 'sm')
+
 # This signal automatically creates a Profile when a User is created
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
\ No newline at end of file
+        Profile.objects.create(user=instance)
+
+# Caches keyed by the profile's place (core/places.py) are dropped when it moves
+@receiver(post_init, sender=Profile)
+def remember_profile_place(sender, instance, **kwargs):
+    instance._saved_place_id = instance.__dict__.get('place_id')
+
+@receiver(post_save, sender=Profile)
+def profile_place_changed(sender, instance, created, **kwargs):
+    if not created and instance.place_id != instance._saved_place_id:
+        places.profile_moved(instance.user_id)
+    instance._saved_place_id = instance.place_id
+
+# --- SMS outbox (accounts/sms.py) ---
+class OutboundSMS(models.Model):
+    """An SMS queued by a request and sent by ``manage.py sms_worker``."""
+    PENDING = 'p'
+    SENT = 's'
+    FAILED = 'f'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    to = models.CharField(max_length=32)
+    body = models.TextField()
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a worker may next try it; a claimed message is leased until then
+    next_attempt_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    provider_id = models.CharField(max_length=64, blank=True, default='')  # Twilio message SID
+    last_error = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='sms_due_idx')]
+
+    def __str__(self):
+        return f'{self.to} {self.get_status_display()}'
@@ -0,0 +1,128 @@
+# accounts/sms.py
+"""
+Outbox for the SMS the app sends.
+
+Requests only ``enqueue()`` a message, a row in ``OutboundSMS``, and return;
+``manage.py sms_worker`` claims due messages and sends them with one reused
+Twilio client. A failed send is retried with exponential backoff until
+``MAX_ATTEMPTS``; errors Twilio won't accept on retry (a bad number) and
+OTPs that have gone stale fail at once.
+
+A claim leases a message by pushing ``next_attempt_at`` forward, so several
+workers can share the outbox and a message claimed by a worker that died is
+picked up again when the lease runs out.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import OutboundSMS
+from core import metrics
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 5
+RETRY_BASE = timedelta(seconds=2)
+RETRY_MAX = timedelta(minutes=2)
+# How long a claimed message is left to the worker that claimed it
+LEASE = timedelta(minutes=1)
+# An OTP nobody received in this long is useless; it is dropped, not sent late
+MAX_AGE = timedelta(minutes=10)
+# Sent and failed messages are deleted after this
+RETENTION = timedelta(days=1)
+
+
+def enabled():
+    return bool(settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN)
+
+
+def enqueue(to, body, now=None):
+    now = timezone.now() if now is None else now
+    return OutboundSMS.objects.create(to=str(to), body=body, next_attempt_at=now, created_at=now)
+
+
+def queue_depth():
+    return OutboundSMS.objects.filter(status=OutboundSMS.PENDING).count()
+
+
+metrics.register_gauge('agripath_sms_queue_depth', queue_depth, 'SMS waiting in the outbox.')
+
+
+def claim(limit=BATCH_SIZE, now=None):
+    """Leases up to ``limit`` due messages to this worker, oldest first."""
+    now = timezone.now() if now is None else now
+    due = (OutboundSMS.objects.filter(status=OutboundSMS.PENDING, next_attempt_at__lte=now)
+           .order_by('next_attempt_at').values_list('pk', 'next_attempt_at')[:limit])
+    claimed = []
+    for pk, due_at in list(due):
+        # Matching on the old next_attempt_at loses the race to any worker that claimed it first
+        leased = (OutboundSMS.objects.filter(pk=pk, status=OutboundSMS.PENDING, next_attempt_at=due_at)
+                  .update(next_attempt_at=now + LEASE, attempts=F('attempts') + 1))
+        if leased:
+            claimed.append(pk)
+    return list(OutboundSMS.objects.filter(pk__in=claimed).order_by('created_at'))
+
+
+def backoff(attempts):
+    return min(RETRY_BASE * 2 ** min(max(attempts - 1, 0), 16), RETRY_MAX)
+
+
+def _permanent(error):
+    # TwilioRestException carries the HTTP status; a 4xx other than 429 fails the same way again
+    status = getattr(error, 'status', None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+def _finish(message, status, error=''):
+    message.status = status
+    message.last_error = error[:255]
+    message.body = ''  # the code is not kept once it can't be used
+    message.save(update_fields=['status', 'last_error', 'body', 'sent_at', 'provider_id'])
+
+
+def deliver(client, message, now=None):
+    """Sends one claimed message; returns 'sent', 'retry', 'failed' or 'expired'."""
+    now = timezone.now() if now is None else now
+    if now - message.created_at > MAX_AGE:
+        _finish(message, OutboundSMS.FAILED, 'expired before it could be sent')
+        result = 'expired'
+    else:
+        try:
+            with metrics.upstream('twilio'):
+                sent = client.messages.create(body=message.body, from_=settings.TWILIO_PHONE_NUMBER, to=message.to)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            print(f"SMS {message.pk} to {message.to} failed (attempt {message.attempts}): {error}")
+            if _permanent(e) or message.attempts >= MAX_ATTEMPTS:
+                _finish(message, OutboundSMS.FAILED, error)
+                result = 'failed'
+            else:
+                message.next_attempt_at = timezone.now() + backoff(message.attempts)
+                message.last_error = error[:255]
+                message.save(update_fields=['next_attempt_at', 'last_error'])
+                result = 'retry'
+        else:
+            message.sent_at = timezone.now()
+            message.provider_id = str(getattr(sent, 'sid', '') or '')
+            _finish(message, OutboundSMS.SENT)
+            metrics.observe('agripath_sms_delivery_seconds', (message.sent_at - message.created_at).total_seconds())
+            result = 'sent'
+    metrics.incr('agripath_sms_total', result=result)
+    return result
+
+
+def send_due(client, limit=BATCH_SIZE):
+    """Claims and sends one batch; returns the count of each result."""
+    results = {}
+    for message in claim(limit):
+        result = deliver(client, message)
+        results[result] = results.get(result, 0) + 1
+    return results
+
+
+def purge(now=None):
+    """Deletes finished messages older than RETENTION; returns how many."""
+    now = timezone.now() if now is None else now
+    finished = OutboundSMS.objects.exclude(status=OutboundSMS.PENDING).filter(created_at__lt=now - RETENTION)
+    return finished.delete()[0]
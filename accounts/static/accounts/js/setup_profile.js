@@ -0,0 +1,67 @@
+document.addEventListener('DOMContentLoaded', () => {
+    const detectButton = document.getElementById('detect-location-btn');
+    const locationStatus = document.getElementById('location-status');
+    const locationInput = document.querySelector('input[name="location"]');
+
+    detectButton.addEventListener('click', () => {
+        if (!navigator.geolocation) {
+            locationStatus.textContent = 'Geolocation is not supported by your browser.';
+            return;
+        }
+
+        locationStatus.textContent = 'Detecting your location... Please allow permission.';
+
+        navigator.geolocation.getCurrentPosition(handleSuccess, handleError);
+    });
+
+    async function handleSuccess(position) {
+        const latitude = position.coords.latitude;
+        const longitude = position.coords.longitude;
+
+        locationStatus.textContent = 'Coordinates found. Fetching address...';
+
+        // Use OpenStreetMap's free Nominatim API for reverse geocoding
+        const apiUrl = `https://nominatim.openstreetmap.org/reverse?format=json&lat=${latitude}&lon=${longitude}`;
+
+        try {
+            const response = await fetch(apiUrl);
+            const data = await response.json();
+
+            if (data && data.address) {
+                // Try to find the location name from the most specific to least specific
+                const locationName = data.address.city || data.address.town || data.address.village || data.address.state_district || data.address.county || data.address.state;
+
+                if (locationName) {
+                    locationInput.value = locationName;
+                    locationStatus.textContent = `Location found: ${locationName}`;
+                } else {
+                    locationStatus.textContent = 'Could not determine city name. Please enter manually.';
+                }
+            } else {
+                locationStatus.textContent = 'Could not fetch address details. Please enter manually.';
+            }
+        } catch (error) {
+            console.error('Reverse geocoding error:', error);
+            locationStatus.textContent = 'Failed to fetch address. Please enter manually.';
+        }
+    }
+
+    function handleError(error) {
+        let message = '';
+        switch(error.code) {
+            case error.PERMISSION_DENIED:
+                message = "You denied the request for Geolocation.";
+                break;
+            case error.POSITION_UNAVAILABLE:
+                message = "Location information is unavailable.";
+                break;
+            case error.TIMEOUT:
+                message = "The request to get user location timed out.";
+                break;
+            case error.UNKNOWN_ERROR:
+                message = "An unknown error occurred.";
+                break;
+        }
+        locationStatus.textContent = message + ' Please enter your location manually.';
+    }
+});
@@ -4,15 +4,22 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
-from twilio.rest import Client
 from django.conf import settings
 from .forms import PhoneForm, OTPForm, ProfileEditForm # <-- Ensure this import is correct
 from .models import Profile
+from . import sms
 
 # --- Twilio Client Initialization ---
 def get_twilio_client():
     if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
-        return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        # Imported here: only manage.py sms_worker sends SMS
+        from twilio.rest import Client
+        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        base_url = getattr(settings, 'TWILIO_API_BASE_URL', None)
+        if base_url:
+            # Point the Messages API at another host, e.g. the local fake server used in load tests
+            client.api.base_url = base_url
+        return client
     return None
 
 # --- Main Login Flow ---
@@ -29,18 +36,9 @@ def request_otp(request):
             request.session['otp'] = otp
             print(f"Generated OTP for {phone_number}: {otp}") # For debugging
 
-            # Send OTP via Twilio
-            client = get_twilio_client()
-            if client:
-                try:
-                    client.messages.create(
-                        body=f'Your AgriPath verification code is: {otp}',
-                        from_=settings.TWILIO_PHONE_NUMBER,
-                        to=str(phone_number)
-                    )
-                except Exception as e:
-                    print(f"Twilio Error: {e}")
-                    # Handle SMS sending failure (e.g., show an error message)
+            # Queued for manage.py sms_worker: the request doesn't wait on Twilio
+            if sms.enabled():
+                sms.enqueue(phone_number, f'Your AgriPath verification code is: {otp}')
 
             return redirect('verify_otp')
     else:
@@ -96,7 +94,7 @@ def setup_profile(request):
         form = ProfileEditForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
             form.save()
-            return redirect('index') 
+            return redirect('ai')
     else:
         # Pass the full form for the user to complete all details
         form = ProfileEditForm(instance=profile)
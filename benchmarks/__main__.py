@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Benchmark runner for the crop model and the request pipelines.
+
+    python -m benchmarks                              # run everything
+    python -m benchmarks --filter e2e --iterations 100
+    python -m benchmarks --output new.json --baseline old.json
+
+Results (p50/p95/p99 latency, allocations, queries per call) are written as
+JSON. With --baseline the run is compared against an earlier result file and
+exits non-zero if any benchmark's p95 regressed by more than --threshold.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--baseline', help='earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative p95 regression')
+    args = parser.parse_args(argv)
+
+    # The stubs replace every upstream, so placeholder keys are enough to import the settings
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mypage.settings')
+    for key in ('GEMINI_API_KEY', 'OPENWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+        os.environ.setdefault(key, 'benchmark')
+    # One client replays the same request back to back; the per-user token bucket would shed it
+    os.environ.setdefault('ADMISSION_ENABLED', '0')
+    # Start from empty caches rather than whatever ./cache holds
+    os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='agripath-bench-cache-'))
+
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from benchmarks import suite
+    from benchmarks.stats import compare, measure
+    from benchmarks.stubs import upstream_stubs
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    results = {}
+    try:
+        with upstream_stubs():
+            benchmarks = suite.micro_benchmarks() + suite.end_to_end_benchmarks()
+            for name, fn, setup in benchmarks:
+                if args.filter not in name:
+                    continue
+                result = measure(fn, iterations=args.iterations, setup=setup)
+                results[name] = result
+                print(f"{name:40s} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+                      f"p99 {result['p99_ms']:9.2f} ms  queries {result['queries_per_call']:5.1f}  "
+                      f"peak {result['peak_alloc_kib']:8.1f} KiB")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    payload = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(payload, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)['results']
+        rows, regressions = compare(results, baseline, threshold=args.threshold)
+        print(f"\nComparison with {args.baseline} (p95):")
+        for name, old, new, change in rows:
+            change_str = 'n/a' if change is None else f'{change * 100:+.1f}%'
+            print(f"  {name:40s} {old!s:>10} -> {new!s:>10}  {change_str}")
+        if regressions:
+            print(f"\nRegressed by more than {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# benchmarks/cache.py
+"""
+Hit ratio and lookup latency of the cache backends across worker processes.
+
+Several processes (like gunicorn workers) request keys drawn from a skewed
+popularity curve: a few pages and answers are most of the traffic. A miss
+costs a simulated render (``--render-ms``) and stores the value. For each
+backend a fresh cache file is used:
+
+- locmem: Django's LocMemCache, one per process (the previous setting);
+- sqlite: the shared SQLite file alone (TwoTierCache with L1 off);
+- two-tier: TwoTierCache, a per-process LRU in front of the SQLite file.
+
+Reported per backend: hit ratio and renders summed over the processes,
+requests per second and p50/p95 lookup latency (renders excluded).
+
+    python -m benchmarks.cache --processes 4 --requests 5000 --keys 2000 --output cache.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', {'MAX_ENTRIES': 5000}),
+    'sqlite': ('core.tiered_cache.TwoTierCache', {'MAX_ENTRIES': 5000, 'L1_TIMEOUT': 0}),
+    'two-tier': ('core.tiered_cache.TwoTierCache', {'MAX_ENTRIES': 5000, 'L1_MAX_ENTRIES': 500, 'L1_TIMEOUT': 5.0}),
+}
+RESULT_MARKER = 'CACHE_BENCH '
+
+
+def child(backend, location, requests, keys, skew, value_bytes, render_ms, seed, start_at):
+    """Runs in each worker process: ``requests`` lookups, rendering and storing on a miss."""
+    import django
+    django.setup()
+    from django.utils.module_loading import import_string
+
+    path, options = BACKENDS[backend]
+    cache = import_string(path)(location, {'TIMEOUT': 600, 'OPTIONS': options})
+    rng = random.Random(seed)
+    value = b'x' * value_bytes
+    latencies, hits = [], 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    started_at = time.perf_counter()
+    for _ in range(requests):
+        key = f'page:{int(keys * rng.random() ** skew)}'
+        started = time.perf_counter()
+        found = cache.get(key)
+        latencies.append(time.perf_counter() - started)
+        if found is None:
+            time.sleep(render_ms / 1000)
+            cache.set(key, value)
+        else:
+            hits += 1
+    elapsed = time.perf_counter() - started_at
+    sys.stdout.write(RESULT_MARKER + json.dumps({'latencies': latencies, 'hits': hits, 'elapsed': elapsed}) + '\n')
+
+
+def run_backend(backend, args):
+    from benchmarks.stats import summarize
+
+    with tempfile.TemporaryDirectory(prefix='agripath-cache-') as directory:
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='mypage.settings', CACHE_DIR=directory)
+        for key in ('GEMINI_API_KEY', 'OPENWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN',
+                    'TWILIO_PHONE_NUMBER'):
+            env.setdefault(key, 'benchmark')
+        location = os.path.join(directory, 'bench.sqlite3')
+        start_at = time.time() + 2.0  # every process has set Django up by then
+        running = []
+        for seed in range(args.processes):
+            code = (f'from benchmarks import cache; cache.child({backend!r}, {location!r}, {args.requests}, '
+                    f'{args.keys}, {args.skew}, {args.value_bytes}, {args.render_ms}, {seed}, {start_at})')
+            running.append(subprocess.Popen([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE, text=True))
+        latencies, hits, elapsed = [], 0, 0.0
+        for process in running:
+            out, _ = process.communicate(timeout=600)
+            for line in out.splitlines():
+                if line.startswith(RESULT_MARKER):
+                    result = json.loads(line[len(RESULT_MARKER):])
+                    latencies.extend(result['latencies'])
+                    hits += result['hits']
+                    elapsed = max(elapsed, result['elapsed'])
+
+    lookups = summarize(latencies)
+    return {
+        'requests': len(latencies),
+        'hit_ratio': round(hits / len(latencies), 3) if latencies else None,
+        'renders': len(latencies) - hits,
+        'requests_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'get_p50_ms': lookups['p50_ms'],
+        'get_p95_ms': lookups['p95_ms'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='comma-separated subset of ' + ', '.join(BACKENDS))
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=5000, help='lookups per process')
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument('--skew', type=float, default=3.0, help='higher: more of the traffic on fewer keys')
+    parser.add_argument('--value-bytes', type=int, default=20000)
+    parser.add_argument('--render-ms', type=float, default=2.0)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for backend in args.backends.split(','):
+        print(f'running {backend} ...', flush=True)
+        results[backend] = run_backend(backend, args)
+
+    print(f"\n{'backend':10s} {'hit ratio':>9s} {'renders':>8s} {'req/s':>9s} {'get p50 ms':>11s} {'get p95 ms':>11s}")
+    for backend, r in results.items():
+        print(f"{backend:10s} {r['hit_ratio']:9.3f} {r['renders']:8d} {r['requests_per_s']:9.1f} "
+              f"{r['get_p50_ms']:11.3f} {r['get_p95_ms']:11.3f}")
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({'processes': args.processes, 'keys': args.keys, 'skew': args.skew, 'results': results}, fh,
+                      indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# benchmarks/chat.py
+"""
+Round trips and latency of a chat turn, per chat engine.
+
+Every turn of a few typical questions is sent through ``/process/`` under
+each ``CHAT_ENGINE``: 'routed' (classify, then a handler per category) and
+'tools' (one call with function declarations and one follow-up, see
+core/chat_tools.py). Gemini and OpenWeather are the deterministic stubs,
+with a fixed latency per call, so the difference between the engines is the
+number of calls they make in a row. Reported per engine and question:
+Gemini and OpenWeather calls per turn (counted by ``metrics.upstream``, as
+in production) and p50/p95 turn latency.
+
+    python -m benchmarks.chat --gemini-latency 0.9 --weather-latency 0.15 --iterations 10 --output chat.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ENGINES = ('routed', 'tools')
+QUESTIONS = {
+    'weather': 'Delhi ka mausam kaisa hai?',
+    'crops': 'Is mahine kaun si fasal ugau?',
+    'schemes': 'Kisano ke liye kaun si sarkari yojana hai?',
+    'weather+crops': 'Aaj mausam kaisa hai aur kaun si fasal ugau?',
+    'general': 'Namaste, aap kaun ho?',
+}
+
+
+def _upstream_calls():
+    from core import metrics
+
+    calls = {}
+    for name, labels, _, _, count in metrics.REGISTRY.snapshot()['histograms']:
+        if name == 'agripath_upstream_seconds':
+            upstream = dict(labels)['upstream']
+            calls[upstream] = calls.get(upstream, 0) + count
+    return calls
+
+
+def run_engine(client, engine, iterations):
+    from django.core.cache import cache
+    from django.test import override_settings
+
+    from benchmarks.stats import summarize
+    from core.models import WeatherObservation
+
+    results = {}
+    with override_settings(CHAT_ENGINE=engine):
+        for name, question in QUESTIONS.items():
+            body = json.dumps({'text': question})
+            latencies = []
+            before = None
+            # The first turn is untimed: it loads the crop model
+            for i in range(iterations + 1):
+                # Every turn starts from an empty history and fetches the weather again
+                session = client.session
+                session['chat_history'] = []
+                session.save()
+                cache.clear()
+                WeatherObservation.objects.all().delete()
+                if i == 1:
+                    before = _upstream_calls()
+                started = time.perf_counter()
+                response = client.post('/process/', body, content_type='application/json')
+                elapsed = time.perf_counter() - started
+                assert response.status_code == 200, f'/process/ returned {response.status_code}'
+                if i:
+                    latencies.append(elapsed)
+            after = _upstream_calls()
+            stats = summarize(latencies)
+            results[name] = {
+                'gemini_calls': round((after.get('gemini', 0) - before.get('gemini', 0)) / iterations, 2),
+                'weather_calls': round((after.get('openweather', 0) - before.get('openweather', 0)) / iterations, 2),
+                'p50_ms': stats['p50_ms'],
+                'p95_ms': stats['p95_ms'],
+            }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', default=','.join(ENGINES), help='comma-separated subset of ' + ', '.join(ENGINES))
+    parser.add_argument('--gemini-latency', type=float, default=0.9, help='seconds per Gemini call')
+    parser.add_argument('--weather-latency', type=float, default=0.15, help='seconds per OpenWeather call')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mypage.settings')
+    for key in ('GEMINI_API_KEY', 'OPENWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+        os.environ.setdefault(key, 'benchmark')
+    os.environ.setdefault('ADMISSION_ENABLED', '0')
+    # Start from empty caches rather than whatever ./cache holds
+    os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='agripath-bench-cache-'))
+    # A hedged duplicate would be counted as a round trip of its own
+    os.environ.setdefault('GEMINI_HEDGE_PERCENTILE', '0')
+
+    import django
+    django.setup()
+    from unittest.mock import patch
+
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from benchmarks.stubs import stub_requests_get, upstream_stubs
+    from benchmarks.suite import _benchmark_user
+
+    def slow_get(url, params=None, **kwargs):
+        time.sleep(args.weather_latency)
+        return stub_requests_get(url, params=params, **kwargs)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    results = {}
+    try:
+        with upstream_stubs(gemini_latency=args.gemini_latency), patch('requests.get', slow_get):
+            client = Client()
+            client.force_login(_benchmark_user())
+            for engine in args.engines.split(','):
+                print(f'running {engine} ...', flush=True)
+                results[engine] = run_engine(client, engine, args.iterations)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    print(f"\n{'engine':8s} {'question':14s} {'gemini':>7s} {'weather':>8s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for engine, questions in results.items():
+        for name, r in questions.items():
+            print(f"{engine:8s} {name:14s} {r['gemini_calls']:7.1f} {r['weather_calls']:8.1f} "
+                  f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f}")
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({'gemini_latency': args.gemini_latency, 'weather_latency': args.weather_latency,
+                       'results': results}, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# benchmarks/compression.py
+"""
+Bytes on the wire per endpoint, per content encoding.
+
+Each endpoint is requested with ``Accept-Encoding`` identity, gzip and br
+through the full middleware stack, with the upstream stubs in place.
+Reported per endpoint: body bytes sent for each encoding, the ratio to the
+uncompressed body, and the median request latency for each encoding, so
+what compression costs can be seen next to what it saves. Pages that render
+a CSRF token stay uncompressed (see core/compression.py).
+
+    python -m benchmarks.compression --iterations 20 --output compression.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ENCODINGS = {'identity': 'identity', 'gzip': 'gzip', 'br': 'br, gzip'}
+BULK_ROWS = 2000
+
+
+def _endpoints(client):
+    from benchmarks.suite import _bulk_upload
+
+    chat_body = json.dumps({'text': 'Delhi ka mausam kaisa hai?'})
+    upload = _bulk_upload(BULK_ROWS)
+    return {
+        'login (CSRF form)': lambda headers: client.get('/accounts/login/', **headers),
+        'chat page (CSRF)': lambda headers: client.get('/', **headers),
+        'about (page cache)': lambda headers: client.get('/home/about', **headers),
+        'Fertilizer (page cache)': lambda headers: client.get('/home/Fertilizer', **headers),
+        'fertilizer_search JSON': lambda headers: client.get('/home/api/fertilizers', {'lang': 'hi'}, **headers),
+        'CropAdvisory': lambda headers: client.get('/home/CropAdvisory', **headers),
+        'Weather': lambda headers: client.get('/home/Weather', **headers),
+        'Policies': lambda headers: client.get('/home/Policies', **headers),
+        'process_voice JSON': lambda headers: client.post('/process/', chat_body, content_type='application/json',
+                                                          **headers),
+        f'bulk ndjson ({BULK_ROWS} rows, streamed)': lambda headers: client.post(
+            '/home/api/recommendations/bulk?format=ndjson', upload, content_type='text/csv', **headers),
+    }
+
+
+def _body(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def run(iterations):
+    from django.core.cache import cache
+
+    from benchmarks.stats import percentile
+    from benchmarks.suite import _benchmark_user
+    from django.test import Client
+
+    client = Client()
+    client.force_login(_benchmark_user())
+    results = {}
+    for name, request in _endpoints(client).items():
+        row = {}
+        for encoding, header in ENCODINGS.items():
+            headers = {'HTTP_ACCEPT_ENCODING': header}
+            latencies = []
+            for _ in range(iterations):
+                cache.clear()
+                started = time.perf_counter()
+                response = request(headers)
+                body = _body(response)
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, f'{name} returned {response.status_code}'
+            row[encoding] = {
+                'bytes': len(body),
+                'sent_as': response.get('Content-Encoding', 'identity'),
+                'p50_ms': round(percentile(latencies, 50), 2),
+            }
+        identity = row['identity']['bytes']
+        for encoding in ENCODINGS:
+            row[encoding]['ratio'] = round(row[encoding]['bytes'] / identity, 3) if identity else None
+        results[name] = row
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mypage.settings')
+    for key in ('GEMINI_API_KEY', 'OPENWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+        os.environ.setdefault(key, 'benchmark')
+    os.environ.setdefault('ADMISSION_ENABLED', '0')
+    # Start from empty caches rather than whatever ./cache holds
+    os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='agripath-bench-cache-'))
+
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from benchmarks.stubs import upstream_stubs
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with upstream_stubs():
+            results = run(args.iterations)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    print(f"\n{'endpoint':36s} {'identity':>9s} {'gzip':>9s} {'br':>9s} {'br ratio':>8s} "
+          f"{'p50 id':>8s} {'p50 gz':>8s} {'p50 br':>8s}")
+    for name, row in results.items():
+        print(f"{name:36s} {row['identity']['bytes']:9d} {row['gzip']['bytes']:9d} {row['br']['bytes']:9d} "
+              f"{row['br']['ratio']:8.3f} {row['identity']['p50_ms']:8.2f} {row['gzip']['p50_ms']:8.2f} "
+              f"{row['br']['p50_ms']:8.2f}")
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+# benchmarks/fakes.py
+"""
+Local stand-ins for OpenWeather, Gemini and Twilio.
+
+Each upstream gets its own HTTP server with a configurable latency
+distribution and error rate, so the full Django stack can be driven at
+realistic concurrency without API keys or network:
+
+    python -m benchmarks.fakes --config fakes.json
+
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8901 \\
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8902 \\
+    TWILIO_API_BASE_URL=http://127.0.0.1:8903 \\
+    gunicorn mypage.wsgi
+
+Responses are synthesized in the real response shapes. With ``--record DIR``
+requests are proxied to the real upstream and the responses saved; with
+``--replay DIR`` saved responses are served back (falling back to the
+synthesized ones for requests that were never recorded).
+
+Example config (every key is optional)::
+
+    {
+      "openweather": {"port": 8901, "latency": {"dist": "lognormal", "median": 0.15, "sigma": 0.4}},
+      "gemini":      {"port": 8902, "latency": {"dist": "lognormal", "median": 0.9, "sigma": 0.6}, "error_rate": 0.01},
+      "twilio":      {"port": 8903, "latency": {"dist": "uniform", "low": 0.2, "high": 0.6}}
+    }
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.stubs import CURRENT_WEATHER, FORECAST, StubGeminiModel, geocoded
+
+DEFAULTS = {
+    'openweather': {'port': 8901, 'upstream': 'http://api.openweathermap.org',
+                    'latency': {'dist': 'lognormal', 'median': 0.15, 'sigma': 0.4}},
+    'gemini': {'port': 8902, 'upstream': 'https://generativelanguage.googleapis.com',
+               'latency': {'dist': 'lognormal', 'median': 0.9, 'sigma': 0.6}},
+    'twilio': {'port': 8903, 'upstream': 'https://api.twilio.com',
+               'latency': {'dist': 'uniform', 'low': 0.2, 'high': 0.6}},
+}
+# Query parameters that carry credentials and must not end up in recordings or cache keys
+SECRET_PARAMS = {'appid', 'key'}
+MAX_LATENCY_SECONDS = 30.0
+
+
+class LatencyModel:
+    """Samples response delays from a fixed, uniform or lognormal distribution."""
+
+    def __init__(self, dist='fixed', seconds=0.0, low=0.0, high=0.0, median=0.0, sigma=0.0, seed=None):
+        self.dist = dist
+        self.seconds = seconds
+        self.low, self.high = low, high
+        self.median, self.sigma = median, sigma
+        self.random = random.Random(seed)
+
+    def sample(self):
+        if self.dist == 'uniform':
+            value = self.random.uniform(self.low, self.high)
+        elif self.dist == 'lognormal':
+            value = self.random.lognormvariate(0.0, self.sigma) * self.median if self.median else 0.0
+        else:
+            value = self.seconds
+        return min(max(0.0, value), MAX_LATENCY_SECONDS)
+
+
+class Recorder:
+    """Stores and looks up recorded responses in a directory, one JSON file per request."""
+
+    def __init__(self, directory, upstream_name):
+        self.directory = os.path.join(directory, upstream_name)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(method, path, query, body=b''):
+        params = sorted((k, v) for k, v in urllib.parse.parse_qsl(query) if k not in SECRET_PARAMS)
+        digest = hashlib.sha256(json.dumps([method, path, params]).encode() + body).hexdigest()[:24]
+        return digest
+
+    def save(self, key, status, content_type, body):
+        payload = {'status': status, 'content_type': content_type, 'body': body.decode('utf-8', 'replace')}
+        with open(os.path.join(self.directory, f'{key}.json'), 'w') as fh:
+            json.dump(payload, fh, ensure_ascii=False, indent=1)
+
+    def load(self, key):
+        try:
+            with open(os.path.join(self.directory, f'{key}.json')) as fh:
+                payload = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return payload['status'], payload['content_type'], payload['body'].encode('utf-8')
+
+
+class FakeUpstream:
+    """Behaviour of one fake upstream: latency, errors, recording and synthesized responses."""
+
+    name = None
+
+    def __init__(self, latency=None, error_rate=0.0, error_status=503, upstream=None,
+                 record_dir=None, replay_dir=None, seed=None):
+        self.latency = LatencyModel(seed=seed, **(latency or {}))
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.upstream = upstream
+        self.recorder = Recorder(record_dir or replay_dir, self.name) if (record_dir or replay_dir) else None
+        self.record = bool(record_dir)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def handle(self, method, path, query, headers, body):
+        """Returns (status, content_type, body bytes) for one request."""
+        with self.lock:
+            self.requests += 1
+            fail = self.random.random() < self.error_rate
+        if path.startswith('/_fake/'):
+            return self.control(method, path, query)
+
+        time.sleep(self.latency.sample())
+        if fail:
+            return self.error_status, 'application/json', json.dumps({'error': 'fake upstream error'}).encode()
+
+        key = Recorder.key(method, path, query, body if self.name != 'twilio' else b'')
+        if self.recorder and self.record:
+            response = self.proxy(method, path, query, headers, body)
+            self.recorder.save(key, *response)
+            return response
+        if self.recorder:
+            recorded = self.recorder.load(key)
+            if recorded is not None:
+                return recorded
+        return self.synthesize(method, path, urllib.parse.parse_qs(query), body)
+
+    def proxy(self, method, path, query, headers, body):
+        url = f'{self.upstream}{path}' + (f'?{query}' if query else '')
+        forward = {k: v for k, v in headers.items() if k.lower() in ('content-type', 'authorization', 'x-goog-api-key')}
+        request = urllib.request.Request(url, data=body or None, headers=forward, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.headers.get('Content-Type', 'application/json'), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Content-Type', 'application/json'), e.read()
+
+    def control(self, method, path, query):
+        if path == '/_fake/stats':
+            return 200, 'application/json', json.dumps({'requests': self.requests}).encode()
+        return 404, 'application/json', b'{}'
+
+    def synthesize(self, method, path, params, body):
+        raise NotImplementedError
+
+
+class FakeOpenWeather(FakeUpstream):
+    name = 'openweather'
+
+    def synthesize(self, method, path, params, body):
+        city = (params.get('q') or ['Delhi'])[0]
+        if path.endswith('/data/2.5/weather'):
+            if city.lower() in ('unknowncity', 'xyz'):
+                return 404, 'application/json', json.dumps({'cod': '404', 'message': 'city not found'}).encode()
+            payload = dict(CURRENT_WEATHER, name=city.title())
+            return 200, 'application/json', json.dumps(payload, ensure_ascii=False).encode()
+        if path.endswith('/data/2.5/forecast'):
+            return 200, 'application/json', json.dumps(FORECAST, ensure_ascii=False).encode()
+        if path.endswith('/geo/1.0/direct'):
+            return 200, 'application/json', json.dumps(geocoded(city), ensure_ascii=False).encode()
+        return 404, 'application/json', b'{"cod": "404"}'
+
+
+class FakeGemini(FakeUpstream):
+    name = 'gemini'
+    _path = re.compile(r'^/v1(beta)?/models/(?P<model>[^:]+):generateContent$')
+
+    def synthesize(self, method, path, params, body):
+        if not self._path.match(path):
+            return 404, 'application/json', json.dumps({'error': {'code': 404, 'status': 'NOT_FOUND'}}).encode()
+        request = json.loads(body or b'{}')
+        contents = request.get('contents', [])
+        texts = [part.get('text', '') for content in contents for part in content.get('parts', [])]
+        prompt = texts[0] if len(contents) == 1 and len(texts) == 1 else contents
+        text = StubGeminiModel.answer(prompt)
+        parts = [{'text': text}]
+        mode = request.get('toolConfig', {}).get('functionCallingConfig', {}).get('mode')
+        if request.get('tools') and mode != 'NONE' and contents:
+            last = {'parts': [part['text'] for part in contents[-1].get('parts', []) if 'text' in part]}
+            calls = StubGeminiModel.function_calls([last])
+            if calls:
+                text = ''
+                parts = [{'functionCall': {'name': name, 'args': args}} for name, args in calls]
+        payload = {
+            'candidates': [{
+                'content': {'role': 'model', 'parts': parts},
+                'finishReason': 'STOP',
+                'index': 0,
+            }],
+            'usageMetadata': {
+                'promptTokenCount': sum(len(t) for t in texts) // 4,
+                'candidatesTokenCount': len(text) // 4,
+                'totalTokenCount': (sum(len(t) for t in texts) + len(text)) // 4,
+            },
+            'modelVersion': self._path.match(path).group('model'),
+        }
+        return 200, 'application/json', json.dumps(payload, ensure_ascii=False).encode()
+
+
+class FakeTwilio(FakeUpstream):
+    """Accepts SMS sends and keeps them, so load tests can read the OTPs back."""
+
+    name = 'twilio'
+    _path = re.compile(r'^/2010-04-01/Accounts/(?P<sid>[^/]+)/Messages\.json$')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = []
+
+    def synthesize(self, method, path, params, body):
+        match = self._path.match(path)
+        if not match or method != 'POST':
+            return 404, 'application/json', json.dumps({'code': 20404, 'status': 404}).encode()
+        form = urllib.parse.parse_qs(body.decode())
+        message = {
+            'sid': 'SM' + hashlib.md5(body + str(time.time()).encode()).hexdigest(),
+            'account_sid': match.group('sid'),
+            'to': form.get('To', [''])[0],
+            'from': form.get('From', [''])[0],
+            'body': form.get('Body', [''])[0],
+            'status': 'queued',
+            'direction': 'outbound-api',
+            'date_created': time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime()),
+            'num_segments': '1',
+            'price': None,
+            'price_unit': 'USD',
+            'api_version': '2010-04-01',
+            'uri': f"/2010-04-01/Accounts/{match.group('sid')}/Messages.json",
+        }
+        with self.lock:
+            self.messages.append(message)
+        return 201, 'application/json', json.dumps(message).encode()
+
+    def control(self, method, path, query):
+        if path == '/_fake/messages':
+            to = urllib.parse.parse_qs(query).get('to', [None])[0]
+            with self.lock:
+                found = [m for m in self.messages if to is None or m['to'] == to]
+            return 200, 'application/json', json.dumps(found).encode()
+        return super().control(method, path, query)
+
+
+FAKES = {'openweather': FakeOpenWeather, 'gemini': FakeGemini, 'twilio': FakeTwilio}
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _serve(self):
+            parsed = urllib.parse.urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            status, content_type, payload = fake.handle(self.command, parsed.path, parsed.query, self.headers, body)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = _serve
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(name, port=0, host='127.0.0.1', **options):
+    """Starts one fake upstream in a background thread; returns (server, fake)."""
+    fake = FAKES[name](**options)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'fake-{name}', daemon=True).start()
+    return server, fake
+
+
+def start_all(config=None, record_dir=None, replay_dir=None, host='127.0.0.1'):
+    """Starts every fake upstream; returns {name: (server, fake)}."""
+    config = config or {}
+    running = {}
+    for name, defaults in DEFAULTS.items():
+        options = dict(defaults)
+        options.update(config.get(name, {}))
+        port = options.pop('port')
+        running[name] = start(name, port=port, host=host, record_dir=record_dir, replay_dir=replay_dir, **options)
+    return running
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', help='JSON file with per-upstream port, latency and error_rate')
+    parser.add_argument('--host', default='127.0.0.1')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record', metavar='DIR', help='proxy to the real upstreams and save the responses')
+    group.add_argument('--replay', metavar='DIR', help='serve responses saved with --record')
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.config:
+        with open(args.config) as fh:
+            config = json.load(fh)
+    running = start_all(config, record_dir=args.record, replay_dir=args.replay, host=args.host)
+    for name, (server, _) in running.items():
+        print(f"fake {name:12s} http://{args.host}:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server, _ in running.values():
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
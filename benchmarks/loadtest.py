@@ -0,0 +1,208 @@
+# benchmarks/loadtest.py
+"""
+Load generator that replays scripted farmer sessions against a running app.
+
+Each virtual user logs in with an OTP (read back from the fake Twilio
+server), completes the profile, then loops over chat turns, the weather
+page, the crop advisory and the policies page with think time in between.
+
+    python -m benchmarks.fakes &
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8901 GEMINI_API_ENDPOINT=http://127.0.0.1:8902 \\
+        TWILIO_API_BASE_URL=http://127.0.0.1:8903 ADMISSION_IP_RATE=1000 gunicorn mypage.wsgi &
+    TWILIO_API_BASE_URL=http://127.0.0.1:8903 python manage.py sms_worker &
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 --users 50 --duration 120
+
+Throughput, p50/p95/p99 latency and the requests shed by admission control
+are reported per endpoint and can be written as JSON with --output. All
+virtual users share one IP, so give the app a wide per-IP token bucket.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from benchmarks.stats import summarize
+
+LOCATIONS = ['Patna', 'Lucknow', 'Karnal', 'Nashik', 'Indore', 'Ludhiana', 'Guntur', 'Hisar']
+QUESTIONS = [
+    'आज मौसम कैसा रहेगा?',
+    'मेरे खेत के लिए कौन सी फसल अच्छी रहेगी?',
+    'किसानों के लिए सरकारी योजनाएं बताइए',
+    'गेहूं में कौन सी खाद डालें?',
+]
+OTP_PATTERN = re.compile(r'(\d{6})')
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.shed = defaultdict(int)
+
+    def add(self, endpoint, seconds, ok, shed=False):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if shed:
+                self.shed[endpoint] += 1
+
+
+class FarmerSession:
+    """One scripted farmer: login, profile, then a loop of typical page views."""
+
+    def __init__(self, index, base_url, twilio_url, recorder, think_time, rng):
+        self.base_url = base_url.rstrip('/')
+        self.twilio_url = twilio_url.rstrip('/') if twilio_url else None
+        self.recorder = recorder
+        self.think_time = think_time
+        self.rng = rng
+        self.phone = f'+9197{index:08d}'
+        self.http = requests.Session()
+
+    def _csrf(self):
+        return self.http.cookies.get('csrftoken', '')
+
+    def request(self, endpoint, method, path, ok_statuses=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=60, allow_redirects=False, **kwargs)
+            ok = response.status_code in ok_statuses
+            # Turned away by admission control (core/admission.py): a 429 or a stale copy
+            shed = response.status_code == 429 or 'X-AgriPath-Degraded' in response.headers
+        except requests.RequestException:
+            response, ok, shed = None, False, False
+        self.recorder.add(endpoint, time.perf_counter() - started, ok, shed)
+        return response
+
+    def think(self):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+
+    def _read_otp(self, timeout=30.0):
+        if not self.twilio_url:
+            return None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                messages = requests.get(f'{self.twilio_url}/_fake/messages', params={'to': self.phone}, timeout=5).json()
+            except (requests.RequestException, ValueError):
+                messages = []
+            if messages:
+                match = OTP_PATTERN.search(messages[-1]['body'])
+                if match:
+                    return match.group(1)
+            time.sleep(0.2)
+        return None
+
+    def login(self):
+        self.request('login_page', 'GET', '/accounts/login/')
+        self.request('request_otp', 'POST', '/accounts/login/', ok_statuses=(302,),
+                     data={'phone_number': self.phone, 'csrfmiddlewaretoken': self._csrf()})
+        otp = self._read_otp()
+        if otp is None:
+            self.recorder.add('otp_delivery', 0.0, False)
+            return False
+        self.request('verify_otp', 'POST', '/accounts/login/verify/', ok_statuses=(302,),
+                     data={'otp': otp, 'csrfmiddlewaretoken': self._csrf()})
+        self.request('setup_profile', 'POST', '/accounts/profile/setup/', ok_statuses=(302,),
+                     data={'name': f'Farmer {self.phone[-4:]}', 'age': self.rng.randint(20, 70),
+                           'location': self.rng.choice(LOCATIONS), 'csrfmiddlewaretoken': self._csrf()})
+        return True
+
+    def chat_turn(self):
+        self.request('process_voice', 'POST', '/process/',
+                     data=json.dumps({'text': self.rng.choice(QUESTIONS)}),
+                     headers={'Content-Type': 'application/json', 'X-CSRFToken': self._csrf()})
+
+    def run(self, stop_at):
+        if not self.login():
+            return
+        self.request('get_greeting', 'GET', '/api/get-greeting/')
+        actions = [
+            (self.chat_turn, 5),
+            (lambda: self.request('Weather', 'GET', '/home/Weather'), 2),
+            (lambda: self.request('CropAdvisory', 'GET', '/home/CropAdvisory'), 1),
+            (lambda: self.request('Policies', 'GET', '/home/Policies'), 1),
+            (lambda: self.request('about', 'GET', '/about'), 1),
+        ]
+        population = [action for action, weight in actions for _ in range(weight)]
+        while time.monotonic() < stop_at:
+            self.rng.choice(population)()
+            self.think()
+
+
+def run(base_url, twilio_url, users, duration, think_time, ramp_up, seed=0):
+    recorder = Recorder()
+    started = time.monotonic()
+    stop_at = started + duration
+    threads = []
+    for index in range(users):
+        session = FarmerSession(index, base_url, twilio_url, recorder, think_time, random.Random(seed + index))
+        thread = threading.Thread(target=session.run, args=(stop_at,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        if ramp_up:
+            time.sleep(ramp_up / users)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return report(recorder, elapsed)
+
+
+def report(recorder, elapsed):
+    endpoints = {}
+    all_latencies = []
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        all_latencies.extend(latencies)
+        stats = summarize(latencies)
+        stats['errors'] = recorder.errors[endpoint]
+        stats['shed'] = recorder.shed[endpoint]
+        stats['throughput_rps'] = round(len(latencies) / elapsed, 2)
+        endpoints[endpoint] = stats
+    overall = summarize(all_latencies)
+    overall['errors'] = sum(recorder.errors.values())
+    overall['shed'] = sum(recorder.shed.values())
+    overall['throughput_rps'] = round(len(all_latencies) / elapsed, 2) if elapsed else None
+    return {'elapsed_s': round(elapsed, 2), 'overall': overall, 'endpoints': endpoints}
+
+
+def print_report(result):
+    print(f"{'endpoint':18s} {'count':>7s} {'rps':>8s} {'errors':>7s} {'shed':>6s} {'p50 ms':>9s} {'p95 ms':>9s} "
+          f"{'p99 ms':>9s}")
+    rows = list(result['endpoints'].items()) + [('ALL', result['overall'])]
+    for name, stats in rows:
+        if not stats['count']:
+            continue
+        print(f"{name:18s} {stats['count']:7d} {stats['throughput_rps']:8.2f} {stats['errors']:7d} {stats['shed']:6d} "
+              f"{stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--twilio-url', default='http://127.0.0.1:8903', help='fake Twilio server, used to read OTPs')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds')
+    parser.add_argument('--think-time', type=float, default=1.0, help='mean pause between actions (seconds)')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='seconds over which users start')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    result = run(args.base_url, args.twilio_url, args.users, args.duration, args.think_time, args.ramp_up)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(result, fh, indent=2)
+    return 0 if result['overall']['count'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# benchmarks/sqlite.py
+"""
+Session-write throughput and lock waits on SQLite, per settings profile.
+
+For each profile (``SQLITE_PROFILE``: Django's defaults, and the tuned
+profile of mypage/sqlite_profile.py) a fresh database file is migrated,
+then several processes with several threads each (like gunicorn gthread
+workers) load, extend and save their own session as fast as they can, as
+every chat turn does. Reported per profile:
+
+- writes per second and "database is locked" errors;
+- p50/p95/p99 write latency;
+- wait: how much longer than an uncontended write (measured first, by a
+  single thread) each write took. That is the time spent waiting for the
+  database lock, plus waiting for a CPU on machines with fewer cores than
+  writers.
+
+    python -m benchmarks.sqlite --processes 4 --threads 4 --duration 10 --output sqlite.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = ('default', 'tuned')
+RESULT_MARKER = 'SQLITE_BENCH '
+HISTORY_TURNS = 20
+
+
+def _env(profile, path):
+    env = dict(os.environ, SQLITE_PROFILE=profile, DATABASE_URL=f'sqlite:///{path}',
+               DJANGO_SETTINGS_MODULE='mypage.settings')
+    for key in ('GEMINI_API_KEY', 'OPENWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+        env.setdefault(key, 'benchmark')
+    return env
+
+
+def child(threads, duration, start_at):
+    """Runs in each worker process: ``threads`` threads writing sessions until the deadline."""
+    import django
+    django.setup()
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.db import OperationalError, connection
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def run():
+        store = SessionStore()
+        store['chat_history'] = []
+        store.create()
+        own, failed = [], 0
+        while time.time() < start_at:
+            time.sleep(0.001)
+        stop_at = start_at + duration
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                session = SessionStore(session_key=store.session_key)
+                history = session.get('chat_history', [])
+                history.append({'role': 'user', 'parts': ['आज मौसम कैसा रहेगा? ' * 8]})
+                session['chat_history'] = history[-HISTORY_TURNS:]
+                session.save()
+            except OperationalError:
+                failed += 1
+            own.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(own)
+            errors.append(failed)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    sys.stdout.write(RESULT_MARKER + json.dumps({'latencies': latencies, 'errors': sum(errors)}) + '\n')
+
+
+def _run_processes(env, processes, threads, duration):
+    start_at = time.time() + 2.0  # every process has set Django up and created its sessions by then
+    code = f'from benchmarks import sqlite; sqlite.child({threads}, {duration}, {start_at})'
+    running = [subprocess.Popen([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE, text=True)
+               for _ in range(processes)]
+    latencies, errors = [], 0
+    for process in running:
+        out, _ = process.communicate(timeout=duration + 120)
+        for line in out.splitlines():
+            if line.startswith(RESULT_MARKER):
+                result = json.loads(line[len(RESULT_MARKER):])
+                latencies.extend(result['latencies'])
+                errors += result['errors']
+    return latencies, errors
+
+
+def run_profile(profile, processes, threads, duration):
+    from benchmarks.stats import summarize
+
+    with tempfile.TemporaryDirectory(prefix='agripath-sqlite-') as directory:
+        env = _env(profile, os.path.join(directory, 'db.sqlite3'))
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        baseline, _ = _run_processes(env, 1, 1, min(duration, 3.0))
+        latencies, errors = _run_processes(env, processes, threads, duration)
+
+    uncontended = summarize(baseline)['p50_ms'] / 1000
+    waits = [max(0.0, seconds - uncontended) for seconds in latencies]
+    writes = summarize(latencies)
+    wait = summarize(waits)
+    return {
+        'writers': processes * threads,
+        'writes': len(latencies),
+        'writes_per_s': round((len(latencies) - errors) / duration, 1),
+        'errors': errors,
+        'uncontended_ms': round(uncontended * 1000, 3),
+        'p50_ms': writes['p50_ms'],
+        'p95_ms': writes['p95_ms'],
+        'p99_ms': writes['p99_ms'],
+        'wait_mean_ms': wait['mean_ms'],
+        'wait_p95_ms': wait['p95_ms'],
+        'wait_share': round(sum(waits) / sum(latencies), 3) if latencies else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='comma-separated subset of ' + ', '.join(PROFILES))
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for profile in args.profiles.split(','):
+        print(f'running {profile} ...', flush=True)
+        results[profile] = run_profile(profile, args.processes, args.threads, args.duration)
+
+    print(f"\n{'profile':10s} {'writers':>7s} {'writes/s':>9s} {'errors':>7s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'p99 ms':>8s} {'wait p95':>9s} {'wait share':>10s}")
+    for name, r in results.items():
+        print(f"{name:10s} {r['writers']:7d} {r['writes_per_s']:9.1f} {r['errors']:7d} {r['p50_ms']:8.2f} "
+              f"{r['p95_ms']:8.2f} {r['p99_ms']:8.2f} {r['wait_p95_ms']:9.2f} {r['wait_share']:10.1%}")
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# benchmarks/stats.py
+"""Timing, allocation and query-count measurement shared by the benchmarks."""
+import gc
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples`` (pct in 0-100)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(latencies):
+    """p50/p95/p99/mean/min/max of a list of latencies, in milliseconds."""
+    ms = [value * 1000 for value in latencies]
+    return {
+        'count': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else None,
+        'min_ms': round(min(ms), 3) if ms else None,
+        'p50_ms': round(percentile(ms, 50), 3) if ms else None,
+        'p95_ms': round(percentile(ms, 95), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 3) if ms else None,
+        'max_ms': round(max(ms), 3) if ms else None,
+    }
+
+
+def measure(fn, iterations=50, warmup=3, setup=None):
+    """
+    Runs ``fn`` repeatedly and returns latency percentiles, allocations and
+    database queries per call. ``setup`` runs before every call, untimed.
+
+    Latency is measured without tracemalloc running, allocations in a separate
+    pass so the tracing overhead does not distort the timings.
+    """
+    setup = setup or (lambda: None)
+    for _ in range(warmup):
+        setup()
+        fn()
+
+    latencies = []
+    queries = 0
+    gc.collect()
+    for _ in range(iterations):
+        setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - started)
+        queries += len(captured.captured_queries)
+
+    alloc_iterations = max(1, min(iterations, 10))
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            setup()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+
+    result = summarize(latencies)
+    result.update({
+        'queries_per_call': round(queries / iterations, 2),
+        'peak_alloc_kib': round(max(peaks) / 1024, 1),
+        'retained_kib_per_call': round(sum(retained) / len(retained) / 1024, 1),
+    })
+    return result
+
+
+def compare(current, baseline, metric='p95_ms', threshold=0.2):
+    """
+    Compares two result dicts benchmark by benchmark.
+
+    Returns (rows, regressions) where each row is (name, baseline, current,
+    relative change) and regressions lists the names that got slower than
+    ``threshold`` (0.2 = 20%).
+    """
+    rows, regressions = [], []
+    for name, result in sorted(current.items()):
+        old = baseline.get(name, {}).get(metric)
+        new = result.get(metric)
+        if old in (None, 0) or new is None:
+            rows.append((name, old, new, None))
+            continue
+        change = (new - old) / old
+        rows.append((name, old, new, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
@@ -0,0 +1,160 @@
+# benchmarks/stubs.py
+"""Deterministic stand-ins for Gemini and OpenWeather used by the benchmarks."""
+import json
+import time
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+
+POLICIES_JSON = json.dumps([
+    {
+        "name": "प्रधानमंत्री किसान सम्मान निधि",
+        "description": "किसानों को आर्थिक सहायता",
+        "benefits": "6000 रुपये प्रति वर्ष",
+        "link": "https://pmkisan.gov.in"
+    },
+    {
+        "name": "प्रधानमंत्री फसल बीमा योजना",
+        "description": "फसल नुकसान पर बीमा",
+        "benefits": "कम प्रीमियम पर बीमा",
+        "link": "https://pmfby.gov.in"
+    }
+], ensure_ascii=False)
+
+CURRENT_WEATHER = {
+    'coord': {'lat': 28.6139, 'lon': 77.2090},
+    'name': 'Delhi',
+    'main': {'temp': 31.5, 'humidity': 62, 'pressure': 1008},
+    'weather': [{'description': 'हल्के बादल', 'icon': '02d'}],
+    'wind': {'speed': 3.6},
+    'visibility': 8000,
+}
+
+FORECAST = {
+    'list': [
+        {
+            'dt': 1760000000 + day * 86400,
+            'dt_txt': f'2025-10-{10 + day:02d} 12:00:00',
+            'main': {'temp_max': 33 - day, 'temp_min': 24 - day, 'humidity': 55 + day, 'pressure': 1009},
+            'weather': [{'description': 'साफ आसमान', 'icon': '01d'}],
+            'wind': {'speed': 3.1},
+        }
+        for day in range(5)
+    ]
+}
+
+
+# Words of a farmer's question that the stub reads as each topic
+TOPIC_WORDS = {
+    'weather': ('mausam', 'मौसम', 'weather', 'barish', 'बारिश'),
+    'crop_recommendation': ('fasal', 'फसल', 'crop', 'ugau', 'उगाऊँ'),
+    'government_scheme': ('yojana', 'योजना', 'scheme', 'sarkari', 'सरकारी'),
+}
+# The function the tool-routing engine is asked to call for each topic (core/chat_tools.py)
+TOPIC_TOOLS = {'weather': 'get_weather', 'crop_recommendation': 'recommend_crops', 'government_scheme': 'list_schemes'}
+
+
+def topics(text):
+    lowered = text.lower()
+    return [topic for topic, words in TOPIC_WORDS.items() if any(word in lowered for word in words)]
+
+
+class StubFunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class StubPart:
+    def __init__(self, text='', function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+
+class StubResponse:
+    def __init__(self, text='', parts=None):
+        self.text = text
+        self.parts = parts if parts is not None else [StubPart(text)]
+
+
+class StubGeminiModel:
+    """Answers each kind of prompt the app sends with a fixed, realistic reply."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, contents, tools=None, tool_config=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if tools and not tool_config:
+            calls = self.function_calls(contents)
+            if calls:
+                return StubResponse(parts=[StubPart(function_call=StubFunctionCall(name, args)) for name, args in calls])
+        return StubResponse(self.answer(contents))
+
+    @staticmethod
+    def function_calls(contents):
+        """The calls asked for by the last turn of a conversation: one per topic it mentions."""
+        last = contents[-1] if isinstance(contents, list) and contents else {}
+        text = ' '.join(part for part in last.get('parts', []) if isinstance(part, str))
+        return [(TOPIC_TOOLS[topic], {'place': 'Delhi'}) for topic in topics(text)]
+
+    @staticmethod
+    def answer(contents):
+        if isinstance(contents, str):
+            if 'Classify this into' in contents:
+                query = contents.split('User query:', 1)[-1]
+                found = topics(query)
+                if found:
+                    return found[0]
+                return 'general_conversation' if 'namaste' in query.lower() or 'नमस्ते' in query else 'weather'
+            if 'शहर का नाम' in contents:
+                return 'Delhi'
+            if 'government agricultural schemes' in contents:
+                return POLICIES_JSON
+            if 'Year-Round Planting Calendar' in contents:
+                return 'धान: खरीफ की शुरुआत में बुवाई करें।\nगेहूं: रबी में नवंबर तक बुवाई करें।'
+            return 'नमस्ते किसान भाई! आज मैं आपकी क्या मदद करूँ?'
+        return 'आज दिल्ली में हल्के बादल हैं, तापमान 31°C के आसपास है। सिंचाई शाम को करें।'
+
+
+class StubHTTPResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f'{self.status_code} error')
+
+
+def geocoded(query):
+    """OpenWeather /geo/1.0/direct answer for a query: the stub city, named as asked."""
+    name = query.split(',')[0].strip() or 'Delhi'
+    return [{'name': name.title(), 'state': 'Delhi', 'country': 'IN', **CURRENT_WEATHER['coord']}]
+
+
+def stub_requests_get(url, params=None, **kwargs):
+    if '/geo/' in url:
+        return StubHTTPResponse(geocoded((params or {}).get('q', '')))
+    if 'forecast' in url:
+        return StubHTTPResponse(FORECAST)
+    return StubHTTPResponse(CURRENT_WEATHER)
+
+
+@contextmanager
+def upstream_stubs(gemini_latency=0.0):
+    """Replaces every upstream the request pipelines call with deterministic stubs."""
+    model = StubGeminiModel(latency=gemini_latency)
+    with ExitStack() as stack:
+        stack.enter_context(patch('core.views.MODEL', model))
+        stack.enter_context(patch('home.views.POLICY_MODEL', model))
+        stack.enter_context(patch('core.views.OPENWEATHER_API_KEY', 'benchmark'))
+        stack.enter_context(patch('home.views.OPENWEATHER_API_KEY', 'benchmark'))
+        stack.enter_context(patch('requests.get', stub_requests_get))
+        yield model
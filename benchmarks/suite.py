@@ -0,0 +1,136 @@
+# benchmarks/suite.py
+"""
+The benchmark definitions.
+
+Each entry is ``(name, fn, setup)``: ``fn`` is the timed call and ``setup``
+(or None) runs untimed before every iteration.
+"""
+import json
+import random
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, override_settings
+
+from core import advisories, crop_model
+from core.models import LocationAdvisory, WeatherObservation
+from core.crop_model import DATA_FILE, FEATURES
+from benchmarks.stubs import StubGeminiModel
+
+SINGLE_INPUT = {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9}
+BATCH_SIZE = 100
+BULK_ROWS = 10000
+
+
+def _batch_inputs():
+    df = pd.read_csv(DATA_FILE).sample(n=BATCH_SIZE, random_state=42)
+    return df[FEATURES].to_dict('records')
+
+
+def _bulk_upload(rows=BULK_ROWS):
+    df = pd.read_csv(DATA_FILE)
+    df = df.sample(n=rows, replace=True, random_state=42)[FEATURES]
+    return df.to_csv(index=False).encode()
+
+
+def micro_benchmarks():
+    from unittest.mock import patch
+    from core import views as core_views
+
+    batch = _batch_inputs()
+    batch_features = [[row[name] for name in FEATURES] for row in batch]
+    stub = StubGeminiModel()
+    raw_reply = '**नमस्ते!** #आज का मौसम - साफ़ है_ @किसान $भाई ' * 4
+
+    def predict_loop():
+        for row in batch:
+            crop_model.predict_suitable_crops(row)
+
+    def postprocess():
+        with patch.object(stub, 'answer', return_value=raw_reply), patch('core.views.MODEL', stub):
+            core_views.generate_gemini_response('benchmark prompt')
+
+    return [
+        ('crop_model.predict_single', lambda: crop_model.predict_suitable_crops(SINGLE_INPUT), None),
+        # One vectorized model call for the whole batch, as the bulk endpoint scores its chunks
+        (f'crop_model.predict_batch_{BATCH_SIZE}', lambda: crop_model.predict_batch(batch_features), None),
+        (f'crop_model.predict_loop_{BATCH_SIZE}', predict_loop, None),
+        ('crop_model.load', crop_model.load_and_train_model, None),
+        ('core.generate_gemini_response', postprocess, None),
+    ]
+
+
+def _benchmark_user():
+    user, _ = User.objects.get_or_create(username='+919000000001')
+    user.profile.name = 'Benchmark Farmer'
+    user.profile.location = 'Delhi'
+    user.profile.save()
+    return user
+
+
+def end_to_end_benchmarks():
+    client = Client()
+    client.force_login(_benchmark_user())
+    chat_body = json.dumps({'text': 'Delhi ka mausam kaisa hai?'})
+
+    def reset_chat():
+        # Start every turn from an empty history so iterations are comparable
+        session = client.session
+        session['chat_history'] = []
+        session.save()
+        cache.clear()
+        WeatherObservation.objects.all().delete()
+
+    def reset_state():
+        random.seed(0)
+        cache.clear()
+        # Otherwise every iteration after the first reads the stored weather instead of fetching it
+        WeatherObservation.objects.all().delete()
+        # The live Crop Advisory path; e2e.CropAdvisory_materialized measures the stored one
+        LocationAdvisory.objects.all().delete()
+
+    def get(path):
+        def fn():
+            response = client.get(path)
+            assert response.status_code == 200, f'{path} returned {response.status_code}'
+        return fn
+
+    upload = _bulk_upload()
+
+    def materialized_state():
+        reset_state()
+        # As after the nightly materialize_advisories run
+        advisories.materialize()
+        LocationAdvisory.objects.update(advisory='Benchmark planting calendar')
+
+    def bulk_upload():
+        response = client.post('/home/api/recommendations/bulk', upload, content_type='text/csv')
+        assert response.status_code == 200, f'bulk upload returned {response.status_code}'
+        for _ in response.streaming_content:
+            pass
+
+    def request_otp():
+        # Queues the SMS; manage.py sms_worker sends it outside the request
+        response = client.post('/accounts/login/', {'phone_number': '+919876543210'})
+        assert response.status_code == 302, f'request_otp returned {response.status_code}'
+
+    def chat_turn():
+        response = client.post('/process/', chat_body, content_type='application/json')
+        assert response.status_code == 200, f'/process/ returned {response.status_code}'
+
+    def chat_turn_tools():
+        # The same turn through the tool-routing engine; python -m benchmarks.chat compares them with latency
+        with override_settings(CHAT_ENGINE='tools'):
+            chat_turn()
+
+    return [
+        ('e2e.process_voice', chat_turn, reset_chat),
+        ('e2e.process_voice_tools', chat_turn_tools, reset_chat),
+        ('e2e.CropAdvisory', get('/home/CropAdvisory'), reset_state),
+        ('e2e.CropAdvisory_materialized', get('/home/CropAdvisory'), materialized_state),
+        ('e2e.Weather', get('/home/Weather'), reset_state),
+        ('e2e.Policies', get('/home/Policies'), reset_state),
+        ('e2e.request_otp', request_otp, None),
+        (f'e2e.bulk_recommendations_{BULK_ROWS}', bulk_upload, None),
+    ]
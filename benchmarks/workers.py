@@ -0,0 +1,187 @@
+# benchmarks/workers.py
+"""
+Memory per worker and concurrent throughput for each gunicorn worker model.
+
+Starts the fake upstreams (with Gemini latency, so requests are I/O-bound
+like in production), then for every profile boots gunicorn with
+gunicorn.conf.py plus the profile's overrides, measures each worker's
+RSS/PSS/USS from /proc and drives it with the farmer-session load generator.
+
+    python -m benchmarks.workers --users 40 --duration 30 --output workers.json
+
+Linux only (memory is read from /proc/<pid>/smaps_rollup).
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks import fakes, loadtest
+
+PROFILES = {
+    # gunicorn silently switches sync workers to gthread when threads > 1
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': '0', 'GUNICORN_THREADS': '1'},
+    'sync-preload': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': '1', 'GUNICORN_THREADS': '1'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_PRELOAD': '0'},
+    'gthread-preload': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_PRELOAD': '1'},
+}
+FAKE_CONFIG = {
+    'openweather': {'latency': {'dist': 'lognormal', 'median': 0.1, 'sigma': 0.3}},
+    'gemini': {'latency': {'dist': 'lognormal', 'median': 0.6, 'sigma': 0.4}},
+    'twilio': {'latency': {'dist': 'fixed', 'seconds': 0.05}},
+}
+
+
+def worker_pids(master_pid):
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as fh:
+            return [int(pid) for pid in fh.read().split()]
+    except OSError:
+        return []
+
+
+def memory_kib(pid):
+    """RSS, PSS and USS (private clean + dirty) of a process, in KiB."""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    values[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        'rss_kib': values.get('Rss', 0),
+        'pss_kib': values.get('Pss', 0),
+        'uss_kib': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=2, allow_redirects=False)
+            return True
+        except requests.RequestException:
+            time.sleep(0.5)
+    return False
+
+
+def run_profile(name, overrides, base_env, args, port):
+    env = dict(base_env, PORT=str(port), WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads))
+    env.update(overrides)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'mypage.wsgi', '--config', 'gunicorn.conf.py',
+         '--access-logfile', os.devnull],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # OTPs reach the fake Twilio only through the outbox
+    sms_worker = subprocess.Popen([sys.executable, 'manage.py', 'sms_worker'], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        if not wait_until_up(f'{base_url}/accounts/login/'):
+            return {'error': 'gunicorn did not start'}
+        # Touch every worker once so lazily loaded state is counted in its memory
+        for _ in range(args.workers * 4):
+            requests.get(f'{base_url}/about', timeout=30)
+        result = loadtest.run(base_url, args.twilio_url, args.users, args.duration,
+                              think_time=args.think_time, ramp_up=1.0)
+        workers = [memory_kib(pid) for pid in worker_pids(process.pid)]
+        workers = [w for w in workers if w]
+        master = memory_kib(process.pid)
+    finally:
+        sms_worker.send_signal(signal.SIGTERM)
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        try:
+            sms_worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            sms_worker.kill()
+
+    def mean(key):
+        return round(sum(w[key] for w in workers) / len(workers)) if workers else None
+
+    return {
+        'workers': len(workers),
+        'master': master,
+        'worker_rss_kib': mean('rss_kib'),
+        'worker_pss_kib': mean('pss_kib'),
+        'worker_uss_kib': mean('uss_kib'),
+        'total_pss_kib': (sum(w['pss_kib'] for w in workers) + (master or {}).get('pss_kib', 0)),
+        'throughput_rps': result['overall']['throughput_rps'],
+        'p50_ms': result['overall']['p50_ms'],
+        'p95_ms': result['overall']['p95_ms'],
+        'p99_ms': result['overall']['p99_ms'],
+        'errors': result['overall']['errors'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='comma-separated subset of ' + ', '.join(PROFILES))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--think-time', type=float, default=0.2)
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    running = fakes.start_all(FAKE_CONFIG)
+    ports = {name: server.server_address[1] for name, (server, _) in running.items()}
+    args.twilio_url = f"http://127.0.0.1:{ports['twilio']}"
+
+    workdir = tempfile.mkdtemp(prefix='agripath-workers-')
+    base_env = dict(os.environ)
+    base_env.update({
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "db.sqlite3")}',
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+        'CACHE_DIR': os.path.join(workdir, 'cache'),
+        'OPENWEATHER_BASE_URL': f"http://127.0.0.1:{ports['openweather']}",
+        'GEMINI_API_ENDPOINT': f"http://127.0.0.1:{ports['gemini']}",
+        'TWILIO_API_BASE_URL': args.twilio_url,
+        'ALLOWED_HOSTS': '127.0.0.1,localhost',
+        # Every virtual farmer connects from 127.0.0.1; keep the per-IP bucket out of the way
+        'ADMISSION_IP_RATE': '1000',
+        'ADMISSION_IP_BURST': '10000',
+    })
+    for key in ('GEMINI_API_KEY', 'OPENWEATHER_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+        base_env.setdefault(key, 'benchmark')
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], env=base_env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    results = {}
+    for name in args.profiles.split(','):
+        print(f'running {name} ...', flush=True)
+        results[name] = run_profile(name, PROFILES[name], base_env, args, args.port)
+
+    print(f"\n{'profile':16s} {'workers':>7s} {'RSS/worker':>11s} {'PSS/worker':>11s} {'USS/worker':>11s} "
+          f"{'total PSS':>10s} {'rps':>7s} {'p95 ms':>8s} {'errors':>6s}")
+    for name, r in results.items():
+        if 'error' in r:
+            print(f'{name:16s} {r["error"]}')
+            continue
+        print(f"{name:16s} {r['workers']:7d} {r['worker_rss_kib'] / 1024:9.1f}Mi {r['worker_pss_kib'] / 1024:9.1f}Mi "
+              f"{r['worker_uss_kib'] / 1024:9.1f}Mi {r['total_pss_kib'] / 1024:8.1f}Mi {r['throughput_rps']:7.2f} "
+              f"{r['p95_ms']:8.1f} {r['errors']:6d}")
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# core/admission.py
+"""
+Admission control for the views that wait on Gemini.
+
+When Gemini slows down, requests to the chat, Crop Advisory and Policies
+hold their gunicorn threads for seconds each and, unchecked, take every
+thread of every worker, so even cheap pages stop answering. Each of those
+views gets, in every worker process:
+
+- a concurrency limit with a short, bounded wait queue, and
+- a share of the threads: together the limited views never hold more than
+  ``ADMISSION_MAX_THREADS``, leaving the rest for everything else.
+
+Callers are also metered by two token buckets kept in the ``admission``
+cache: one per signed-in user and a much wider one per client IP (many
+farmers share a carrier NAT address).
+
+A request that is not admitted costs a few microseconds: a GET page is
+answered with the last copy this user was served (marked
+``X-AgriPath-Degraded: stale``), anything else with a 429 and
+``Retry-After``. Outcomes are counted as ``agripath_admission_total`` and
+queue waits as ``agripath_admission_wait_seconds``.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+
+from core import metrics
+
+# --- Defaults (overridable from settings) ---
+# url name: requests in flight per process, requests that may wait for a slot, and for how long
+DEFAULT_LIMITS = {
+    'process_voice': {'concurrency': 3, 'queue': 3, 'queue_timeout': 2.0},
+    'CropAdvisory': {'concurrency': 2, 'queue': 2, 'queue_timeout': 2.0},
+    'Policies': {'concurrency': 2, 'queue': 2, 'queue_timeout': 2.0},
+    'get_greeting': {'concurrency': 1, 'queue': 0, 'queue_timeout': 0.0},
+}
+# Of gunicorn's 8 threads per worker; the others stay free for pages that don't call Gemini
+DEFAULT_MAX_THREADS = 6
+DEFAULT_USER_RATE = 0.2  # requests per second, refilled continuously
+DEFAULT_USER_BURST = 10
+DEFAULT_IP_RATE = 2.0
+DEFAULT_IP_BURST = 60
+DEFAULT_RETRY_AFTER = 5
+DEFAULT_STALE_SECONDS = 6 * 60 * 60
+DEFAULT_CACHE = 'admission'
+BUCKET_PREFIX = 'admission:bucket:'
+STALE_PREFIX = 'admission:stale:'
+# Bumped to drop every stale copy of a user's at once (forget())
+GENERATION_PREFIX = 'admission:generation:'
+DEGRADED_HEADER = 'X-AgriPath-Degraded'
+BUSY_MESSAGE = 'क्षमा करें, अभी बहुत से किसान सवाल पूछ रहे हैं। कृपया कुछ सेकंड बाद फिर से कोशिश करें।'
+
+
+def _setting(name, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+def enabled():
+    return bool(_setting('ADMISSION_ENABLED', True))
+
+
+def limits_for(view_name):
+    """The limits of a view, or None if it isn't admission controlled."""
+    overrides = _setting('ADMISSION_LIMITS', {})
+    if view_name not in DEFAULT_LIMITS and view_name not in overrides:
+        return None
+    limits = dict(DEFAULT_LIMITS.get(view_name, {'concurrency': 1, 'queue': 0, 'queue_timeout': 0.0}))
+    limits.update(overrides.get(view_name) or {})
+    return limits
+
+
+def _cache():
+    return caches[_setting('ADMISSION_CACHE', DEFAULT_CACHE)]
+
+
+# --- Per-process concurrency gates ---
+class Gates:
+    """In-flight and waiting requests of each limited view in this process."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = {}
+        self.waiting = {}
+        self.occupied = 0  # threads held by limited views, running or waiting
+
+    def acquire(self, view_name, limits, max_threads):
+        """Returns 'admitted', 'queued' (admitted after a wait) or why it was shed."""
+        with self.condition:
+            if self.occupied >= max_threads:
+                return 'shed_threads'
+            if self.active.get(view_name, 0) < limits['concurrency']:
+                self._enter(view_name)
+                return 'admitted'
+            if self.waiting.get(view_name, 0) >= limits['queue']:
+                return 'shed_queue_full'
+            self.waiting[view_name] = self.waiting.get(view_name, 0) + 1
+            self.occupied += 1
+            deadline = time.monotonic() + limits['queue_timeout']
+            try:
+                while self.active.get(view_name, 0) >= limits['concurrency']:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'shed_queue_timeout'
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting[view_name] -= 1
+                self.occupied -= 1
+            self._enter(view_name)
+            return 'queued'
+
+    def _enter(self, view_name):
+        self.active[view_name] = self.active.get(view_name, 0) + 1
+        self.occupied += 1
+
+    def release(self, view_name):
+        with self.condition:
+            self.active[view_name] -= 1
+            self.occupied -= 1
+            self.condition.notify_all()
+
+
+GATES = Gates()
+
+
+# --- Token buckets ---
+def take_token(key, rate, burst, now=None):
+    """Takes a token from the bucket at ``key``; returns 0, or the seconds until one is available."""
+    if rate <= 0:
+        return 0
+    now = time.time() if now is None else now
+    store = _cache()
+    # Read-modify-write: two workers racing on one bucket can both take its last token,
+    # which only makes the limit a little loose
+    tokens, updated = store.get(BUCKET_PREFIX + key) or (burst, now)
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # A bucket left alone until it is full again is the same as a missing one
+    store.set(BUCKET_PREFIX + key, (tokens - 1, now), timeout=math.ceil(burst / rate) + 1)
+    return 0
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def check_rates(request):
+    """Returns None if the caller has tokens left, else the seconds until they have."""
+    waits = []
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        waits.append(take_token(f'user:{user.pk}', _setting('ADMISSION_USER_RATE', DEFAULT_USER_RATE),
+                                _setting('ADMISSION_USER_BURST', DEFAULT_USER_BURST)))
+    waits.append(take_token(f'ip:{client_ip(request)}', _setting('ADMISSION_IP_RATE', DEFAULT_IP_RATE),
+                            _setting('ADMISSION_IP_BURST', DEFAULT_IP_BURST)))
+    wait = max(waits)
+    return wait or None
+
+
+# --- Admission ---
+def admit(request, view_name):
+    """Returns None if the request may run (release it with ``release()``), else the response to send."""
+    limits = limits_for(view_name)
+    if limits is None or not enabled():
+        return None
+
+    wait = check_rates(request)
+    if wait is not None:
+        return shed(request, view_name, 'shed_rate', retry_after=wait)
+
+    started = time.monotonic()
+    outcome = GATES.acquire(view_name, limits, _setting('ADMISSION_MAX_THREADS', DEFAULT_MAX_THREADS))
+    if outcome in ('admitted', 'queued'):
+        if outcome == 'queued':
+            metrics.observe('agripath_admission_wait_seconds', time.monotonic() - started, view=view_name)
+        metrics.incr('agripath_admission_total', view=view_name, result=outcome)
+        request.admission_view = view_name
+        return None
+    return shed(request, view_name, outcome)
+
+
+def release(request):
+    view_name = getattr(request, 'admission_view', None)
+    if view_name is not None:
+        del request.admission_view
+        GATES.release(view_name)
+
+
+def _stale_key(request, view_name):
+    user = getattr(request, 'user', None)
+    owner = user.pk if user is not None and user.is_authenticated else 'anonymous'
+    generation = _cache().get(f'{GENERATION_PREFIX}{owner}', 0)
+    return f'{STALE_PREFIX}{view_name}:{owner}:{generation}:{request.get_full_path()}'
+
+
+def remember(request, view_name, response):
+    """Keeps a successful GET page as this user's stale copy."""
+    if request.method != 'GET' or response.status_code != 200 or response.streaming:
+        return
+    try:
+        _cache().set(_stale_key(request, view_name), (response['Content-Type'], response.content),
+                     _setting('ADMISSION_STALE_SECONDS', DEFAULT_STALE_SECONDS))
+    except Exception as e:
+        print(f"Admission stale copy write failed: {e}")
+
+
+def forget(user_id):
+    """Drops every stale copy kept for a user, after something their pages show has changed."""
+    key = f'{GENERATION_PREFIX}{user_id}'
+    try:
+        _cache().incr(key)
+    except ValueError:
+        _cache().set(key, 1, None)
+
+
+def shed(request, view_name, reason, retry_after=None):
+    """The fast answer to a request that wasn't admitted: a stale copy, else a 429."""
+    retry_after = max(1, math.ceil(retry_after or _setting('ADMISSION_RETRY_AFTER', DEFAULT_RETRY_AFTER)))
+    if request.method == 'GET':
+        stale = _cache().get(_stale_key(request, view_name))
+        if stale is not None:
+            metrics.incr('agripath_admission_total', view=view_name, result='stale')
+            content_type, content = stale
+            response = HttpResponse(content, content_type=content_type)
+            response[DEGRADED_HEADER] = 'stale'
+            response['Cache-Control'] = 'private, no-store'
+            return response
+
+    metrics.incr('agripath_admission_total', view=view_name, result=reason)
+    if request.method == 'GET' and 'text/html' in request.headers.get('Accept', 'text/html'):
+        response = HttpResponse(render_to_string('busy.html', {'message': BUSY_MESSAGE, 'retry_after': retry_after},
+                                                 request=request), status=429)
+    else:
+        response = JsonResponse({'error': 'busy', 'response': BUSY_MESSAGE, 'retry_after': retry_after},
+                                status=429)
+    response['Retry-After'] = str(retry_after)
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,368 @@
+# core/advisories.py
+"""
+Recommended crops for every registered farmer, for district officers.
+
+Profiles are read with ``iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL), a chunk at a time, with the coordinates of their places
+(core/places.py). Each chunk costs at most one more query: the stored
+coordinates (core/weather_store.py) of any locations that are neither a
+known district nor a place with coordinates. The model inputs of a chunk
+are built locally from the soil table and climate normals, deduplicated
+(farmers of one district share an input) and scored in one
+``crop_model.predict_batch`` call.
+
+``export()`` yields encoded output per chunk, as CSV or Parquet (one row
+group per chunk; needs pyarrow), so memory stays flat whatever the number
+of profiles. Used by ``manage.py export_advisories`` and the staff-only
+``export_advisories`` view.
+
+Farmers who share a location share a Crop Advisory page, so
+``materialize()`` (``manage.py materialize_advisories``, run nightly)
+scores every distinct profile location in one model call and stores the
+result in LocationAdvisory; ``generate_missing()`` then writes the Gemini
+planting calendars the rows lack, within a call budget. The page is a
+single row lookup (``materialized()``) and only computes live for
+locations the job hasn't seen.
+"""
+import csv
+import io
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from accounts.models import Profile
+from core import crop_model, llm, places, soil, weather_store
+from core.models import LocationAdvisory, PlaceName, WeatherObservation
+
+EXPORT_CHUNK_SIZE = 2000
+COLUMNS = ['user_id', 'phone', 'name', 'location', 'district', 'state', 'crops', 'confidence']
+# Free-text columns and phone numbers; a spreadsheet would run a value starting with one of
+# FORMULA_PREFIXES (or read +91… as a number), so those are written with a leading quote
+TEXT_COLUMNS = ('phone', 'name', 'location')
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# A materialized row is served for this long after it was computed (in case a nightly run fails)
+MATERIALIZED_MAX_AGE = timedelta(days=2)
+ADVISORY_MODEL = 'gemini-2.5-flash-lite'
+# Gemini budget of one materialize_advisories run
+ADVISORY_CALLS_PER_RUN = 200
+ADVISORY_CALLS_PER_MINUTE = 30
+
+
+def profile_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Lists of (user id, username, name, location, (lat, lon)) of profiles with a location, ``chunk_size``
+    at a time; the coordinates are the profile's place's, (None, None) if it has none.
+    """
+    rows = (Profile.objects.exclude(location='').order_by('pk')
+            .values_list('user_id', 'user__username', 'name', 'location', 'place__lat', 'place__lon')
+            .iterator(chunk_size=chunk_size))
+    chunk = []
+    for *row, lat, lon in rows:
+        chunk.append((*row, (lat, lon)))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stored_coordinates(locations):
+    """{location key: (lat, lon)} of the newest stored readings of ``locations``, in one query."""
+    keys = {weather_store.location_key(location) for location in locations}
+    if not keys:
+        return {}
+    coordinates = {}
+    readings = (WeatherObservation.objects
+                .filter(location__in=keys, kind=WeatherObservation.CURRENT, lat__isnull=False, lon__isnull=False)
+                .order_by('location', '-fetched_at')
+                .values_list('location', 'lat', 'lon'))
+    for key, lat, lon in readings:
+        coordinates.setdefault(key, (lat, lon))
+    return coordinates
+
+
+def resolve_inputs(locations, month, coordinates=None):
+    """
+    (soil data, model features or None) of each location; at most one query.
+
+    ``coordinates`` are (lat, lon) of each location's place, or (None, None);
+    a place that isn't a district is looked up by them, else by the
+    coordinates of a stored weather reading.
+    """
+    table = soil.get_table()
+    soils = [table.lookup(location) for location in locations]
+    coordinates = coordinates or [(None, None)] * len(locations)
+    stored = stored_coordinates(
+        [location for location, soil_data, (lat, _) in zip(locations, soils, coordinates)
+         if soil_data['district'] is None and lat is None])
+
+    resolved = []
+    for location, soil_data, place_coordinates in zip(locations, soils, coordinates):
+        lat, lon = None, None
+        if soil_data['district'] is None:
+            lat, lon = place_coordinates
+            if lat is None:
+                lat, lon = stored.get(weather_store.location_key(location), (None, None))
+            if lat is not None:
+                soil_data = table.lookup(location, lat=lat, lon=lon)
+        model_input = crop_model.build_model_input(soil_data, month, lat=lat, lon=lon)
+        features = None if model_input is None else [model_input[f] for f in crop_model.FEATURES]
+        resolved.append((soil_data, features))
+    return resolved
+
+
+def score(inputs):
+    """(crops, confidence) of each features row, None for None rows; one model call for the distinct rows."""
+    scored = [i for i, features in enumerate(inputs) if features is not None]
+    predictions = [None] * len(inputs)
+    if scored and crop_model.ensure_loaded():
+        unique, inverse = np.unique(np.array([inputs[i] for i in scored]), axis=0, return_inverse=True)
+        crops, confidence = crop_model.predict_batch(unique)
+        for i, u in zip(scored, inverse.ravel()):
+            predictions[i] = ([str(crop) for crop in crops[u]], round(float(confidence[u]), 4))
+    return predictions
+
+
+def advise(chunk, month):
+    """Result dicts for one chunk of profile rows; at most one query and one model call."""
+    resolved = resolve_inputs([row[3] for row in chunk], month, [row[4] for row in chunk])
+    predictions = score([features for _, features in resolved])
+    results = []
+    for (user_id, phone, name, location, _), (soil_data, _), prediction in zip(chunk, resolved, predictions):
+        crops, confidence = prediction or (None, None)
+        results.append({
+            'user_id': user_id, 'phone': phone, 'name': name, 'location': location,
+            'district': soil_data['district'], 'state': soil_data['state'],
+            'crops': crops, 'confidence': confidence,
+        })
+    return results
+
+
+def result_chunks(month=None, chunk_size=EXPORT_CHUNK_SIZE):
+    month = month or timezone.localdate().month
+    for chunk in profile_chunks(chunk_size):
+        yield advise(chunk, month)
+
+
+def _csv_cell(column, value):
+    if value is None:
+        return ''
+    if column == 'crops':
+        return ';'.join(value)
+    if column in TEXT_COLUMNS and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_output(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for results in chunks:
+        for result in results:
+            writer.writerow([_csv_cell(column, result[column]) for column in COLUMNS])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class _Drain:
+    """Write-only file that hands over what was written since the last ``take()``."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('user_id', pa.int64()), ('phone', pa.string()), ('name', pa.string()), ('location', pa.string()),
+        ('district', pa.string()), ('state', pa.string()), ('crops', pa.list_(pa.string())),
+        ('confidence', pa.float64()),
+    ])
+
+
+def parquet_output(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    for results in chunks:
+        writer.write_table(pa.Table.from_pylist(results, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()  # the footer
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export(output_format='csv', month=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encoded output, one piece per chunk of profiles."""
+    output = parquet_output if output_format == 'parquet' else csv_output
+    return output(result_chunks(month, chunk_size))
+
+
+# --- Materialized advisories ---
+def planting_prompt(location, crops):
+    crops_list_str = ", ".join(crops)
+    return f"""
+    आप एक विशेषज्ञ भारतीय कृषि वैज्ञानिक हैं।
+    आपके पास एक मॉडल से प्राप्त {location} क्षेत्र के लिए {len(crops)} सबसे उपयुक्त फसलों की सूची है: {crops_list_str}
+    
+    इस सूची का उपयोग करते हुए, एक संवादात्मक, हिंदी में, साल भर की बुवाई की योजना (Year-Round Planting Calendar) बनाएं।
+    
+    तालिका या जटिल संरचना का उपयोग न करें। प्रत्येक फसल के लिए निम्नलिखित जानकारी को एक छोटे पैराग्राफ में दें:
+    1.  फसल का नाम।
+    2.  बुवाई/रोपण के लिए सबसे अच्छा महीना या मौसम (जैसे "खरीफ की शुरुआत में").
+    3.  मुख्य देखभाल टिप या उपयुक्त मिट्टी का प्रकार।
+    """
+
+
+def planting_cache_key(key, crops):
+    """Answer cache key of a planting calendar; ``key`` is the place's (places.key_of())."""
+    return f'advisory:{key}:{", ".join(crops)}'
+
+
+def materialized(location, today=None, place=None):
+    """The stored advisory of ``location`` (in ``place``, if resolved) if it is recent and complete, else None."""
+    today = today or timezone.localdate()
+    return (LocationAdvisory.objects
+            .filter(location=places.key_of(location, place), date__gte=today - MATERIALIZED_MAX_AGE,
+                    month=today.month)
+            .exclude(advisory='')
+            .first())
+
+
+def profile_locations():
+    """{place key: (spelling, (lat, lon))} of every distinct profile place (places.key_of())."""
+    located, unplaced = {}, {}
+    rows = (Profile.objects.exclude(location='').values_list('location', 'place_id', 'place__lat', 'place__lon')
+            .distinct().iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    for location, key, lat, lon in rows:
+        if key is None:
+            fields = places.district_fields(location)
+            if fields is None:
+                unplaced.setdefault(places.spelling(location), location)
+                continue
+            key = fields['key']
+        located.setdefault(key, (location.strip(), (lat, lon)))
+
+    # places.key_of() of the spellings no district matches, their PlaceName rows fetched together
+    spellings = list(unplaced)
+    known = {}
+    for start in range(0, len(spellings), EXPORT_CHUNK_SIZE):
+        known.update(PlaceName.objects.filter(name__in=spellings[start:start + EXPORT_CHUNK_SIZE])
+                     .values_list('name', 'place_id'))
+    for name, location in unplaced.items():
+        key = known.get(name) or weather_store.location_key(location)
+        located.setdefault(key, (location.strip(), (None, None)))
+    return located
+
+
+def materialize(today=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Recomputes the LocationAdvisory row of every profile location.
+
+    All locations are scored in one model call. A row keeps its planting
+    calendar while its crops stay the same; rows not refreshed (locations no
+    profile has any more) are deleted. Returns counts of what was done.
+    """
+    today = today or timezone.localdate()
+    located = profile_locations()
+    keys = list(located)
+    resolved = []
+    for start in range(0, len(keys), chunk_size):
+        batch = [located[key] for key in keys[start:start + chunk_size]]
+        resolved.extend(resolve_inputs([location for location, _ in batch], today.month,
+                                       [coordinates for _, coordinates in batch]))
+    predictions = score([features for _, features in resolved])
+
+    calendars = {location: (crops, advisory) for location, crops, advisory in
+                 LocationAdvisory.objects.values_list('location', 'crops', 'advisory').iterator(chunk_size)}
+    rows = []
+    for key, (soil_data, features), prediction in zip(keys, resolved, predictions):
+        if prediction is None:
+            continue  # not resolvable yet; the page computes it live
+        crops, confidence = prediction
+        old_crops, advisory = calendars.get(key, (None, ''))
+        rows.append(LocationAdvisory(
+            location=key, place=located[key][0][:100], district=soil_data['district'] or '',
+            state=soil_data['state'] or '', date=today, month=today.month,
+            model_input=dict(zip(crop_model.FEATURES, features)), crops=crops, confidence=confidence,
+            advisory=advisory if old_crops == crops else '',
+        ))
+    LocationAdvisory.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True, unique_fields=['location'],
+        update_fields=['place', 'district', 'state', 'date', 'month', 'model_input', 'crops', 'confidence',
+                       'advisory'],
+    )
+    deleted, _ = LocationAdvisory.objects.filter(date__lt=today).delete()
+    return {'locations': len(keys), 'materialized': len(rows), 'deleted': deleted}
+
+
+def generate_missing(model, max_calls=ADVISORY_CALLS_PER_RUN, per_minute=ADVISORY_CALLS_PER_MINUTE):
+    """Writes planting calendars for rows without one, at most ``max_calls`` Gemini calls at ``per_minute``."""
+    pending = (LocationAdvisory.objects.filter(advisory='').order_by('pk')
+               .values_list('pk', 'location', 'place', 'crops'))
+    interval = 60.0 / per_minute
+    next_call = time.monotonic()
+    calls, generated = 0, 0
+    for pk, key, place, crops in pending.iterator():
+        if calls >= max_calls:
+            break
+        if not crops:
+            continue
+        time.sleep(max(0.0, next_call - time.monotonic()))
+        next_call = time.monotonic() + interval
+        calls += 1
+        try:
+            with llm.request_deadline():
+                text = llm.generate_text(model, planting_prompt(place, crops),
+                                         cache_key=planting_cache_key(key, crops)).strip()
+        except Exception as e:
+            print(f"Planting calendar for {place} failed: {e}")
+            continue
+        if text:
+            LocationAdvisory.objects.filter(pk=pk).update(advisory=text)
+            generated += 1
+    remaining = LocationAdvisory.objects.filter(advisory='').count()
+    return {'calls': calls, 'generated': generated, 'remaining': remaining}
@@ -0,0 +1,178 @@
+# core/assets.py
+"""
+Third-party front-end assets, vendored at build time.
+
+Pages used to pull Google Fonts, Swiper (from jsdelivr) and the OpenWeather
+icons (over plain http) from other hosts on every visit. ``build()`` downloads
+them once into ``static/vendor/`` so ``collectstatic`` fingerprints and
+compresses them with everything else and WhiteNoise serves them with
+immutable cache headers:
+
+* fonts: only the weights the templates use, and only the latin and
+  devanagari unicode-range subsets Google splits each weight into
+* Swiper: a pinned release instead of the floating ``@11`` tag
+* weather icons: all OpenWeather codes in one sprite with a ``.wi-<code>`` class each
+
+The same build also generates the responsive image variants (core/images.py).
+It runs as part of ``manage.py collectstatic`` (see
+core/management/commands/collectstatic.py) or on its own with
+``manage.py build_assets``. Files already present are kept, so a build
+without network access still works once they have been fetched.
+"""
+import os
+import re
+from io import BytesIO
+
+import requests
+from django.conf import settings
+
+from core import images
+
+VENDOR_DIR = os.path.join(settings.BASE_DIR, 'static', 'vendor')
+
+# Weights used across templates/*.html and the accounts templates
+FONT_FAMILIES = {
+    'Poppins': (300, 400, 500, 600, 700, 800),
+    'Montserrat': (700,),
+}
+FONT_SUBSETS = ('latin', 'devanagari')
+# Google only serves woff2 with per-subset unicode ranges to browsers it recognises
+FONT_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36')
+
+SWIPER_VERSION = '11.1.14'
+SWIPER_FILES = ('swiper-bundle.min.js', 'swiper-bundle.min.css')
+
+WEATHER_ICON_CODES = ('01', '02', '03', '04', '09', '10', '11', '13', '50')
+WEATHER_ICON_SIZE = 100  # px, the @2x icons
+
+FONT_FACE = re.compile(r'/\*\s*([\w-]+)\s*\*/\s*@font-face\s*\{(.*?)\}', re.S)
+FONT_URL = re.compile(r'url\((https://[^)]+)\)')
+
+
+class AssetBuildError(Exception):
+    pass
+
+
+def _fetch(url, **kwargs):
+    try:
+        response = requests.get(url, timeout=30, **kwargs)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise AssetBuildError(f'Could not download {url}: {e}') from e
+    return response
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(data.encode() if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+
+
+def fonts_css_url():
+    families = '&'.join(
+        f"family={name}:wght@{';'.join(str(w) for w in weights)}" for name, weights in FONT_FAMILIES.items()
+    )
+    return f'https://fonts.googleapis.com/css2?{families}&display=swap'
+
+
+def subset_font_css(css):
+    """Keeps the @font-face blocks of FONT_SUBSETS; returns them with their font URLs and local names."""
+    blocks, downloads = [], []
+    for subset, body in FONT_FACE.findall(css):
+        if subset not in FONT_SUBSETS:
+            continue
+        family = re.search(r"font-family:\s*'([^']+)'", body).group(1)
+        weight = re.search(r'font-weight:\s*(\d+)', body).group(1)
+        style = re.search(r'font-style:\s*(\w+)', body).group(1)
+        url = FONT_URL.search(body).group(1)
+        filename = f"{family.lower().replace(' ', '-')}-{weight}{'-italic' if style == 'italic' else ''}-{subset}.woff2"
+        downloads.append((url, filename))
+        # Relative URLs are rewritten to the hashed names by collectstatic
+        blocks.append(f'/* {subset} */\n@font-face {{{FONT_URL.sub(f"url({filename})", body)}}}\n')
+    return ''.join(blocks), downloads
+
+
+def build_fonts(force=False):
+    directory = os.path.join(VENDOR_DIR, 'fonts')
+    css_path = os.path.join(directory, 'fonts.css')
+    if os.path.exists(css_path) and not force:
+        return []
+    css, downloads = subset_font_css(_fetch(fonts_css_url(), headers={'User-Agent': FONT_USER_AGENT}).text)
+    if not downloads:
+        raise AssetBuildError('Google Fonts returned no woff2 faces for the configured subsets')
+    for url, filename in downloads:
+        _write(os.path.join(directory, filename), _fetch(url).content)
+    # Written last, so an interrupted build is retried next time
+    _write(css_path, css)
+    return [css_path] + [os.path.join(directory, filename) for _, filename in downloads]
+
+
+def build_swiper(force=False):
+    directory = os.path.join(VENDOR_DIR, 'swiper')
+    written = []
+    for filename in SWIPER_FILES:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path) and not force:
+            continue
+        content = _fetch(f'https://cdn.jsdelivr.net/npm/swiper@{SWIPER_VERSION}/{filename}').content
+        # The bundles end with a sourceMappingURL comment; the map isn't vendored
+        content = re.sub(rb'\n?/[/*][#@] sourceMappingURL=\S+(?: \*/)?\s*$', b'\n', content)
+        _write(path, content)
+        written.append(path)
+    return written
+
+
+def weather_icon_names():
+    return [f'{code}{time_of_day}' for code in WEATHER_ICON_CODES for time_of_day in ('d', 'n')]
+
+
+def sprite_css(names, image='weather-icons.png'):
+    """One class per icon; percentage offsets so the sprite scales with the element's size."""
+    count = len(names)
+    lines = [
+        '/* OpenWeather condition icons, built by core/assets.py */',
+        f'.wi {{ display: inline-block; width: {WEATHER_ICON_SIZE // 2}px; height: {WEATHER_ICON_SIZE // 2}px; '
+        f'vertical-align: middle; background: url({image}) no-repeat 0 0; background-size: {count * 100}% 100%; }}',
+    ]
+    for index, name in enumerate(names):
+        offset = index * 100 / (count - 1) if count > 1 else 0
+        lines.append(f'.wi-{name} {{ background-position: {offset:g}% 0; }}')
+    return '\n'.join(lines) + '\n'
+
+
+def build_weather_icons(force=False):
+    from PIL import Image
+
+    directory = os.path.join(VENDOR_DIR, 'weather-icons')
+    image_path = os.path.join(directory, 'weather-icons.png')
+    css_path = os.path.join(directory, 'weather-icons.css')
+    if os.path.exists(image_path) and os.path.exists(css_path) and not force:
+        return []
+    names = weather_icon_names()
+    sprite = Image.new('RGBA', (WEATHER_ICON_SIZE * len(names), WEATHER_ICON_SIZE))
+    for index, name in enumerate(names):
+        icon = Image.open(BytesIO(_fetch(f'https://openweathermap.org/img/wn/{name}@2x.png').content)).convert('RGBA')
+        if icon.size != (WEATHER_ICON_SIZE, WEATHER_ICON_SIZE):
+            icon = icon.resize((WEATHER_ICON_SIZE, WEATHER_ICON_SIZE))
+        sprite.paste(icon, (index * WEATHER_ICON_SIZE, 0))
+    buffer = BytesIO()
+    sprite.save(buffer, 'PNG', optimize=True)
+    _write(image_path, buffer.getvalue())
+    _write(css_path, sprite_css(names))
+    return [image_path, css_path]
+
+
+BUILDERS = {
+    'fonts': build_fonts,
+    'swiper': build_swiper,
+    'weather-icons': build_weather_icons,
+    'responsive-images': images.build_variants,
+}
+
+
+def build(force=False, only=None):
+    """Runs every builder (or the ``only`` subset); returns {name: [paths written]}."""
+    return {name: builder(force=force) for name, builder in BUILDERS.items() if not only or name in only}
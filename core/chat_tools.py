@@ -0,0 +1,213 @@
+# core/chat_tools.py
+"""
+The tool-routing chat engine (``CHAT_ENGINE = 'tools'``).
+
+The routed engine in core/views.py classifies every turn with a Gemini call
+before its handler runs, so a weather question costs three Gemini calls in
+a row (classify, extract the city, answer) around the OpenWeather call.
+This engine sends the turn once, with the app's data sources declared as
+functions. Gemini either answers or asks for the functions it needs, with
+their arguments (the city it would otherwise have been asked to extract).
+Those run here, in parallel when there are several, and one follow-up call
+turns their results into the answer: at most two Gemini calls per turn, one
+when no data is needed.
+
+The functions read the app's own data, and OpenWeather for a place without
+a recent stored reading: current weather, crops scored by core.crop_model
+(the nightly materialized row when there is one), and schemes from the
+Policies page's cached answer for the place or the central schemes that
+apply in every state.
+"""
+import contextvars
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.utils import timezone
+
+from core import advisories, llm, metrics, places
+
+PLACE_PARAMETERS = {
+    'type': 'object',
+    'properties': {
+        'place': {
+            'type': 'string',
+            'description': "City, village or district in India, in English (e.g. 'Delhi'). Leave it out for the "
+                           "farmer's own location.",
+        },
+    },
+}
+FUNCTION_DECLARATIONS = [
+    {
+        'name': 'get_weather',
+        'description': 'Current weather of a place: temperature (°C), sky, humidity (%) and wind speed (m/s).',
+        'parameters': PLACE_PARAMETERS,
+    },
+    {
+        'name': 'recommend_crops',
+        'description': "Crops that suit the soil of a place and this month's climate there, best first.",
+        'parameters': PLACE_PARAMETERS,
+    },
+    {
+        'name': 'list_schemes',
+        'description': 'Government schemes for farmers of a place: name, description, benefits and official link.',
+        'parameters': PLACE_PARAMETERS,
+    },
+]
+TOOLS = {'function_declarations': FUNCTION_DECLARATIONS}
+# The follow-up answers from the results and may not ask for more; the same TOOLS are
+# sent with it so both calls start with the same prefix
+FOLLOW_UP_CONFIG = {'function_calling_config': {'mode': 'NONE'}}
+MAX_PARALLEL_CALLS = 4
+NO_PLACE = "no place given and the farmer's profile has no location; ask the farmer where they farm"
+
+
+# --- Functions ---
+def get_weather(place):
+    from core.views import get_weather_data  # core.views imports this module
+
+    weather, error = get_weather_data(place)
+    return {'error': error} if error else weather
+
+
+def recommend_crops(place):
+    stored = advisories.materialized(place)
+    if stored is not None:
+        return {'place': place, 'crops': stored.crops, 'confidence': stored.confidence}
+    (soil_data, features), = advisories.resolve_inputs([place], timezone.localdate().month)
+    prediction, = advisories.score([features])
+    if prediction is None:
+        return {'error': f"no soil or climate data for '{place}'"}
+    crops, confidence = prediction
+    return {'place': place, 'district': soil_data['district'], 'crops': crops, 'confidence': confidence}
+
+
+def _parse_schemes(text):
+    text = re.sub(r'^```(json)?|```$', '', text.strip()).strip()
+    try:
+        schemes = json.loads(text)
+    except ValueError:
+        return None
+    return schemes if isinstance(schemes, list) else None
+
+
+def list_schemes(place):
+    # Central schemes, the Policies page's fallback; core can't import home at module level
+    from home.views import FALLBACK_POLICIES
+
+    cached = llm.cached_answer(f'policies:{places.key_of(place)}')
+    schemes = _parse_schemes(cached) if cached else None
+    metrics.cache_event('chat_schemes', schemes is not None)
+    if schemes is None:
+        return {'place': place, 'schemes': FALLBACK_POLICIES, 'note': 'central schemes, open to farmers in every state'}
+    return {'place': place, 'schemes': schemes}
+
+
+FUNCTIONS = {
+    'get_weather': get_weather,
+    'recommend_crops': recommend_crops,
+    'list_schemes': list_schemes,
+}
+
+
+def run_call(name, args, location=''):
+    """The result of one function call; a failure is a result too, so Gemini can tell the farmer."""
+    function = FUNCTIONS.get(name)
+    place = str(args.get('place') or '').strip() or location
+    if function is None:
+        result = {'error': f'unknown function {name}'}
+    elif not place:
+        result = {'error': NO_PLACE}
+    else:
+        try:
+            with metrics.span(f'tool_{name}'):
+                result = function(place)
+        except Exception as e:
+            print(f"Chat tool {name}({place!r}) failed: {e}")
+            result = {'error': f'{name} is not available right now'}
+    metrics.incr('agripath_chat_tool_calls_total', tool=name, result='error' if 'error' in result else 'ok')
+    return result
+
+
+def _run_in_thread(name, args, location):
+    try:
+        return run_call(name, args, location)
+    finally:
+        connections.close_all()  # the connections this short-lived thread opened
+
+
+def run_calls(calls, location=''):
+    """Results of ``[(name, args), ...]``, in order; several calls run at once."""
+    if len(calls) == 1:
+        name, args = calls[0]
+        return [run_call(name, args, location)]
+    with ThreadPoolExecutor(max_workers=min(len(calls), MAX_PARALLEL_CALLS), thread_name_prefix='chat-tool') as pool:
+        # Copies of the request's context keep the calls in its Server-Timing spans and deadline
+        futures = [pool.submit(contextvars.copy_context().run, _run_in_thread, name, args, location)
+                   for name, args in calls]
+        return [future.result() for future in futures]
+
+
+# --- Engine ---
+def function_calls(parts):
+    calls = []
+    for part in parts:
+        call = getattr(part, 'function_call', None)
+        if call is not None and call.name:
+            calls.append((call.name, dict(call.args or {})))
+    return calls
+
+
+def _text(parts):
+    return ''.join(getattr(part, 'text', '') or '' for part in parts).strip()
+
+
+def summarize(calls, results):
+    """A plain answer from the results, for when the follow-up call fails or runs out of time."""
+    lines = []
+    for (name, _), result in zip(calls, results):
+        if 'error' in result:
+            continue
+        if name == 'get_weather':
+            lines.append(f"{result.get('city')} में अभी तापमान {result['temperature']}°C है, "
+                         f"मौसम {result['description']} है और नमी {result['humidity']}% है।")
+        elif name == 'recommend_crops':
+            lines.append(f"{result['place']} के लिए उपयुक्त फसलें: {', '.join(result['crops'])}।")
+        elif name == 'list_schemes':
+            lines.append('आपके लिए ये योजनाएँ हैं: ' + ', '.join(s.get('name', '') for s in result['schemes']) + '।')
+    return '\n'.join(lines)
+
+
+def respond(model, contents, system_instruction=None, location=''):
+    """
+    The answer to the last turn of ``contents``, with at most two Gemini calls.
+
+    ``location`` (the farmer's profile location) is used by calls that name
+    no place. ``llm.LLMTimeout`` is raised if the first call runs out of
+    budget; when the follow-up fails, the answer is made from the results.
+    """
+    with metrics.span('generate'):
+        parts = llm.generate_parts(model, contents, tools=TOOLS, system_instruction=system_instruction)
+    calls = function_calls(parts)
+    if not calls:
+        return _text(parts)
+
+    with metrics.span('tools'):
+        results = run_calls(calls, location)
+    follow_up = [
+        *contents,
+        {'role': 'model', 'parts': list(parts)},
+        {'role': 'user', 'parts': [{'function_response': {'name': name, 'response': result}}
+                                   for (name, _), result in zip(calls, results)]},
+    ]
+    try:
+        with metrics.span('follow_up'):
+            text = _text(llm.generate_parts(model, follow_up, tools=TOOLS, tool_config=FOLLOW_UP_CONFIG,
+                                            system_instruction=system_instruction))
+    except llm.LLMTimeout:
+        text = ''
+    except Exception as e:
+        print(f"GEMINI API ERROR in the follow-up call: {e}")
+        text = ''
+    return text or summarize(calls, results)
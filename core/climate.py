@@ -0,0 +1,150 @@
+# core/climate.py
+"""
+Monthly climate normals on a 0.5° grid over India.
+
+``data/climate_normals.npy`` holds, for every grid cell and month, the normal
+mean temperature, relative humidity, rainfall and the rainfall of the
+cropping season that month belongs to. It is read with ``mmap_mode='r'``,
+so a lookup touches one page of the file and gunicorn workers share the
+same page cache instead of each loading a copy.
+
+The grid is built from the station normals in ``data/climate_stations.csv``
+by inverse-distance weighting (``manage.py build_climate_grid``). With it
+the crop model input for a location and month can be built locally;
+a live OpenWeather reading, when there is one, only nudges the normals
+(see ``model_weather``).
+"""
+import os
+
+import numpy as np
+
+NORMALS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'climate_normals.npy')
+STATIONS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'climate_stations.csv')
+
+# Cell (0, 0) is centred on (GRID_LAT0, GRID_LON0)
+GRID_LAT0, GRID_LON0 = 6.0, 68.0
+GRID_STEP = 0.5
+GRID_SHAPE = (64, 60)  # 6.0–37.5°N, 68.0–97.5°E
+VARIABLES = ('temperature', 'humidity', 'rainfall', 'season_rainfall')
+
+# Kharif, rabi and zaid, by calendar month
+SEASONS = {
+    'kharif': (6, 7, 8, 9),
+    'rabi': (10, 11, 12, 1, 2),
+    'zaid': (3, 4, 5),
+}
+SEASON_OF_MONTH = {month: season for season, months in SEASONS.items() for month in months}
+
+IDW_NEIGHBOURS = 6
+IDW_POWER = 2
+# Share of a live reading in the temperature/humidity fed to the model
+LIVE_WEIGHT = 0.5
+
+_grid = None
+
+
+def get_grid():
+    """The normals array, memory-mapped; None if the file hasn't been built."""
+    global _grid
+    if _grid is None:
+        if not os.path.exists(NORMALS_FILE):
+            return None
+        _grid = np.load(NORMALS_FILE, mmap_mode='r')
+    return _grid
+
+
+def cell(lat, lon):
+    """Grid indices of the cell containing (lat, lon), clamped to the grid."""
+    i = int(round((lat - GRID_LAT0) / GRID_STEP))
+    j = int(round((lon - GRID_LON0) / GRID_STEP))
+    return min(max(i, 0), GRID_SHAPE[0] - 1), min(max(j, 0), GRID_SHAPE[1] - 1)
+
+
+def normals(lat, lon, month):
+    """Normals of the cell at (lat, lon) for ``month`` (1–12); None without a grid."""
+    grid = get_grid()
+    if grid is None:
+        return None
+    i, j = cell(lat, lon)
+    values = grid[i, j]  # (12, len(VARIABLES)); one small read from the mapped file
+    row = dict(zip(VARIABLES, (float(v) for v in values[month - 1])))
+    row['annual_rainfall'] = float(values[:, VARIABLES.index('rainfall')].sum())
+    row['season'] = SEASON_OF_MONTH[month]
+    return row
+
+
+def model_weather(lat, lon, month, live=None):
+    """
+    Temperature, humidity and rainfall for the crop model.
+
+    Rainfall is the mean monthly rainfall of the season ``month`` is in,
+    the scale of the model's training data. ``live`` (a current weather
+    reading with temperature and humidity) is blended in by LIVE_WEIGHT.
+    """
+    row = normals(lat, lon, month)
+    if row is None:
+        return None
+    weather = {
+        'temperature': row['temperature'],
+        'humidity': row['humidity'],
+        'rainfall': row['season_rainfall'] / len(SEASONS[row['season']]),
+    }
+    if live:
+        for key in ('temperature', 'humidity'):
+            if live.get(key) is not None:
+                weather[key] = (1 - LIVE_WEIGHT) * weather[key] + LIVE_WEIGHT * float(live[key])
+    return {key: round(value, 1) for key, value in weather.items()}
+
+
+# --- Building the grid ---
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def load_stations(path=STATIONS_FILE):
+    """Station coordinates (n, 2) and normals (n, 12, 3: temperature, humidity, rainfall)."""
+    import csv
+
+    stations = {}
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            station = stations.setdefault(row['station'], {'lat': float(row['lat']), 'lon': float(row['lon'])})
+            station[row['variable']] = [float(row[f'm{month}']) for month in range(1, 13)]
+    coords = np.array([[s['lat'], s['lon']] for s in stations.values()])
+    values = np.array([[s['temperature'], s['humidity'], s['rainfall']] for s in stations.values()])
+    return coords, values.transpose(0, 2, 1)
+
+
+def build_grid(coords, station_values):
+    """Interpolates station normals onto the grid; returns a float32 array (lat, lon, 12, VARIABLES)."""
+    from scipy.spatial import cKDTree
+
+    lats = GRID_LAT0 + GRID_STEP * np.arange(GRID_SHAPE[0])
+    lons = GRID_LON0 + GRID_STEP * np.arange(GRID_SHAPE[1])
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing='ij')
+    points = _unit_vectors(grid_lat.ravel(), grid_lon.ravel())
+
+    k = min(IDW_NEIGHBOURS, len(coords))
+    distances, neighbours = cKDTree(_unit_vectors(coords[:, 0], coords[:, 1])).query(points, k=k)
+    distances, neighbours = distances.reshape(len(points), k), neighbours.reshape(len(points), k)
+    weights = 1.0 / np.maximum(distances, 1e-9) ** IDW_POWER
+    weights /= weights.sum(axis=1, keepdims=True)
+    monthly = np.einsum('pk,pkmv->pmv', weights, station_values[neighbours])  # (cells, 12, 3)
+
+    season_rainfall = np.zeros(monthly.shape[:2])
+    for months in SEASONS.values():
+        columns = [month - 1 for month in months]
+        season_rainfall[:, columns] = monthly[:, columns, 2].sum(axis=1, keepdims=True)
+    grid = np.concatenate([monthly, season_rainfall[..., None]], axis=2)
+    return grid.reshape(*GRID_SHAPE, 12, len(VARIABLES)).astype(np.float32)
+
+
+def build(path=NORMALS_FILE):
+    global _grid
+    grid = build_grid(*load_stations())
+    tmp_path = f'{path}.tmp.npy'
+    np.save(tmp_path, grid)
+    os.replace(tmp_path, path)
+    _grid = None
+    return grid
@@ -0,0 +1,199 @@
+# core/compression.py
+"""
+Brotli/gzip compression of the responses the app renders.
+
+WhiteNoise serves static files precompressed; everything else (pages such
+as the fertilizer catalog with its inline data, chat JSON, CSV and
+JSON-lines streams) is compressed here, by CompressionMiddleware
+(core/middleware.py). Brotli is used when the client accepts it and gzip
+otherwise. Bodies under ``COMPRESSION_MIN_BYTES``, media that is already
+compressed (images, parquet) and partial content are sent as they are.
+
+Streaming responses are compressed chunk by chunk, and every chunk is
+flushed, so a client still gets each chunk as the view yields it.
+
+Compression side channels (BREACH): a page that renders a CSRF token is
+never compressed. Django masks the token per response, but such pages (the
+chat page, the profile and OTP forms) also show things a cross-site
+attacker could guess at byte by byte, next to text the attacker can
+inject (``process_voice`` is CSRF-exempt and its input is shown back on
+the chat page). Those pages are small anyway.
+
+The bytes of every text response are counted per view and encoding as
+``agripath_response_bytes_total``, and before compression as
+``agripath_response_uncompressed_bytes_total``.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from core import metrics
+
+# --- Defaults (overridable from settings) ---
+# Smaller bodies fit in one TCP segment compressed or not, so compressing them saves nothing
+DEFAULT_MIN_BYTES = 1024
+# Quality 4-5 compresses better than gzip -6 at about the same speed; 11 (the default) is for static files
+DEFAULT_BROTLI_QUALITY = 5
+DEFAULT_GZIP_LEVEL = 6
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+# Preferred first when the client accepts several at the same q-value
+ENCODINGS = ('br', 'gzip')
+
+
+def _setting(name, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def accepted_encodings(header):
+    """{coding: q} of an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header):
+    """The coding to send a body in for this Accept-Encoding header, or None for identity."""
+    accepted = accepted_encodings(header or '')
+    available = [coding for coding in ENCODINGS if coding != 'br' or _brotli() is not None]
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(response):
+    if response.has_header('Content-Encoding') or response.has_header('Content-Range') or response.status_code == 206:
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def renders_token(response):
+    # CsrfViewMiddleware sets the cookie again on every response a token was rendered into
+    return settings.CSRF_COOKIE_NAME in response.cookies
+
+
+def _compressor(coding):
+    if coding == 'br':
+        compressor = _brotli().Compressor(quality=_setting('COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY))
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits 31: a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(_setting('COMPRESSION_GZIP_LEVEL', DEFAULT_GZIP_LEVEL), zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress(data, coding):
+    process, _, finish = _compressor(coding)
+    return process(data) + finish()
+
+
+def compress_chunks(chunks, coding):
+    """Compresses an iterable of byte chunks, flushing after each one."""
+    process, flush, finish = _compressor(coding)
+    for chunk in chunks:
+        data = process(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+async def compress_chunks_async(chunks, coding):
+    process, flush, finish = _compressor(coding)
+    async for chunk in chunks:
+        data = process(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def _record(view, coding, sent, raw):
+    metrics.incr('agripath_response_bytes_total', sent, view=view, encoding=coding)
+    metrics.incr('agripath_response_uncompressed_bytes_total', raw, view=view)
+
+
+def _counted(chunks, view, coding):
+    """Passes a stream through, compressing it unless ``coding`` is identity, and counts both sizes at the end."""
+    raw = sent = 0
+
+    def measured():
+        nonlocal raw
+        for chunk in chunks:
+            raw += len(chunk)
+            yield chunk
+
+    try:
+        out = measured() if coding == 'identity' else compress_chunks(measured(), coding)
+        for chunk in out:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        _record(view, coding, sent, raw)
+
+
+def process(request, response, view):
+    """Compresses ``response`` in place if the client and the response allow it; returns it."""
+    if not compressible(response):
+        return response
+    if not response.streaming and len(response.content) < _setting('COMPRESSION_MIN_BYTES', DEFAULT_MIN_BYTES):
+        _record(view, 'identity', len(response.content), len(response.content))
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+    if renders_token(response):
+        coding = None
+    if response.streaming:
+        if response.is_async:
+            # Not counted: an async stream is consumed outside this middleware's thread
+            if coding is not None:
+                response.streaming_content = compress_chunks_async(response.streaming_content, coding)
+        else:
+            response.streaming_content = _counted(response.streaming_content, view, coding or 'identity')
+        if coding is not None:
+            # The compressed length is only known once the stream ends
+            del response.headers['Content-Length']
+    else:
+        raw = len(response.content)
+        if coding is not None:
+            with metrics.span('compress'):
+                compressed = compress(response.content, coding)
+            if len(compressed) < raw:
+                response.content = compressed
+                response['Content-Length'] = str(len(compressed))
+            else:
+                coding = None
+        _record(view, coding or 'identity', len(response.content), raw)
+
+    if coding is not None:
+        # The compressed bytes differ, so a strong validator can only be kept as a weak one
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+    return response
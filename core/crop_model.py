@@ -1,10 +1,10 @@
 # core/crop_model.py
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier # More robust than Decision Tree
-import joblib
-import random
+# pandas, sklearn and joblib are imported, and the forest loaded, on first use
+# (ensure_loaded), so commands and processes that never predict don't pay for them
+import numpy as np
 import os
+import threading
+from core import climate, metrics, soil
 
 # --- Configuration ---
 DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'Crop_recommendation.csv')
@@ -14,18 +14,34 @@ FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
 CROP_PREDICTOR_MODEL = None
 CROP_LABEL_ENCODER = None
 ALL_CROPS = []
+# Crop name of each column of predict_proba's output
+CROP_CLASS_NAMES = None
+# Crops below this probability aren't suggested; at most TOP_CROPS are
+MIN_PROBABILITY = 0.05
+TOP_CROPS = 8
+_load_lock = threading.Lock()
 
 # --- Functions ---
 
+def _set_class_names():
+    global CROP_CLASS_NAMES
+    CROP_CLASS_NAMES = CROP_LABEL_ENCODER.inverse_transform(CROP_PREDICTOR_MODEL.classes_)
+
+
 def load_and_train_model():
     """Loads data, trains a model, and saves it, or loads the saved model."""
     global CROP_PREDICTOR_MODEL, CROP_LABEL_ENCODER, ALL_CROPS
+    import joblib
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.ensemble import RandomForestClassifier # More robust than Decision Tree
     
     if os.path.exists(MODEL_FILE) and os.path.exists(LABEL_ENCODER_FILE):
         print("✅ Crop Model: Loading pre-trained model and encoder.")
         CROP_PREDICTOR_MODEL = joblib.load(MODEL_FILE)
         CROP_LABEL_ENCODER = joblib.load(LABEL_ENCODER_FILE)
         ALL_CROPS = list(CROP_LABEL_ENCODER.classes_)
+        _set_class_names()
         return
 
     # 1. Load Data
@@ -49,54 +65,96 @@ def load_and_train_model():
     model = RandomForestClassifier(n_estimators=100, random_state=42)
     model.fit(X, y)
     CROP_PREDICTOR_MODEL = model
+    _set_class_names()
     
     # 4. Save Model and Encoder
     joblib.dump(CROP_PREDICTOR_MODEL, MODEL_FILE)
     joblib.dump(CROP_LABEL_ENCODER, LABEL_ENCODER_FILE)
 
 
-def get_soil_data_by_location(location):
-    """Mocks/Estimates all required features based on location."""
-    # (This function remains a robust mock for NPK, pH, and Rainfall)
+def ensure_loaded():
+    """The forest, loaded (or trained) on the first call; None if that failed."""
+    if CROP_PREDICTOR_MODEL is None:
+        with _load_lock:
+            if CROP_PREDICTOR_MODEL is None:
+                load_and_train_model()
+    return CROP_PREDICTOR_MODEL
+
+
+def get_soil_data_by_location(location, lat=None, lon=None):
+    """N, P, K, pH and rainfall of the district at ``location`` (see core/soil.py)."""
+    return soil.get_table().lookup(location, lat=lat, lon=lon)
+
+
+def build_model_input(soil_data, month, lat=None, lon=None, live_weather=None):
+    """
+    Model features from a district's soil and the climate normals for ``month``.
+
+    The normals are taken at (lat, lon), by default the district's centroid;
+    ``live_weather`` (a current reading) adjusts them if given. Without the
+    normals grid the live reading is used as is; None if there is neither.
+    """
+    lat = soil_data.get('lat') if lat is None else lat
+    lon = soil_data.get('lon') if lon is None else lon
+    weather = climate.model_weather(lat, lon, month, live=live_weather) if lat is not None else None
+    if weather is None:
+        if not live_weather:
+            return None
+        weather = {'temperature': live_weather['temperature'], 'humidity': live_weather['humidity'],
+                   'rainfall': soil_data['rainfall']}
     return {
-        'N': random.randint(50, 100), 
-        'P': random.randint(30, 60), 
-        'K': random.randint(20, 50),
-        'temperature': random.uniform(20, 35), # Real-time from OWM
-        'humidity': random.uniform(50, 90),     # Real-time from OWM
-        'ph': random.uniform(5.5, 7.5),
-        'rainfall': random.uniform(100, 200)   # Estimated Annual Rainfall
+        'N': soil_data['N'],
+        'P': soil_data['P'],
+        'K': soil_data['K'],
+        'temperature': weather['temperature'],
+        'humidity': weather['humidity'],
+        'ph': soil_data['ph'],
+        'rainfall': weather['rainfall'],
     }
 
 
+def rank_crops(probabilities):
+    """
+    Top crops of each row of a predict_proba matrix, most likely first.
+
+    Keeps at most TOP_CROPS crops above MIN_PROBABILITY per row; returns the
+    crop lists and each row's highest probability.
+    """
+    probabilities = np.asarray(probabilities)
+    # Stable, so equally likely crops stay in class order
+    order = np.argsort(-probabilities, axis=1, kind='stable')[:, :TOP_CROPS]
+    top = np.take_along_axis(probabilities, order, axis=1)
+    keep = top > MIN_PROBABILITY
+    names = CROP_CLASS_NAMES[order]
+    crops = [list(row_names[row_keep]) for row_names, row_keep in zip(names, keep)]
+    return crops, top[:, 0]
+
+
+def predict_batch(features):
+    """
+    Ranked crops for many inputs in one model call.
+
+    ``features`` is an (n, 7) array (or list of rows) in FEATURES order;
+    returns (crop lists, top probabilities) as from ``rank_crops``.
+    """
+    import pandas as pd
+
+    model = ensure_loaded()
+    input_df = pd.DataFrame(np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURES)), columns=FEATURES)
+    with metrics.span('crop_model'):
+        probabilities = model.predict_proba(input_df)
+    return rank_crops(probabilities)
+
+
 def predict_suitable_crops(input_data):
-    """Predicts suitability scores for all crops and returns the top 5."""
-    if not CROP_PREDICTOR_MODEL:
+    """Predicts suitability scores for all crops and returns the top 8."""
+    if not ensure_loaded():
         return []
         
     try:
-        input_df = pd.DataFrame([input_data], columns=FEATURES)
-        
-        # Use predict_proba to get the likelihood for every single crop type
-        probabilities = CROP_PREDICTOR_MODEL.predict_proba(input_df)[0]
-        
-        # Create a list of (crop_name, probability) tuples
-        suitability_scores = []
-        for i, prob in enumerate(probabilities):
-            # Only include crops with a reasonable chance (e.g., > 10%)
-            if prob > 0.05: # Changed threshold to 5% to include more options
-                crop_name = CROP_LABEL_ENCODER.inverse_transform([CROP_PREDICTOR_MODEL.classes_[i]])[0]
-                suitability_scores.append((crop_name, prob))
-        
-        # Sort by probability (descending) and return the top 8
-        suitability_scores.sort(key=lambda item: item[1], reverse=True)
-        
-        # Return a list of only the top 8 crop names
-        return [item[0] for item in suitability_scores[:8]]
+        crops, _ = predict_batch([[input_data[name] for name in FEATURES]])
+        return [str(crop) for crop in crops[0]]
         
     except Exception as e:
         print(f"🔴 Prediction Error: {e}")
         return ["Prediction Failed"]
-
-# Execute the model loading when the module is imported
-load_and_train_model()
\ No newline at end of file
@@ -0,0 +1,180 @@
+# core/images.py
+"""
+Responsive variants of the large images in static/.
+
+``build_variants()`` resizes each image in RESPONSIVE_IMAGES to a few widths
+and encodes every width as AVIF, WebP and the source format, written to
+``static/responsive/`` together with a manifest. It runs with the other
+asset builders before ``collectstatic`` (see core/assets.py), so the
+variants get hashed and cached like any other static file.
+
+Templates use ``{% responsive_image %}`` (core/templatetags/responsive.py),
+which reads the manifest and emits a <picture> with srcset/sizes and lazy
+loading. ``manage.py image_report`` reports the bytes saved per page.
+"""
+import hashlib
+import json
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+
+SOURCE_DIR = os.path.join(settings.BASE_DIR, 'static')
+OUTPUT_DIR = os.path.join(SOURCE_DIR, 'responsive')
+MANIFEST_NAME = 'manifest.json'
+
+# Source image -> widths (px) to generate; widths at or above the original are skipped.
+# Only images a template shows through {% responsive_image %} belong here.
+CAROUSEL_WIDTHS = (480, 768, 1200, 1800)
+RESPONSIVE_IMAGES = {
+    'carousel-image-1.jpg': CAROUSEL_WIDTHS,
+    'carousel-image-2.jpg': CAROUSEL_WIDTHS,
+    'carousel-image-3.jpg': CAROUSEL_WIDTHS,
+    'carousel-image-4.jpg': CAROUSEL_WIDTHS,
+}
+
+# Preferred first; the browser takes the first <source> type it supports
+MODERN_FORMATS = ('avif', 'webp')
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 75, 'method': 6},
+    'jpeg': {'quality': 78, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+
+def _supported_formats():
+    from PIL import features
+    return [fmt for fmt in MODERN_FORMATS if features.check(fmt)]
+
+
+def _digest(path):
+    with open(path, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def manifest_path():
+    return os.path.join(OUTPUT_DIR, MANIFEST_NAME)
+
+
+def load_manifest():
+    try:
+        with open(manifest_path()) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def build_image(name, widths, formats):
+    """Writes the variants of one image; returns its manifest entry."""
+    from PIL import Image, ImageOps
+
+    source = os.path.join(SOURCE_DIR, name)
+    stem, ext = os.path.splitext(name)
+    fallback = 'png' if ext.lower() == '.png' else 'jpeg'
+    with Image.open(source) as original:
+        full_width, full_height = original.size
+        # Let the JPEG decoder downscale while decoding; a 6000px photo is never needed in full
+        original.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') and fallback == 'png' else 'RGB')
+    # Keep at least one variant, even for images smaller than every width
+    targets = [w for w in widths if w < image.width] or [image.width]
+
+    variants = []
+    for width in targets:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        for fmt in list(formats) + [fallback]:
+            data = _encode(resized, fmt)
+            filename = f'{stem}-{width}.{EXTENSIONS[fmt]}'
+            with open(os.path.join(OUTPUT_DIR, filename), 'wb') as fh:
+                fh.write(data)
+            variants.append({'format': fmt, 'width': width, 'height': height,
+                             'path': f'responsive/{filename}', 'bytes': len(data)})
+    return {
+        'source_sha256': _digest(source),
+        'source_bytes': os.path.getsize(source),
+        'width': full_width,
+        'height': full_height,
+        'fallback': fallback,
+        'variants': variants,
+    }
+
+
+def build_variants(force=False):
+    """Builds the variants of every image whose source changed; returns the paths written."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    manifest = load_manifest()
+    formats = _supported_formats()
+    written = []
+    for name, widths in RESPONSIVE_IMAGES.items():
+        source = os.path.join(SOURCE_DIR, name)
+        if not os.path.exists(source):
+            print(f"Responsive images: {name} not found, skipping.")
+            continue
+        entry = manifest.get(name)
+        if (not force and entry and entry['source_sha256'] == _digest(source)
+                and {v['format'] for v in entry['variants']} >= set(formats)):
+            continue
+        manifest[name] = build_image(name, widths, formats)
+        written.extend(os.path.join(SOURCE_DIR, v['path']) for v in manifest[name]['variants'])
+    if written:
+        with open(manifest_path(), 'w') as fh:
+            json.dump(manifest, fh, indent=1, sort_keys=True)
+        written.append(manifest_path())
+    return written
+
+
+# --- Bytes saved report ---
+# What a phone (360 CSS px at 2x) and a desktop (the 900px carousel at 1x) would download
+VIEWPORTS = {'mobile': 720, 'desktop': 900}
+TEMPLATE_TAG = re.compile(r"{%\s*responsive_image\s+['\"]([^'\"]+)['\"]")
+
+
+def chosen_variant(entry, needed_width, formats=MODERN_FORMATS):
+    """The variant a browser supporting ``formats`` picks for a slot ``needed_width`` device px wide."""
+    for fmt in list(formats) + [entry['fallback']]:
+        candidates = sorted((v for v in entry['variants'] if v['format'] == fmt), key=lambda v: v['width'])
+        if candidates:
+            return next((v for v in candidates if v['width'] >= needed_width), candidates[-1])
+    return None
+
+
+def template_images(template_dirs):
+    """Maps each template to the images it renders with {% responsive_image %}."""
+    pages = {}
+    for directory in template_dirs:
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if not filename.endswith('.html'):
+                    continue
+                with open(os.path.join(root, filename), encoding='utf-8') as fh:
+                    names = TEMPLATE_TAG.findall(fh.read())
+                if names:
+                    pages[os.path.relpath(os.path.join(root, filename), directory)] = names
+    return pages
+
+
+def page_report(pages, manifest=None):
+    manifest = load_manifest() if manifest is None else manifest
+    report = {}
+    for page, names in pages.items():
+        original = sum(manifest[name]['source_bytes'] for name in names if name in manifest)
+        row = {'images': len(names), 'original_bytes': original}
+        for viewport, width in VIEWPORTS.items():
+            chosen = [chosen_variant(manifest[name], width) for name in names if name in manifest]
+            row[f'{viewport}_bytes'] = sum(v['bytes'] for v in chosen if v)
+            row[f'{viewport}_saved_bytes'] = original - row[f'{viewport}_bytes']
+        report[page] = row
+    return report
@@ -0,0 +1,414 @@
+# core/llm.py
+"""
+Deadline-aware Gemini calls.
+
+Every call carries a timeout that is capped by whatever is left of the
+current request's budget. If the first attempt is slower than the recent
+latency percentile, a hedged duplicate goes out and the first answer wins.
+When the budget runs out the caller gets a fast local fallback (the last good
+answer for the same cache key, or a template) instead of waiting on Gemini.
+
+A call that missed its deadline can't be cancelled; it runs on until the SDK
+gives up. Each call holds one of GEMINI_MAX_INFLIGHT slots until it returns,
+abandoned or not, so when a slow Gemini has them all, new calls (and hedges)
+get the fallback at once instead of queueing behind the stuck ones.
+
+Standing instructions (the AgriPath persona) go in the model's system
+instruction rather than as turns at the front of every prompt, and the
+prompt token counts Gemini reports, including the part it served from its
+context cache, are recorded for every call. ``generate_parts()`` makes the
+same calls for answers that may be function calls rather than text.
+"""
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+
+# --- Defaults (overridable from settings) ---
+DEFAULT_TIMEOUT_SECONDS = 8.0
+DEFAULT_REQUEST_BUDGET_SECONDS = 15.0
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_HEDGE_SECONDS = 2.5
+DEFAULT_HEDGE_MIN_SECONDS = 0.5
+DEFAULT_MAX_INFLIGHT = 16
+DEFAULT_ANSWER_CACHE_SECONDS = 6 * 60 * 60
+MIN_LATENCY_SAMPLES = 20
+ANSWER_CACHE_PREFIX = 'llm:answer:'
+
+
+def configure_genai():
+    """Configures the Gemini SDK from settings and returns the module."""
+    import google.generativeai as genai
+
+    endpoint = getattr(settings, 'GEMINI_API_ENDPOINT', None)
+    if endpoint:
+        # A custom endpoint (e.g. the local fake server) is only reachable over REST
+        genai.configure(api_key=settings.GEMINI_API_KEY, transport='rest',
+                        client_options={'api_endpoint': endpoint})
+    else:
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai
+
+
+# Models handed out by build_model(), by (name, system instruction), so their clients can be dropped after a fork
+_MODELS = {}
+_models_lock = threading.Lock()
+
+
+def build_model(model_name, system_instruction=None):
+    """Returns the shared GenerativeModel for ``model_name``, configuring the SDK on first use."""
+    key = (model_name, system_instruction)
+    model = _MODELS.get(key)
+    if model is None:
+        with _models_lock:
+            model = _MODELS.get(key)
+            if model is None:
+                genai = configure_genai()
+                if system_instruction:
+                    model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+                else:
+                    model = genai.GenerativeModel(model_name)
+                _MODELS[key] = model
+    return model
+
+
+def with_system_instruction(model, system_instruction):
+    """
+    The model to send a call with ``system_instruction`` to.
+
+    The SDK only takes a system instruction when a model is built, so a lazy
+    model is swapped for the shared model built with the instruction; a model
+    built elsewhere is used as it is.
+    """
+    if system_instruction and isinstance(model, LazyModel):
+        return build_model(model.model_name, system_instruction)
+    return model
+
+
+class LazyModel:
+    """
+    Stands in for ``build_model(model_name)`` until it is first used.
+
+    Importing google.generativeai (and gRPC with it) takes about a second, so
+    views hold one of these instead of a model; every attribute is looked up
+    on the shared model, built on first access.
+    """
+    # Names of every lazy model, for core.startup.warm()
+    names = set()
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        LazyModel.names.add(model_name)
+
+    def __getattr__(self, name):
+        return getattr(build_model(self.model_name), name)
+
+    def __repr__(self):
+        return f'LazyModel({self.model_name!r})'
+
+
+def reinit_after_fork():
+    """
+    Drops state that must not be shared with a forked child.
+
+    The Gemini SDK caches its gRPC clients, and gRPC channels are not
+    fork-safe, so the SDK is configured again (which discards the cached
+    clients) and every model forgets its client; they are recreated on the
+    next call in the child. The worker pool's threads do not survive a fork
+    either, so a new pool is started on demand.
+    """
+    global _executor, _executor_pid, _slots
+    _executor = None
+    _executor_pid = None
+    _slots = None
+    if _MODELS:
+        configure_genai()
+        for model in _MODELS.values():
+            model._client = None
+            model._async_client = None
+
+
+class LLMTimeout(Exception):
+    """Raised when the budget ran out and no local fallback was available."""
+
+
+def _setting(name, default):
+    value = getattr(settings, name, None)
+    return default if value is None else value
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick the hedge delay."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+LATENCY = LatencyTracker()
+
+# --- Per-request deadline ---
+_request_deadline = contextvars.ContextVar('llm_request_deadline', default=None)
+
+
+@contextmanager
+def request_deadline(seconds=None):
+    """Bounds the total time all LLM calls inside the block may take."""
+    if seconds is None:
+        seconds = _setting('GEMINI_REQUEST_BUDGET_SECONDS', DEFAULT_REQUEST_BUDGET_SECONDS)
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_budget():
+    """Seconds left in the current request budget, or None outside a request."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+# --- Worker pool ---
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+# One per pool thread; held from submit until the call returns, even after its caller gave up
+_slots = None
+
+
+def _get_executor():
+    global _executor, _executor_pid, _slots
+    # A pool inherited through fork has no threads behind it; start a fresh one per process
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                max_inflight = _setting('GEMINI_MAX_INFLIGHT', DEFAULT_MAX_INFLIGHT)
+                _executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix='gemini')
+                _slots = threading.BoundedSemaphore(max_inflight)
+                _executor_pid = os.getpid()
+    return _executor
+
+
+# --- Token accounting ---
+# usage_metadata field -> the kind label of agripath_llm_tokens_total
+TOKEN_FIELDS = (
+    ('prompt_token_count', 'prompt'),  # includes the system instruction and the cached part
+    ('cached_content_token_count', 'cached'),
+    ('candidates_token_count', 'output'),
+)
+
+
+def _model_label(model):
+    name = getattr(model, 'model_name', None)
+    return name.removeprefix('models/') if isinstance(name, str) else 'unknown'
+
+
+def record_usage(model, response):
+    """Counts the tokens Gemini reports for one response."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    label = _model_label(model)
+    for field, kind in TOKEN_FIELDS:
+        count = getattr(usage, field, None)
+        if isinstance(count, int) and count > 0:
+            metrics.incr('agripath_llm_tokens_total', count, model=label, kind=kind)
+
+
+def _read_text(response):
+    return response.text
+
+
+def _read_parts(response):
+    # .text raises on an answer made of function calls
+    return list(response.parts)
+
+
+def _call(model, prompt, timeout, read=_read_text, options=None):
+    started = time.monotonic()
+    with metrics.upstream('gemini'):
+        response = model.generate_content(prompt, request_options={'timeout': timeout}, **(options or {}))
+        result = read(response)
+    LATENCY.record(time.monotonic() - started)
+    record_usage(model, response)
+    return result
+
+
+def _submit(pool, model, prompt, timeout, read, options, attempt='primary'):
+    """The future of the call, or None when every slot is held by a call still running."""
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        metrics.incr('agripath_llm_shed_total', attempt=attempt)
+        return None
+    try:
+        # Run in a copy of the caller's context so the call shows up in its Server-Timing spans
+        future = pool.submit(contextvars.copy_context().run, _call, model, prompt, timeout, read, options)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _hedge_delay():
+    pct = _setting('GEMINI_HEDGE_PERCENTILE', DEFAULT_HEDGE_PERCENTILE)
+    if not pct:
+        return None
+    delay = LATENCY.percentile(pct)
+    if delay is None:
+        delay = _setting('GEMINI_HEDGE_SECONDS', DEFAULT_HEDGE_SECONDS)
+    return max(delay, _setting('GEMINI_HEDGE_MIN_SECONDS', DEFAULT_HEDGE_MIN_SECONDS))
+
+
+# --- Answer cache / fallbacks ---
+def _answer_key(cache_key):
+    return ANSWER_CACHE_PREFIX + hashlib.sha256(str(cache_key).encode('utf-8')).hexdigest()
+
+
+def _remember(cache_key, text):
+    if cache_key is None:
+        return
+    timeout = _setting('GEMINI_ANSWER_CACHE_SECONDS', DEFAULT_ANSWER_CACHE_SECONDS)
+    try:
+        cache.set(_answer_key(cache_key), text, timeout)
+    except Exception as e:
+        print(f"LLM answer cache write failed: {e}")
+
+
+def cached_answer(cache_key):
+    """The last good answer stored for ``cache_key``, or None."""
+    return cache.get(_answer_key(cache_key))
+
+
+def forget(cache_key):
+    """Drops the answer stored for ``cache_key``, when what it was about has changed."""
+    cache.delete(_answer_key(cache_key))
+
+
+def _fallback(cache_key, fallback):
+    if cache_key is not None:
+        cached = cached_answer(cache_key)
+        metrics.cache_event('llm_answer', cached is not None)
+        if cached is not None:
+            return cached
+    if callable(fallback):
+        return fallback()
+    if fallback is not None:
+        return fallback
+    raise LLMTimeout("Gemini did not answer within the request budget.")
+
+
+def _call_timeout(timeout):
+    call_timeout = timeout or _setting('GEMINI_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)
+    budget = remaining_budget()
+    if budget is not None:
+        call_timeout = min(call_timeout, budget)
+    return call_timeout
+
+
+def _race(model, prompt, call_timeout, read=_read_text, options=None):
+    """
+    Sends the call, and a hedged duplicate if it is slow; returns (True, what
+    ``read`` made of the first answer), or (False, None) if neither answered
+    within ``call_timeout``. An error is raised once no attempt is left.
+    """
+    pool = _get_executor()
+    started = time.monotonic()
+    deadline = started + call_timeout
+    hedge_at = None
+    hedge_delay = _hedge_delay()
+    if hedge_delay is not None and hedge_delay < call_timeout:
+        hedge_at = started + hedge_delay
+
+    first = _submit(pool, model, prompt, call_timeout, read, options)
+    if first is None:
+        print("Gemini has every slot taken by calls still running, using local fallback.")
+        return False, None
+    pending = {first}
+    first_error = None
+    while pending:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        wake_at = deadline if hedge_at is None else min(deadline, hedge_at)
+        done, pending = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return True, future.result()
+            first_error = first_error or error
+        if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+            hedge_at = None
+            hedge = _submit(pool, model, prompt, max(0.0, deadline - time.monotonic()), read, options, 'hedge')
+            if hedge is not None:
+                pending.add(hedge)
+
+    if first_error is not None and not pending:
+        raise first_error
+    print(f"Gemini call exceeded its {call_timeout:.1f}s deadline, using local fallback.")
+    return False, None
+
+
+def generate_text(model, prompt, *, timeout=None, cache_key=None, fallback=None, system_instruction=None):
+    """
+    Returns the text of ``model.generate_content(prompt)`` within a deadline.
+
+    ``system_instruction`` is sent as the model's system instruction (see
+    ``with_system_instruction``).
+
+    Errors from the model are re-raised unchanged. If neither the original
+    nor the hedged attempt answers in time, the cached answer for
+    ``cache_key`` is returned, then ``fallback`` (a string or a callable),
+    and ``LLMTimeout`` is raised only when neither exists.
+    """
+    call_timeout = _call_timeout(timeout)
+    if call_timeout <= 0:
+        return _fallback(cache_key, fallback)
+
+    answered, text = _race(with_system_instruction(model, system_instruction), prompt, call_timeout)
+    if not answered:
+        return _fallback(cache_key, fallback)
+    _remember(cache_key, text)
+    return text
+
+
+def generate_parts(model, contents, *, tools=None, tool_config=None, timeout=None, system_instruction=None):
+    """
+    The parts of the answer to ``contents``, which may be function calls to
+    the ``tools`` declared with it (see core/chat_tools.py).
+
+    Deadline and hedging are those of ``generate_text``. There is no answer
+    to fall back on, so ``LLMTimeout`` is raised when the budget runs out.
+    """
+    call_timeout = _call_timeout(timeout)
+    if call_timeout > 0:
+        options = {key: value for key, value in (('tools', tools), ('tool_config', tool_config)) if value}
+        answered, parts = _race(with_system_instruction(model, system_instruction), contents, call_timeout,
+                                read=_read_parts, options=options)
+        if answered:
+            return parts
+    raise LLMTimeout("Gemini did not answer within the request budget.")
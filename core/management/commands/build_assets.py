@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import assets
+
+
+class Command(BaseCommand):
+    help = ('Downloads the vendored fonts, Swiper and the weather icon sprite into static/vendor/ '
+            'and builds the responsive image variants.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Download again even if the files exist.')
+        parser.add_argument('--only', nargs='+', choices=sorted(assets.BUILDERS), help='Build only these assets.')
+
+    def handle(self, *args, **options):
+        try:
+            results = assets.build(force=options['force'], only=options['only'])
+        except assets.AssetBuildError as e:
+            raise CommandError(f'{e}. The build needs network access the first time.') from e
+        for name, written in results.items():
+            status = f'{len(written)} file(s) written' if written else 'up to date'
+            self.stdout.write(f'{name}: {status}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import climate
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the climate normals grid (core/data/climate_normals.npy) from the station normals.'
+
+    def handle(self, *args, **options):
+        grid = climate.build()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {climate.NORMALS_FILE}: {grid.shape[0]}x{grid.shape[1]} cells, '
+            f'{grid.nbytes / 1024:.0f} KiB.'
+        ))
@@ -0,0 +1,15 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+from django.core.management import call_command
+
+
+class Command(CollectStaticCommand):
+    """collectstatic that first vendors the third-party assets (see core/assets.py)."""
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--skip-assets', action='store_true', help='Do not run build_assets first.')
+
+    def handle(self, **options):
+        if not options['skip_assets'] and not options['dry_run']:
+            call_command('build_assets', verbosity=options['verbosity'], stdout=self.stdout, stderr=self.stderr)
+        return super().handle(**options)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import weather_store
+
+
+class Command(BaseCommand):
+    help = ('Folds weather readings older than a week into daily aggregates and deletes expired '
+            'forecasts and aggregates. Run daily (e.g. from cron).')
+
+    def handle(self, *args, **options):
+        result = weather_store.compact()
+        self.stdout.write(
+            f"{result['days_aggregated']} day(s) aggregated from {result['raw_deleted']} reading(s); "
+            f"{result['forecasts_deleted']} forecast step(s) and {result['daily_deleted']} old day(s) deleted"
+        )
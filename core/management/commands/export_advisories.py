@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import advisories
+
+
+class Command(BaseCommand):
+    help = ('Writes the recommended crops of every farmer with a location as CSV or Parquet, '
+            'reading profiles a chunk at a time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='File to write; "-" (the default) is stdout.')
+        parser.add_argument('--format', choices=sorted(advisories.FORMATS),
+                            help='Output format; by default from the --output extension, else csv.')
+        parser.add_argument('--month', type=int, choices=range(1, 13), metavar='1-12',
+                            help='Month whose climate normals to use; defaults to this month.')
+        parser.add_argument('--chunk-size', type=int, default=advisories.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        output_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'csv')
+        if output_format == 'parquet':
+            if not advisories.parquet_available():
+                raise CommandError('Parquet export needs pyarrow: pip install pyarrow')
+            if output == '-':
+                raise CommandError('Parquet is binary; give a file with --output.')
+
+        pieces = advisories.export(output_format, month=options['month'], chunk_size=options['chunk_size'])
+        written = 0
+        if output == '-':
+            for piece in pieces:
+                sys.stdout.buffer.write(piece)
+            sys.stdout.buffer.flush()
+            return
+        with open(output, 'wb') as fh:
+            for piece in pieces:
+                fh.write(piece)
+                written += len(piece)
+        self.stderr.write(f'Wrote {written / 1024:.0f} KiB of {output_format} to {output}')
@@ -0,0 +1,37 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.utils import get_app_template_dirs
+
+from core import images
+
+
+class Command(BaseCommand):
+    help = 'Reports the image bytes each page saves with the responsive variants (run build_assets first).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        manifest = images.load_manifest()
+        if not manifest:
+            raise CommandError('No responsive image manifest; run "manage.py build_assets" first.')
+        template_dirs = [str(d) for t in settings.TEMPLATES for d in t.get('DIRS', [])]
+        template_dirs += [str(d) for d in get_app_template_dirs('templates')]
+        report = images.page_report(images.template_images(template_dirs), manifest)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{'page':32s} {'images':>6s} {'original':>10s} "
+                          + ' '.join(f'{name:>18s}' for name in images.VIEWPORTS))
+        for page, row in report.items():
+            cells = []
+            for name in images.VIEWPORTS:
+                saved = row[f'{name}_saved_bytes']
+                percent = 100 * saved / row['original_bytes'] if row['original_bytes'] else 0
+                cells.append(f"{row[f'{name}_bytes'] / 1024:8.0f} KiB ({percent:3.0f}%)")
+            self.stdout.write(f"{page:32s} {row['images']:6d} {row['original_bytes'] / 1024:6.0f} KiB "
+                              + ' '.join(f'{c:>18s}' for c in cells))
+        self.stdout.write('Sizes are what an AVIF-capable browser downloads; percentages are the bytes saved.')
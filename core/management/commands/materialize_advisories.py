@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core import advisories, llm
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the Crop Advisory of every profile location into LocationAdvisory, then writes '
+            'missing planting calendars within a Gemini call budget. Run nightly (e.g. from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-calls', type=int, default=advisories.ADVISORY_CALLS_PER_RUN,
+                            help='Gemini calls this run may make (0 skips the planting calendars).')
+        parser.add_argument('--per-minute', type=float, default=advisories.ADVISORY_CALLS_PER_MINUTE,
+                            help='Gemini calls per minute.')
+
+    def handle(self, *args, **options):
+        result = advisories.materialize()
+        self.stdout.write(f"{result['materialized']} of {result['locations']} location(s) materialized; "
+                          f"{result['deleted']} stale row(s) deleted")
+        if options['max_calls'] <= 0:
+            return
+        try:
+            model = llm.build_model(advisories.ADVISORY_MODEL)
+        except Exception as e:
+            self.stderr.write(f'Gemini is not configured ({e}); planting calendars skipped')
+            return
+        result = advisories.generate_missing(model, max_calls=options['max_calls'],
+                                             per_minute=options['per_minute'])
+        self.stdout.write(f"{result['generated']} planting calendar(s) written in {result['calls']} call(s); "
+                          f"{result['remaining']} still missing")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from core import places
+
+
+class Command(BaseCommand):
+    help = ('Resolves the place of profiles saved without one, each distinct spelling once. '
+            'Run daily (e.g. from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offline', action='store_true',
+                            help='Only match districts and known spellings; no geocoding.')
+
+    def handle(self, *args, **options):
+        placed = unresolved = 0
+        unplaced = (Profile.objects.filter(place__isnull=True).exclude(location='')
+                    .values_list('location', flat=True).distinct())
+        for location in list(unplaced):
+            place = places.resolve(location, offline=options['offline'])
+            if place is None:
+                unresolved += 1
+                continue
+            placed += Profile.objects.filter(place__isnull=True, location=location).update(place=place)
+        self.stdout.write(f'{placed} profile(s) placed; {unresolved} spelling(s) still unresolved')
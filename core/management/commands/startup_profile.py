@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = ('Boots the app in a fresh interpreter and reports import time per module, the boot phases '
+            'and the latency of the first requests.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths',
+                            help=f"Path to request after boot (repeatable; default {', '.join(startup.DEFAULT_PATHS)}).")
+        parser.add_argument('--top', type=int, default=15, help='Number of modules and packages to list.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            report = startup.profile(paths=options['paths'] or startup.DEFAULT_PATHS, top=options['top'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        phases = report['phases']
+        self.stdout.write(f"Process (interpreter start to exit)  {report['process_ms']:8.1f} ms")
+        self.stdout.write(f"Boot (django.setup to URLconf)       {phases['boot_ms']:8.1f} ms")
+        for name in ('django_setup_ms', 'middleware_ms', 'urlconf_ms'):
+            self.stdout.write(f"  {name[:-3]:34s} {phases[name]:8.1f} ms")
+        self.stdout.write('')
+        self.stdout.write(f"{'path':36s} {'status':>6s} {'first':>10s} {'second':>10s}")
+        for request in report['requests']:
+            self.stdout.write(f"{request['path']:36s} {request['status']:6d} "
+                              f"{request['first_ms']:7.1f} ms {request['second_ms']:7.1f} ms")
+        self.stdout.write('')
+        self.stdout.write('Slowest imports (cumulative):')
+        for row in report['slowest_imports']:
+            self.stdout.write(f"  {row['module']:40s} {row['cumulative_ms']:8.1f} ms")
+        self.stdout.write('Import time by package:')
+        for row in report['packages']:
+            self.stdout.write(f"  {row['package']:40s} {row['ms']:8.1f} ms")
+        self.stdout.write('')
+        heavy = report['heavy_at_boot']
+        self.stdout.write(f"Heavy modules imported at boot: {', '.join(heavy) if heavy else 'none'}")
+        self.stdout.write(f"Heavy modules imported by the requests: "
+                          f"{', '.join(report['heavy_after_requests']) or 'none'}")
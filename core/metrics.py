@@ -0,0 +1,296 @@
+# core/metrics.py
+"""
+Lightweight timing spans and per-process metrics.
+
+``span()`` times a stage of the current request, ``upstream()`` times a call
+to an external service and tags it with the outcome. Both feed histograms
+kept in this process and the request's ``Server-Timing`` header (see
+``core.middleware.ServerTimingMiddleware``). Gauges such as the SMS queue
+depth are registered with ``register_gauge()`` and read at scrape time.
+
+When ``METRICS_DIR`` is set every process periodically writes a snapshot of
+its metrics there, and ``render_prometheus()`` merges all snapshots, so a
+scrape that lands on any gunicorn worker sees the totals of all of them.
+"""
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+DEFAULT_FLUSH_SECONDS = 5.0
+
+METRIC_HELP = {
+    'agripath_request_seconds': 'Request latency by view and status code.',
+    'agripath_stage_seconds': 'Time spent in each stage of a request.',
+    'agripath_upstream_seconds': 'Latency of calls to external services by upstream and status.',
+    'agripath_cache_requests_total': 'Cache lookups by cache and result.',
+    'agripath_cache_tier_requests_total': 'Two-tier cache lookups by key namespace and result (l1_hit, l2_hit, miss).',
+    'agripath_cache_evictions_total': 'Two-tier cache entries evicted by key namespace and tier (l1 LRU, l2 cull).',
+    'agripath_sms_delivery_seconds': 'Time from queueing an SMS to Twilio accepting it.',
+    'agripath_sms_total': 'Outbox send attempts by result.',
+    'agripath_admission_total': 'Requests to limited views by admission outcome.',
+    'agripath_admission_wait_seconds': 'Time admitted requests waited for a slot.',
+    'agripath_llm_shed_total': 'Gemini calls (primary or hedge) not sent because every GEMINI_MAX_INFLIGHT slot was held by a running call.',
+    'agripath_llm_tokens_total': 'Gemini tokens by model and kind (prompt, cached part of the prompt, output).',
+    'agripath_chat_tool_calls_total': 'Functions the tool-routing chat engine ran, by tool and result.',
+    'agripath_response_bytes_total': 'Body bytes of text responses sent, by view and content encoding.',
+    'agripath_response_uncompressed_bytes_total': 'Body bytes of the same responses before compression, by view.',
+}
+
+# Gauges read at scrape time: name -> function returning the current value
+GAUGES = {}
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.last_flush = 0.0
+
+    def observe(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            else:
+                entry[0][-1] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def incr(self, name, amount, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': [[name, list(labels), list(buckets), total, count]
+                               for (name, labels), (buckets, total, count) in self.histograms.items()],
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            }
+
+
+REGISTRY = _Registry()
+
+# Spans recorded for the request being served, as (name, seconds) pairs
+_request_spans = contextvars.ContextVar('metrics_request_spans', default=None)
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, labels)
+
+
+def incr(name, amount=1, **labels):
+    REGISTRY.incr(name, amount, labels)
+
+
+def register_gauge(name, read, help_text):
+    """Exports ``read()`` as a gauge, evaluated whenever metrics are rendered."""
+    GAUGES[name] = read
+    METRIC_HELP[name] = help_text
+
+
+def cache_event(cache_name, hit):
+    incr('agripath_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def start_request():
+    """Starts collecting spans for Server-Timing; returns a token for ``end_request``."""
+    return _request_spans.set([])
+
+
+def end_request(token):
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def reset_after_fork():
+    """Gives a forked worker its own empty registry (its snapshot file is keyed by pid)."""
+    global REGISTRY
+    REGISTRY = _Registry()
+
+
+def _record_span(name, seconds):
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Times one stage of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('agripath_stage_seconds', elapsed, stage=stage)
+        _record_span(stage, elapsed)
+
+
+class UpstreamCall:
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.status = 'ok'
+
+
+@contextmanager
+def upstream(name):
+    """Times a call to an external service; set ``.status`` on the yielded object."""
+    call = UpstreamCall(name)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.status = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('agripath_upstream_seconds', elapsed, upstream=name, status=str(call.status))
+        _record_span(f'{name}-{call.status}', elapsed)
+
+
+def server_timing_header(spans, total=None):
+    entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in spans]
+    if total is not None:
+        entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+# --- Cross-process aggregation ---
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush(force=False):
+    """Writes this process's snapshot to METRICS_DIR (at most every METRICS_FLUSH_SECONDS)."""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    interval = getattr(settings, 'METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+    if not force and now - REGISTRY.last_flush < interval:
+        return
+    REGISTRY.last_flush = now
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'worker-{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(REGISTRY.snapshot(), fh)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Metrics flush failed: {e}")
+
+
+def mark_process_dead(pid):
+    """Folds a dead worker's snapshot into the archive so its counts survive pid reuse."""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    path = os.path.join(directory, f'worker-{pid}.json')
+    archive = os.path.join(directory, 'archive.json')
+    if not os.path.exists(path):
+        return
+    merged = _merge([p for p in (archive, path) if os.path.exists(p)])
+    tmp_path = f'{archive}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(_to_snapshot(merged), fh)
+    os.replace(tmp_path, archive)
+    os.remove(path)
+
+
+def _merge(paths, extra=None):
+    histograms, counters = {}, {}
+    snapshots = []
+    for path in paths:
+        try:
+            with open(path) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    if extra is not None:
+        snapshots.append(extra)
+    for snap in snapshots:
+        for name, labels, buckets, total, count in snap.get('histograms', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            entry = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+            entry[2] += count
+        for name, labels, value in snap.get('counters', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def _to_snapshot(merged):
+    histograms, counters = merged
+    return {
+        'histograms': [[n, [list(p) for p in l], b, t, c] for (n, l), (b, t, c) in histograms.items()],
+        'counters': [[n, [list(p) for p in l], v] for (n, l), v in counters.items()],
+    }
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def render_prometheus():
+    """Prometheus text exposition of the metrics of every worker."""
+    directory = _metrics_dir()
+    if directory:
+        flush(force=True)
+        paths = glob.glob(os.path.join(directory, '*.json'))
+        histograms, counters = _merge(paths)
+    else:
+        histograms, counters = _merge([], extra=REGISTRY.snapshot())
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# HELP {name} {METRIC_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+        header(name, 'histogram')
+        cumulative = 0
+        for bound, value in zip(list(BUCKETS) + ['+Inf'], buckets):
+            cumulative += value
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    for (name, labels), value in sorted(counters.items()):
+        header(name, 'counter')
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    for name, read in sorted(GAUGES.items()):
+        try:
+            value = read()
+        except Exception as e:
+            print(f"Gauge {name} failed: {e}")
+            continue
+        header(name, 'gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,119 @@
+# core/middleware.py
+import time
+
+from django.contrib.sessions.middleware import SessionMiddleware
+
+from core import admission, compression, metrics, pagecache
+
+
+class ServerTimingMiddleware:
+    """Collects the request's spans into a Server-Timing header and the request histogram."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            spans = metrics.end_request(token)
+        total = time.perf_counter() - started
+
+        metrics.observe('agripath_request_seconds', total, view=_view_name(request),
+                        status=str(response.status_code))
+        response['Server-Timing'] = metrics.server_timing_header(spans, total)
+        metrics.flush()
+        return response
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match and match.url_name else 'unmatched'
+
+
+class CompressionMiddleware:
+    """
+    Brotli/gzip for rendered responses (core/compression.py).
+
+    Sits outside the page cache, so cached pages are compressed for each
+    client's Accept-Encoding, and inside ServerTimingMiddleware, so the
+    time it takes is part of the request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return compression.process(request, response, _view_name(request))
+
+
+class TimedSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that records the session write as its own stage."""
+
+    def process_response(self, request, response):
+        with metrics.span('session_write'):
+            return super().process_response(request, response)
+
+
+class PageCacheMiddleware:
+    """
+    Serves views marked with ``@cached_page`` from the cache (core/pagecache.py).
+
+    Sits before the session middleware, so a hit costs no session read, user
+    lookup or profile query. Cached pages are the same for every visitor, so
+    they are also shown to signed-in farmers who haven't finished their profile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        spec = pagecache.page_for(request)
+        if spec is None:
+            return self.get_response(request)
+
+        version, last_modified = pagecache.page_version(spec)
+        key = pagecache.cache_key(request, version)
+        entry = pagecache.get(key)
+        metrics.cache_event('page', entry is not None)
+        if entry is not None:
+            return pagecache.respond(request, entry)
+
+        response = self.get_response(request)
+        if response.status_code != 200 or response.streaming:
+            return response
+        entry = pagecache.make_entry(response, last_modified)
+        pagecache.store(key, entry)
+        return pagecache.respond(request, entry, response=response, hit=False)
+
+
+class AdmissionControlMiddleware:
+    """
+    Limits the views that wait on Gemini (core/admission.py).
+
+    Runs after the authentication middleware so callers are metered per
+    user; requests that aren't admitted get a stale copy or a 429 without
+    reaching the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            view_name = getattr(request, 'admission_view', None)
+            admission.release(request)
+        if view_name is not None:
+            admission.remember(request, view_name, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match is None or not match.url_name:
+            return None
+        return admission.admit(request, match.url_name)
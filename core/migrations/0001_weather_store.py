@@ -0,0 +1,58 @@
+# Generated by Django 5.2.2 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=64)),
+                ('date', models.DateField()),
+                ('samples', models.PositiveIntegerField()),
+                ('temp_mean', models.FloatField(null=True)),
+                ('temp_min', models.FloatField(null=True)),
+                ('temp_max', models.FloatField(null=True)),
+                ('humidity_mean', models.FloatField(null=True)),
+                ('rainfall', models.FloatField(null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('location', 'date'), name='unique_weather_daily')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeatherObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('c', 'Current'), ('f', 'Forecast')], max_length=1)),
+                ('observed_at', models.DateTimeField()),
+                ('fetched_at', models.DateTimeField()),
+                ('lat', models.FloatField(null=True)),
+                ('lon', models.FloatField(null=True)),
+                ('place', models.CharField(blank=True, default='', max_length=64)),
+                ('temperature', models.FloatField(null=True)),
+                ('temp_min', models.FloatField(null=True)),
+                ('temp_max', models.FloatField(null=True)),
+                ('humidity', models.FloatField(null=True)),
+                ('pressure', models.FloatField(null=True)),
+                ('wind_speed', models.FloatField(null=True)),
+                ('visibility', models.IntegerField(null=True)),
+                ('rainfall', models.FloatField(null=True)),
+                ('description', models.CharField(blank=True, default='', max_length=64)),
+                ('icon', models.CharField(blank=True, default='', max_length=4)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'kind', '-fetched_at'], name='weather_latest_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location', 'kind', 'observed_at'), name='unique_weather_observation')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-19 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_weather_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationAdvisory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=64, unique=True)),
+                ('place', models.CharField(max_length=100)),
+                ('district', models.CharField(blank=True, default='', max_length=64)),
+                ('state', models.CharField(blank=True, default='', max_length=64)),
+                ('date', models.DateField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('model_input', models.JSONField()),
+                ('crops', models.JSONField()),
+                ('confidence', models.FloatField(null=True)),
+                ('advisory', models.TextField(blank=True, default='')),
+            ],
+        ),
+    ]
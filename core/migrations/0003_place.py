@@ -0,0 +1,32 @@
+# Generated by Django 5.2.2 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_location_advisory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('district', models.CharField(blank=True, default='', max_length=64)),
+                ('state', models.CharField(blank=True, default='', max_length=64)),
+                ('lat', models.FloatField(null=True)),
+                ('lon', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlaceName',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='names', to='core.place')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def use_wal(apps, schema_editor):
+    # The journal mode is kept in the database file, so the tuned SQLite profile sets it here once
+    from mypage import sqlite_profile
+
+    if getattr(settings, 'SQLITE_PROFILE', None) == 'tuned':
+        sqlite_profile.use_wal(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # SQLite can't change the journal mode inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_place'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_wal, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,116 @@
 from django.db import models
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
 
-# Create your models here.
+
+# --- Weather observation store (core/weather_store.py) ---
+class WeatherObservation(models.Model):
+    """One OpenWeather reading: a current observation or one 3-hour forecast step."""
+    CURRENT = 'c'
+    FORECAST = 'f'
+    KIND_CHOICES = [(CURRENT, 'Current'), (FORECAST, 'Forecast')]
+
+    location = models.CharField(max_length=64)  # weather_store.location_key()
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    observed_at = models.DateTimeField()  # for forecasts, the time forecast for
+    fetched_at = models.DateTimeField()
+    lat = models.FloatField(null=True)
+    lon = models.FloatField(null=True)
+    place = models.CharField(max_length=64, blank=True, default='')
+    temperature = models.FloatField(null=True)
+    temp_min = models.FloatField(null=True)
+    temp_max = models.FloatField(null=True)
+    humidity = models.FloatField(null=True)
+    pressure = models.FloatField(null=True)
+    wind_speed = models.FloatField(null=True)
+    visibility = models.IntegerField(null=True)
+    rainfall = models.FloatField(null=True)  # mm over the last hour (current) or the 3-hour step (forecast)
+    description = models.CharField(max_length=64, blank=True, default='')
+    icon = models.CharField(max_length=4, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'kind', 'observed_at'], name='unique_weather_observation'),
+        ]
+        indexes = [models.Index(fields=['location', 'kind', '-fetched_at'], name='weather_latest_idx')]
+
+    def __str__(self):
+        return f'{self.location} {self.get_kind_display()} {self.observed_at:%Y-%m-%d %H:%M}'
+
+
+class WeatherDaily(models.Model):
+    """Daily aggregate of the current observations of a location, kept after the raw rows expire."""
+    location = models.CharField(max_length=64)
+    date = models.DateField()
+    samples = models.PositiveIntegerField()
+    temp_mean = models.FloatField(null=True)
+    temp_min = models.FloatField(null=True)
+    temp_max = models.FloatField(null=True)
+    humidity_mean = models.FloatField(null=True)
+    rainfall = models.FloatField(null=True)  # mm, the largest reading of each hour summed
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['location', 'date'], name='unique_weather_daily')]
+
+    def __str__(self):
+        return f'{self.location} {self.date}'
+
+
+# --- Materialized crop advisories (core/advisories.py) ---
+class LocationAdvisory(models.Model):
+    """The Crop Advisory page of one location, computed nightly for every profile location."""
+    location = models.CharField(max_length=64, unique=True)  # weather_store.location_key()
+    place = models.CharField(max_length=100)  # as a profile spells it, for the planting calendar prompt
+    district = models.CharField(max_length=64, blank=True, default='')
+    state = models.CharField(max_length=64, blank=True, default='')
+    date = models.DateField()  # day the row was computed
+    month = models.PositiveSmallIntegerField()  # month of the climate normals used
+    model_input = models.JSONField()
+    crops = models.JSONField()
+    confidence = models.FloatField(null=True)
+    advisory = models.TextField(blank=True, default='')  # Gemini planting calendar; blank until generated
+
+    def __str__(self):
+        return f'{self.location} {self.date}'
+
+
+# --- Canonical places (core/places.py) ---
+class Place(models.Model):
+    """A place profiles are in; its key is the ID every location-keyed store and cache uses."""
+    key = models.CharField(max_length=64, primary_key=True)  # places.district_key() or coordinates to ~1 km
+    name = models.CharField(max_length=100)
+    district = models.CharField(max_length=64, blank=True, default='')  # blank unless it is a soil table district
+    state = models.CharField(max_length=64, blank=True, default='')
+    lat = models.FloatField(null=True)
+    lon = models.FloatField(null=True)
+
+    def __str__(self):
+        return self.name
+
+
+# What is stored under a place's key is dropped when where the place is changes
+LOCATED_BY = ('lat', 'lon', 'district', 'state')
+
+
+@receiver(post_init, sender=Place)
+def remember_place_position(sender, instance, **kwargs):
+    instance._saved_position = tuple(instance.__dict__.get(field) for field in LOCATED_BY)
+
+
+@receiver(post_save, sender=Place)
+def place_position_changed(sender, instance, created, **kwargs):
+    position = tuple(getattr(instance, field) for field in LOCATED_BY)
+    if not created and position != instance._saved_position:
+        from core import places  # core.places imports this module
+
+        places.place_changed(instance.key)
+    instance._saved_position = position
+
+
+class PlaceName(models.Model):
+    """A spelling of a place (soil.normalize()d), so each spelling is resolved once."""
+    name = models.CharField(max_length=100, primary_key=True)
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='names')
+
+    def __str__(self):
+        return self.name
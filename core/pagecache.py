@@ -0,0 +1,136 @@
+# core/pagecache.py
+"""
+Full-page cache for pages that render the same bytes for every visitor.
+
+A view opts in with ``@cached_page('template.html')``. PageCacheMiddleware
+(core/middleware.py) then answers GET/HEAD requests for it from the cache,
+before the session, auth and profile middleware run, and sends an ETag and
+Last-Modified so a browser revalidating the page gets a 304 with no body.
+
+Entries are keyed by a version of everything the page is rendered from: the
+templates, the staticfiles and responsive-image manifests (hashed asset URLs
+end up in the HTML) and any ``depends_on`` data files. A deploy that changes
+any of them changes the key, so stale pages are never served and nothing has
+to be flushed. Hits and misses are counted as
+``agripath_cache_requests_total{cache="page"}``.
+"""
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from core import images
+
+PAGE_CACHE_PREFIX = 'page:'
+PAGE_CACHE_TIMEOUT = 24 * 60 * 60
+# Browsers revalidate every time; with the ETag that costs a 304 and no rendering
+PAGE_MAX_AGE = 0
+
+
+def cached_page(*templates, depends_on=()):
+    """Marks a view whose response depends only on ``templates`` and the ``depends_on`` files."""
+    def decorator(view):
+        view.page_cache = {'templates': templates, 'depends_on': tuple(depends_on)}
+        return view
+    return decorator
+
+
+def page_for(request):
+    """The cache spec of the page requested, or None if it isn't a cached page."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    spec = getattr(match.func, 'page_cache', None)
+    if spec is not None:
+        # Handlers only set this when they resolve the URL themselves; hits skip that
+        request.resolver_match = match
+    return spec
+
+
+def _staticfiles_manifest():
+    try:
+        return staticfiles_storage.path(staticfiles_storage.manifest_name)
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def source_files(spec):
+    paths = [get_template(name).origin.name for name in spec['templates']]
+    paths.extend([_staticfiles_manifest(), images.manifest_path(), *spec['depends_on']])
+    return [path for path in paths if path]
+
+
+_digests = {}
+
+
+def _file_digest(path):
+    """Content digest of a file, recomputed only when its mtime changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return 'missing', 0
+    cached = _digests.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as fh:
+            cached = (mtime, hashlib.sha256(fh.read()).hexdigest())
+        _digests[path] = cached
+    return cached[1], mtime
+
+
+def page_version(spec):
+    """(version, last modified) of everything the page is rendered from."""
+    digests = [_file_digest(path) for path in source_files(spec)]
+    version = hashlib.sha256('\n'.join(digest for digest, _ in digests).encode()).hexdigest()[:16]
+    return version, max((mtime for _, mtime in digests), default=0)
+
+
+def cache_key(request, version):
+    # The path only: cached pages read no query parameters, and keying on them would let
+    # any client fill the shared cache with copies of one page (?a=1, ?a=2, ...)
+    return f'{PAGE_CACHE_PREFIX}{version}:{request.path}'
+
+
+def make_entry(response, last_modified):
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': f'"{hashlib.sha1(response.content).hexdigest()}"',
+        'last_modified': int(last_modified),
+    }
+
+
+def respond(request, entry, response=None, hit=True):
+    """The cached page (or ``response``, on a miss) with validators, or a 304."""
+    if response is None:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_cache_control(response, public=True, max_age=PAGE_MAX_AGE)
+    response['X-Page-Cache'] = 'hit' if hit else 'miss'
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+    )
+
+
+def get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        print(f"Page cache read failed: {e}")
+        return None
+
+
+def store(key, entry):
+    try:
+        cache.set(key, entry, PAGE_CACHE_TIMEOUT)
+    except Exception as e:
+        print(f"Page cache write failed: {e}")
@@ -0,0 +1,140 @@
+# core/places.py
+"""
+Canonical places of profile locations.
+
+``Profile.location`` is free text: "Patna", "patna ", "Patna, Bihar" and
+"पटना" are one place. ``resolve()`` maps a spelling to a Place row when a
+profile is saved through ProfileEditForm and the profile keeps it in
+``Profile.place``. Every location-keyed store and cache (weather
+observations, LocationAdvisory rows, the Policies and planting calendar
+answers) is keyed by ``key_of()``, the place's key, not by the spelling:
+
+* a district of the soil table, matched by name or alias (core/soil.py),
+  is ``district:<state>:<district>`` with the district centroid;
+* any other spelling is geocoded once with OpenWeather's geocoding API. A
+  name it returns that is a district becomes that district, anything else
+  is keyed by its coordinates to ~1 km.
+
+Every spelling resolved is kept in PlaceName, so it is geocoded at most
+once. A spelling nothing resolves (or a profile saved before places
+existed and not since) keeps its normalized name as its key until
+``manage.py resolve_places`` places it.
+
+When a profile moves to another place, the stale copies admission control
+keeps of the farmer's pages are dropped (``profile_moved()``); when a place itself
+changes, say its coordinates are corrected, what was stored under its key
+is dropped (``place_changed()``). Both run from post_save signals, on
+Profile in accounts/models.py and on Place in core/models.py.
+"""
+import requests
+from django.conf import settings
+
+from core import admission, llm, metrics, soil, weather_store
+from core.models import LocationAdvisory, Place, PlaceName, WeatherDaily, WeatherObservation
+
+GEOCODE_TIMEOUT = 3.0
+
+
+def spelling(location):
+    return soil.normalize(location or '')[:100]
+
+
+def _slug(name):
+    return soil.normalize(name).replace(' ', '-')
+
+
+def district_key(district, state):
+    return f'district:{_slug(state)}:{_slug(district)}'[:64]
+
+
+def district_fields(location):
+    """Place fields of the soil table district ``location`` names, else None; no I/O."""
+    table = soil.get_table()
+    index = table.resolve(location)
+    if index is None:
+        return None
+    district, state = table.districts[index], table.states[index]
+    lat, lon = table.centroids[index]
+    return {'key': district_key(district, state), 'name': district, 'district': district, 'state': state,
+            'lat': float(lat), 'lon': float(lon)}
+
+
+def geocode(location):
+    """{name, state, lat, lon} of the place OpenWeather finds for ``location`` in India, else None."""
+    api_key = getattr(settings, 'OPENWEATHER_API_KEY', None)
+    if not api_key:
+        return None
+    params = {'q': f'{location.strip()},IN', 'limit': 1, 'appid': api_key}
+    try:
+        with metrics.upstream('openweather_geocode') as call:
+            response = requests.get(f'{settings.OPENWEATHER_BASE_URL}/geo/1.0/direct', params=params,
+                                    timeout=GEOCODE_TIMEOUT)
+            call.status = response.status_code
+        response.raise_for_status()
+        found = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Geocoding {location!r} failed: {e}")
+        return None
+    if not isinstance(found, list) or not found:
+        return None
+    return {'name': found[0].get('name') or location.strip(), 'state': found[0].get('state') or '',
+            'lat': found[0]['lat'], 'lon': found[0]['lon']}
+
+
+def _geocoded_fields(location):
+    found = geocode(location)
+    if found is None:
+        return None
+    # "पटना" comes back as Patna, a district we know
+    fields = district_fields(f"{found['name']}, {found['state']}")
+    if fields is not None:
+        return fields
+    return {'key': weather_store.location_key(lat=found['lat'], lon=found['lon']), 'name': found['name'][:100],
+            'district': '', 'state': found['state'][:64], 'lat': found['lat'], 'lon': found['lon']}
+
+
+def resolve(location, offline=False):
+    """The Place of a spelling, created the first time it is seen; None if it can't be placed."""
+    name = spelling(location)
+    if not name:
+        return None
+    alias = PlaceName.objects.select_related('place').filter(name=name).first()
+    if alias is not None:
+        return alias.place
+    fields = district_fields(location)
+    if fields is None and not offline:
+        fields = _geocoded_fields(location)
+    if fields is None:
+        return None
+    place, _ = Place.objects.get_or_create(key=fields.pop('key'), defaults=fields)
+    PlaceName.objects.get_or_create(name=name, defaults={'place': place})
+    return place
+
+
+def key_of(location, place=None):
+    """The key ``location`` is stored and cached under: its place's if known, else its normalized name."""
+    if place is not None:
+        return place.key
+    fields = district_fields(location)
+    if fields is not None:
+        return fields['key']
+    known = PlaceName.objects.filter(name=spelling(location)).values_list('place_id', flat=True).first()
+    return known or weather_store.location_key(location)
+
+
+# --- Invalidation (post_save signals) ---
+def profile_moved(user_id):
+    """Drops what was cached for a farmer at their previous place."""
+    admission.forget(user_id)
+
+
+def place_changed(key):
+    """Drops everything stored under a place's key, after its coordinates or district change."""
+    WeatherObservation.objects.filter(location=key).delete()
+    WeatherDaily.objects.filter(location=key).delete()
+    LocationAdvisory.objects.filter(location=key).delete()
+    llm.forget(f'policies:{key}')
+    user_ids = Place.objects.filter(key=key).values_list('profiles__user_id', flat=True)
+    for user_id in user_ids:
+        if user_id is not None:
+            profile_moved(user_id)
@@ -0,0 +1,112 @@
+# core/soil.py
+"""
+District-level soil properties for the crop model.
+
+``data/district_soil.csv`` has one row per district: its centroid, the
+agro-climatic zone it belongs to and that zone's typical N, P, K, pH and
+rainfall, in the units of the model's training data (Crop_recommendation.csv).
+The values are zone averages, not per-district measurements; a Soil Health
+Card export with the same columns can replace the file as is.
+
+The table is held as numpy arrays with a KD-tree over the centroids (as
+points on the unit sphere, so nearest means nearest on the ground). A profile
+location is matched by district name or alias ("Patna", "Allahabad",
+"Aurangabad, Bihar"); anything else resolves to the district nearest to its
+coordinates. The same location always gives the same soil, so predictions
+made from it can be cached.
+"""
+import csv
+import os
+import re
+
+import numpy as np
+
+SOIL_FILE = os.path.join(os.path.dirname(__file__), 'data', 'district_soil.csv')
+PROPERTIES = ('N', 'P', 'K', 'ph', 'rainfall')
+
+
+def normalize(name):
+    """'  Aurangabad (Bihar) district' -> 'aurangabad'."""
+    name = re.sub(r'\(.*?\)', ' ', name.lower())
+    name = re.sub(r'\bdistrict\b', ' ', name)
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name).split())
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class SoilTable:
+    def __init__(self, rows):
+        from scipy.spatial import cKDTree
+
+        self.districts = [row['district'] for row in rows]
+        self.states = [row['state'] for row in rows]
+        self.zones = [row['zone'] for row in rows]
+        self.values = np.array([[float(row[p]) for p in PROPERTIES] for row in rows], dtype=np.float32)
+        self.centroids = np.array([[float(row['lat']), float(row['lon'])] for row in rows])
+        self.tree = cKDTree(_unit_vectors(self.centroids[:, 0], self.centroids[:, 1]))
+        # Lookups hand out copies of these, so a request costs no array work
+        self.records = [self._record(self.values[i], self.districts[i], self.states[i], self.centroids[i])
+                        for i in range(len(rows))]
+        # Typical soil for locations that match nothing
+        self.default = self._record(np.median(self.values, axis=0), None, None, (None, None))
+
+        self.by_name = {}
+        for index, row in enumerate(rows):
+            names = [row['district'], *filter(None, row['aliases'].split(';'))]
+            for name in names:
+                rows_for_name = self.by_name.setdefault(normalize(name), [])
+                if index not in rows_for_name:
+                    rows_for_name.append(index)
+
+    @classmethod
+    def from_csv(cls, path=SOIL_FILE):
+        with open(path, newline='', encoding='utf-8') as fh:
+            return cls(list(csv.DictReader(fh)))
+
+    def nearest(self, lat, lon):
+        _, index = self.tree.query(_unit_vectors(np.array([lat]), np.array([lon]))[0])
+        return int(index)
+
+    def resolve(self, location=None, lat=None, lon=None):
+        """Row of the district named in ``location``, else nearest to (lat, lon); None if neither."""
+        if location:
+            place, *qualifiers = [normalize(part) for part in location.split(',')]
+            candidates = self.by_name.get(place, [])
+            if len(candidates) > 1:
+                # Same name in several states: "Aurangabad, Bihar"
+                in_state = [i for i in candidates if normalize(self.states[i]) in qualifiers]
+                candidates = in_state or candidates
+            if len(candidates) > 1 and lat is not None and lon is not None:
+                point = _unit_vectors(np.array([lat]), np.array([lon]))[0]
+                return max(candidates, key=lambda i: self.tree.data[i] @ point)
+            if candidates:
+                return candidates[0]
+        if lat is not None and lon is not None:
+            return self.nearest(lat, lon)
+        return None
+
+    @staticmethod
+    def _record(values, district, state, centroid):
+        record = {name: round(float(value), 2) for name, value in zip(PROPERTIES, values)}
+        record['district'] = district
+        record['state'] = state
+        record['lat'], record['lon'] = (None if c is None else float(c) for c in centroid)
+        return record
+
+    def lookup(self, location=None, lat=None, lon=None):
+        """Soil properties (and the district they are for) of a location."""
+        index = self.resolve(location, lat, lon)
+        return dict(self.default if index is None else self.records[index])
+
+
+SOIL_TABLE = None
+
+
+def get_table():
+    global SOIL_TABLE
+    if SOIL_TABLE is None:
+        SOIL_TABLE = SoilTable.from_csv()
+    return SOIL_TABLE
@@ -0,0 +1,151 @@
+# core/startup.py
+"""
+What a process pays before it can answer its first request.
+
+Heavy dependencies are imported on first use: pandas/sklearn and the forest
+in ``crop_model.ensure_loaded()``, the Gemini SDK behind ``llm.LazyModel``,
+the Twilio SDK in ``accounts.views.get_twilio_client()`` (only the SMS
+worker sends). ``manage.py`` commands, test runs and workers that never need
+them boot without them.
+
+``warm()`` loads what web workers use up front; gunicorn calls it in the
+preloaded master so the workers it forks share one copy. ``profile()``
+(behind ``manage.py startup_profile``) boots the app in a fresh interpreter
+under ``python -X importtime`` and reports the time spent per module and
+phase, and the latency of the first requests.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Should not be imported just by booting the app
+HEAVY_MODULES = ('pandas', 'sklearn', 'joblib', 'scipy', 'google.generativeai', 'grpc', 'twilio.rest')
+DEFAULT_PATHS = ('/accounts/login/', '/home/about')
+RESULT_MARKER = 'STARTUP_PROFILE '
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def warm():
+    """Imports and loads everything a web worker loads lazily."""
+    from core import climate, crop_model, llm, soil
+
+    crop_model.ensure_loaded()
+    soil.get_table()
+    climate.get_grid()
+    for model_name in llm.LazyModel.names:
+        llm.build_model(model_name)
+
+
+def parse_importtime(text):
+    """(module, self µs, cumulative µs, depth) of each line of ``-X importtime`` output."""
+    rows = []
+    for line in text.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append((module, int(own), int(cumulative), len(indent) // 2))
+    return rows
+
+
+def import_summary(rows, top=15):
+    """Slowest top-level imports (cumulative ms) and total import time per root package."""
+    packages = {}
+    for module, own, _, _ in rows:
+        root = module.split('.')[0]
+        packages[root] = packages.get(root, 0) + own
+    slowest = sorted((row for row in rows if row[3] == 0), key=lambda row: -row[2])[:top]
+    return {
+        'slowest_imports': [{'module': module, 'cumulative_ms': round(cumulative / 1000, 1)}
+                            for module, _, cumulative, _ in slowest],
+        'packages': [{'package': root, 'ms': round(own / 1000, 1)}
+                     for root, own in sorted(packages.items(), key=lambda item: -item[1])[:top]],
+    }
+
+
+def _request_host():
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def _request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'PATH_INFO': path, 'HTTP_HOST': _request_host(), 'SERVER_NAME': _request_host()}
+    setup_testing_defaults(environ)
+    status = []
+    started = time.perf_counter()
+    body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(status[0].split()[0]), (time.perf_counter() - started) * 1000
+
+
+def _loaded(modules):
+    return [module for module in modules if module in sys.modules]
+
+
+def child_main(paths):
+    """Runs in the profiled interpreter: boots the app, sends the requests, prints the timings."""
+    phases = {}
+    started = time.perf_counter()
+    import django
+    from django.core.handlers.wsgi import WSGIHandler
+
+    django.setup(set_prefix=False)
+    phases['django_setup_ms'] = (time.perf_counter() - started) * 1000
+
+    mark = time.perf_counter()
+    application = WSGIHandler()  # loads the middleware
+    phases['middleware_ms'] = (time.perf_counter() - mark) * 1000
+
+    mark = time.perf_counter()
+    from django.urls import get_resolver
+    get_resolver().url_patterns  # imports every view module
+    phases['urlconf_ms'] = (time.perf_counter() - mark) * 1000
+    phases['boot_ms'] = (time.perf_counter() - started) * 1000
+    heavy_at_boot = _loaded(HEAVY_MODULES)
+
+    requests = []
+    for path in paths:
+        first_status, first_ms = _request(application, path)
+        _, second_ms = _request(application, path)
+        requests.append({'path': path, 'status': first_status, 'first_ms': first_ms, 'second_ms': second_ms})
+
+    result = {
+        'phases': {name: round(ms, 1) for name, ms in phases.items()},
+        'requests': [{**r, 'first_ms': round(r['first_ms'], 1), 'second_ms': round(r['second_ms'], 1)}
+                     for r in requests],
+        'heavy_at_boot': heavy_at_boot,
+        'heavy_after_requests': _loaded(HEAVY_MODULES),
+    }
+    sys.stdout.write(RESULT_MARKER + json.dumps(result) + '\n')
+
+
+def profile(paths=DEFAULT_PATHS, top=15, timeout=300):
+    """Boots the app in a new interpreter under ``-X importtime``; returns the timings as a dict."""
+    code = f'from core import startup; startup.child_main({json.dumps(list(paths))})'
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'mypage.settings')}
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=settings.BASE_DIR, env=env,
+                             capture_output=True, text=True, timeout=timeout)
+    wall_ms = (time.perf_counter() - started) * 1000
+    lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+    if process.returncode != 0 or not lines:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('Profiled process failed:\n' + '\n'.join(errors[-20:]))
+    result = json.loads(lines[-1][len(RESULT_MARKER):])
+    result['process_ms'] = round(wall_ms, 1)
+    result.update(import_summary(parse_importtime(process.stderr), top=top))
+    return result
@@ -0,0 +1,19 @@
+# core/storage.py
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Fingerprinted, precompressed (gzip + brotli) static files.
+
+    ``{% static %}`` falls back to the plain name for files that were never
+    collected, e.g. in tests or before ``collectstatic`` has run, instead of
+    raising like ManifestStaticFilesStorage does.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
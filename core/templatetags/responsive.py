@@ -0,0 +1,56 @@
+import os
+
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from core import images
+
+register = template.Library()
+
+_manifest = {'key': None, 'data': {}}
+
+
+def _get_manifest():
+    """The variants manifest, re-read only when the build rewrites it."""
+    path = images.manifest_path()
+    try:
+        key = (path, os.path.getmtime(path))
+    except OSError:
+        return {}
+    if key != _manifest['key']:
+        _manifest['data'] = images.load_manifest()
+        _manifest['key'] = key
+    return _manifest['data']
+
+
+def _srcset(variants):
+    return ', '.join(f"{static(v['path'])} {v['width']}w" for v in variants)
+
+
+@register.simple_tag
+def responsive_image(name, alt='', sizes='100vw', loading='lazy', css_class='', fetchpriority=''):
+    """
+    <picture> with AVIF/WebP sources at every built width, falling back to the
+    source format; a plain <img> of the original if the variants aren't built.
+    """
+    extra = format_html_join('', ' {}="{}"', [(key, value) for key, value in
+                                               (('class', css_class), ('fetchpriority', fetchpriority)) if value])
+    entry = _get_manifest().get(name)
+    if not entry:
+        return format_html('<img src="{}" alt="{}" loading="{}" decoding="async"{}>', static(name), alt, loading, extra)
+
+    by_format = {}
+    for variant in sorted(entry['variants'], key=lambda v: v['width']):
+        by_format.setdefault(variant['format'], []).append(variant)
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        [(fmt, _srcset(by_format[fmt]), sizes) for fmt in images.MODERN_FORMATS if fmt in by_format],
+    )
+    fallback = images.chosen_variant(entry, images.VIEWPORTS['desktop'], formats=())
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" loading="{}" '
+        'decoding="async"{}></picture>',
+        sources, static(fallback['path']), _srcset(by_format[entry['fallback']]), sizes,
+        fallback['width'], fallback['height'], alt, loading, extra,
+    )
@@ -0,0 +1,367 @@
+# core/tiered_cache.py
+"""
+Cache backends shared by every gunicorn worker without a cache server.
+
+With LocMemCache each worker kept its own copy of every page, Gemini answer
+and token bucket, so a page rendered by one worker was rendered again by
+the next and a farmer's request budget was per worker. The app caches
+(``CACHES`` in settings) use ``TwoTierCache`` instead:
+
+- L1 is a small LRU in the worker's memory. An entry is served from it for
+  at most ``L1_TIMEOUT`` seconds, so a value changed by another worker is
+  seen within that time. ``L1_TIMEOUT: 0`` turns L1 off, for data that
+  workers update in turn (the admission token buckets).
+- L2 is ``SQLiteCache``, a table in a local SQLite file (WAL, so readers
+  don't wait for the writer) that every worker on the host opens.
+  ``SHARED_BACKEND`` can name another Django backend for it, such as
+  ``FileBasedCache``.
+
+Keys are versioned as with any Django cache (``version=``,
+``incr_version()``). A set or delete goes to L2 and this worker's L1.
+Requests are counted per namespace (the key up to its first ':', e.g.
+``llm`` or ``page``) as ``agripath_cache_tier_requests_total{namespace,
+result}`` with result l1_hit, l2_hit or miss, and LRU evictions and L2
+culls as ``agripath_cache_evictions_total{namespace,tier}``. ``stats()``
+returns the same counts for this worker.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from core import metrics
+
+# --- Defaults (overridable in a cache's OPTIONS) ---
+DEFAULT_L1_MAX_ENTRIES = 500
+DEFAULT_L1_TIMEOUT = 5.0
+DEFAULT_SHARED_BACKEND = 'core.tiered_cache.SQLiteCache'
+BUSY_TIMEOUT = 5.0
+# An L2 set checks the table size every this many sets of a worker, not on every one
+CULL_EVERY = 64
+
+
+def namespace(made_key):
+    """'llm' for the made key ':1:llm:answer:…' ("<prefix>:<version>:<key>"), 'other' for keys without one."""
+    name, sep, _ = made_key.split(':', 2)[-1].partition(':')
+    return name if sep else 'other'
+
+
+def _same_key(key, key_prefix, version):
+    return key
+
+
+class SQLiteCache(BaseCache):
+    """A cache table in a local SQLite file (``LOCATION``), shared by the processes that open it."""
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._sets = 0
+        self.culled = Counter()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # A forked worker opens its own; SQLite connections can't cross a fork
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                               'expires REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _row(self, connection, key):
+        row = connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row
+
+    def _write(self, connection, key, value, timeout):
+        connection.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                           (key, pickle.dumps(value, self.pickle_protocol), self.get_backend_timeout(timeout)))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._row(self._connection(), key)
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        made = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        placeholders = ','.join('?' * len(made))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            (*made, time.time()))
+        return {made[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(self._connection(), key, value, timeout)
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            for key, value in data.items():
+                self._write(connection, self.make_and_validate_key(key, version=version), value, timeout)
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if self._row(connection, key) is not None:
+                return False
+            self._write(connection, key, value, timeout)
+        self._maybe_cull()
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        updated = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return updated.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        # One transaction, so workers incrementing the same key don't lose updates
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = self._row(connection, key)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               (pickle.dumps(value, self.pickle_protocol), key))
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        connection = self._connection()
+        connection.executemany('DELETE FROM cache WHERE key = ?',
+                               [(self.make_and_validate_key(key, version=version),) for key in keys])
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._row(self._connection(), key) is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _maybe_cull(self):
+        self._sets += 1
+        if self._sets % CULL_EVERY == 0:
+            self.cull()
+
+    def cull(self):
+        """Deletes expired rows and, over MAX_ENTRIES, 1/CULL_FREQUENCY of the rest, soonest to expire first."""
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if count <= self._max_entries:
+                return
+            limit = count if self._cull_frequency == 0 else max(1, count // self._cull_frequency)
+            # Selected, then deleted by key: DELETE ... RETURNING needs SQLite 3.35
+            deleted = connection.execute('SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?',
+                                         (limit,)).fetchall()
+            connection.executemany('DELETE FROM cache WHERE key = ?', deleted)
+        for key, in deleted:
+            self.culled[namespace(key)] += 1
+            metrics.incr('agripath_cache_evictions_total', namespace=namespace(key), tier='l2')
+
+
+class TwoTierCache(BaseCache):
+    """
+    A per-process LRU (L1) in front of a cache shared by the workers (L2).
+
+    ``LOCATION`` is L2's. OPTIONS: ``L1_MAX_ENTRIES``, ``L1_TIMEOUT``
+    (seconds), ``SHARED_BACKEND`` (dotted path of L2's backend) and L2's
+    ``MAX_ENTRIES`` / ``CULL_FREQUENCY``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1_max_entries = options.get('L1_MAX_ENTRIES', DEFAULT_L1_MAX_ENTRIES)
+        self.l1_timeout = options.get('L1_TIMEOUT', DEFAULT_L1_TIMEOUT)
+        shared_options = {name: value for name, value in options.items()
+                          if name not in ('L1_MAX_ENTRIES', 'L1_TIMEOUT', 'SHARED_BACKEND')}
+        # Keys reach L2 already prefixed and versioned
+        self.shared = import_string(options.get('SHARED_BACKEND', DEFAULT_SHARED_BACKEND))(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300), 'OPTIONS': shared_options, 'KEY_FUNCTION': _same_key,
+        })
+        self._l1 = OrderedDict()  # key: (pickled value, monotonic time it leaves L1)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    # --- L1 ---
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry[0]
+
+    def _l1_set(self, key, value, timeout):
+        if self.l1_timeout <= 0:
+            return
+        lifetime = self.l1_timeout
+        if timeout is not None and timeout is not DEFAULT_TIMEOUT:
+            lifetime = min(lifetime, timeout)
+        elif timeout is DEFAULT_TIMEOUT and self.default_timeout is not None:
+            lifetime = min(lifetime, self.default_timeout)
+        if lifetime <= 0:
+            self._l1_drop(key)
+            return
+        evicted = []
+        with self._lock:
+            self._l1[key] = (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.monotonic() + lifetime)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                evicted.append(self._l1.popitem(last=False)[0])
+        for old in evicted:
+            self._count(old, 'evictions')
+            metrics.incr('agripath_cache_evictions_total', namespace=namespace(old), tier='l1')
+
+    def _l1_drop(self, key):
+        with self._lock:
+            self._l1.pop(key, None)
+
+    # --- Stats ---
+    def _count(self, key, result):
+        with self._lock:
+            self._counts[namespace(key), result] += 1
+        if result != 'evictions':
+            metrics.incr('agripath_cache_tier_requests_total', namespace=namespace(key), result=result)
+
+    def stats(self):
+        """{namespace: {l1_hit, l2_hit, miss, evictions}} of this worker, L2 culls included in evictions."""
+        stats = {}
+        with self._lock:
+            counts = list(self._counts.items())
+        for (name, result), count in counts:
+            stats.setdefault(name, Counter())[result] += count
+        for name, count in getattr(self.shared, 'culled', {}).items():
+            stats.setdefault(name, Counter())['evictions'] += count
+        return {name: {result: counts[result] for result in ('l1_hit', 'l2_hit', 'miss', 'evictions')}
+                for name, counts in stats.items()}
+
+    # --- Cache API ---
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cached = self._l1_get(key)
+        if cached is not None:
+            self._count(key, 'l1_hit')
+            return pickle.loads(cached)
+        value = self.shared.get(key, self._missing_key)
+        if value is self._missing_key:
+            self._count(key, 'miss')
+            return default
+        self._count(key, 'l2_hit')
+        # L2 doesn't say how long the entry has left; L1_TIMEOUT bounds it anyway
+        self._l1_set(key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, {}
+        for key in keys:
+            made = self.make_and_validate_key(key, version=version)
+            cached = self._l1_get(made)
+            if cached is not None:
+                self._count(made, 'l1_hit')
+                found[key] = pickle.loads(cached)
+            else:
+                missing[made] = key
+        if missing:
+            shared = self.shared.get_many(list(missing))
+            for made, key in missing.items():
+                if made in shared:
+                    self._count(made, 'l2_hit')
+                    self._l1_set(made, shared[made], None)
+                    found[key] = shared[made]
+                else:
+                    self._count(made, 'miss')
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, self._timeout(timeout))
+        self._l1_set(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = {self.make_and_validate_key(key, version=version): value for key, value in data.items()}
+        self.shared.set_many(made, self._timeout(timeout))
+        for key, value in made.items():
+            self._l1_set(key, value, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        added = self.shared.add(key, value, self._timeout(timeout))
+        if added:
+            self._l1_set(key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._l1_drop(key)
+        return self.shared.touch(key, self._timeout(timeout))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._l1_drop(key)
+        return self.shared.incr(key, delta)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._l1_drop(key)
+        return self.shared.delete(key)
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_and_validate_key(key, version=version) for key in keys]
+        for key in made:
+            self._l1_drop(key)
+        self.shared.delete_many(made)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._l1_get(key) is not None or self.shared.has_key(key)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.shared.clear()
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -1,41 +1,70 @@
 import os
 import json
+import mimetypes
 import re # <-- ADD THIS IMPORT for the post-processing step
 import requests
-import google.generativeai as genai
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified,
+                         JsonResponse, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from core import advisories, chat_tools, llm, metrics, places, weather_store
+from core.models import WeatherObservation
 
 # --- API Configuration (no changes) ---
 MODEL = None
 try:
     GEMINI_API_KEY = settings.GEMINI_API_KEY
     OPENWEATHER_API_KEY = settings.OPENWEATHER_API_KEY
-    genai.configure(api_key=GEMINI_API_KEY)
-    MODEL = genai.GenerativeModel('gemini-2.5-flash-lite')
+    # The SDK is imported and configured on the first call, not when the URLconf loads
+    MODEL = llm.LazyModel('gemini-2.5-flash-lite')
     print("Successfully configured Gemini and Weather APIs.")
 except (AttributeError, Exception) as e:
     print(f"FATAL ERROR: Could not configure API keys. Error: {e}")
     GEMINI_API_KEY = None
     OPENWEATHER_API_KEY = None
 
+# Returned when Gemini misses its deadline and there is nothing better to say.
+TIMEOUT_MESSAGE = "क्षमा करें, अभी जवाब देने में सामान्य से अधिक समय लग रहा है। कृपया थोड़ी देर बाद फिर से पूछें।"
+
+def _prompt_cache_key(prompt_content, system_instruction=None):
+    # A conversation is keyed by its handler's instruction and the farmer's last turn only: keyed by
+    # the whole history, every turn would store an answer nothing could ever fall back on
+    if isinstance(prompt_content, list):
+        turns = [turn for turn in prompt_content if isinstance(turn, dict) and turn.get('role') == 'user']
+        prompt_content = turns[-1]['parts'] if turns else prompt_content
+    key = 'chat:' + json.dumps(prompt_content, ensure_ascii=False, sort_keys=True, default=str)
+    return key if system_instruction is None else f'{key}:{system_instruction}'
+
+def clean_reply(raw_text):
+    # [NEW] Post-processing step to guarantee no special characters
+    # This will remove common markdown characters like *, #, -, etc.
+    cleaned_text = re.sub(r'[!@#$*_-]', '', raw_text)
+    return cleaned_text.strip() # Return the cleaned text
+
 # --- [MODIFIED] Centralized Gemini Response Function with Post-Processing ---
-def generate_gemini_response(prompt_content):
+def generate_gemini_response(prompt_content, fallback=None, system_instruction=None):
     if not MODEL:
         print("Attempted to call Gemini, but the model is not configured.")
         return "क्षमा करें, मेरा AI कनेक्शन ठीक से काम नहीं कर रहा है।"
     try:
-        response = MODEL.generate_content(prompt_content)
-        
-        # [NEW] Post-processing step to guarantee no special characters
-        # This will remove common markdown characters like *, #, -, etc.
-        raw_text = response.text
-        cleaned_text = re.sub(r'[!@#$*_-]', '', raw_text)
-        
-        return cleaned_text.strip() # Return the cleaned text
+        # Deadline-bound call: hedged when slow, cached answer or fallback when out of time
+        raw_text = llm.generate_text(
+            MODEL,
+            prompt_content,
+            cache_key=_prompt_cache_key(prompt_content, system_instruction),
+            fallback=fallback or TIMEOUT_MESSAGE,
+            system_instruction=system_instruction,
+        )
+
+        return clean_reply(raw_text)
         
     except Exception as e:
         print(f"GEMINI API ERROR: {e}")
@@ -43,15 +72,21 @@ def generate_gemini_response(prompt_content):
 
 # --- Weather Helper Function (no changes) ---
 def get_weather_data(city_name):
-    # ... (no changes in this function)
     if not OPENWEATHER_API_KEY: return None, "Weather API key not configured."
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
+    key = places.key_of(city_name)
+    stored = weather_store.latest_current(key)
+    if stored:
+        return { "city": stored["place"], "temperature": stored["temperature"], "description": stored["description"], "humidity": stored["humidity"], "wind_speed": stored["wind_speed"], }, None
+    base_url = f"{settings.OPENWEATHER_BASE_URL}/data/2.5/weather"
     params = {'q': city_name, 'appid': OPENWEATHER_API_KEY, 'units': 'metric', 'lang': 'hi'}
     try:
-        response = requests.get(base_url, params=params)
+        with metrics.upstream('openweather') as call:
+            response = requests.get(base_url, params=params)
+            call.status = response.status_code
         if response.status_code == 404: return None, f"City '{city_name}' not found."
         response.raise_for_status()
         data = response.json()
+        weather_store.record(key, WeatherObservation.CURRENT, [weather_store.current_row(data)])
         return { "city": data.get("name"), "temperature": data["main"]["temp"], "description": data["weather"][0]["description"], "humidity": data["main"]["humidity"], "wind_speed": data["wind"]["speed"], }, None
     except requests.exceptions.RequestException as e:
         print(f"Weather API request error: {e}")
@@ -61,31 +96,47 @@ def get_weather_data(city_name):
 #  [MODIFIED] HANDLER FUNCTIONS - With more natural persona and instructions
 # ==============================================================================
 
-# This is our new, more natural persona prompt
-PERSONA_PROMPT = {
-    'role': 'user', 
-    'parts': [
-        "आप 'AgriPath' नाम के एक मित्रवत और जानकार AI कृषि मित्र हैं। आपकी बोली सरल और स्पष्ट हिंदी में है, जैसे आप गाँव के किसी किसान मित्र से बात कर रहे हों। अपने उत्तरों को स्वाभाविक, संक्षिप्त और संवादी रखें।"
-    ]
-}
-PERSONA_ACK = {'role': 'model', 'parts': ['जी, मैं समझ गया। मैं एक किसान मित्र की तरह सरल हिंदी में बात करूँगा।']}
+# The persona and standing instructions are the model's system instruction, not turns
+# re-sent at the front of every prompt. Each is a constant, so every call of a handler
+# starts with the same prefix and Gemini can serve it from its context cache.
+PERSONA_INSTRUCTION = "आप 'AgriPath' नाम के एक मित्रवत और जानकार AI कृषि मित्र हैं। आपकी बोली सरल और स्पष्ट हिंदी में है, जैसे आप गाँव के किसी किसान मित्र से बात कर रहे हों। अपने उत्तरों को स्वाभाविक, संक्षिप्त और संवादी रखें।"
+CROP_INSTRUCTION = PERSONA_INSTRUCTION + "\nजब आप फसलों की सूची सुझाते हैं, तो हर फसल का नाम एक नई लाइन पर दें। सूची बनाने के लिए किसी भी बुलेट पॉइंट या नंबरिंग का प्रयोग न करें।"
+
+# The chat history sent with a turn: at most CHAT_CONTEXT_MESSAGES, trimmed from the
+# oldest end CHAT_CONTEXT_STEP messages at a time so the prefix stays stable in between
+CHAT_CONTEXT_MESSAGES = 20
+CHAT_CONTEXT_STEP = 10
+
+
+def recent_history(history):
+    excess = len(history) - CHAT_CONTEXT_MESSAGES
+    if excess <= 0:
+        return history
+    start = -(-excess // CHAT_CONTEXT_STEP) * CHAT_CONTEXT_STEP
+    return history[start:]
 
 
 def handle_weather_query(user_prompt, history):
-    city_extraction_prompt = f"इस वाक्य से केवल शहर का नाम निकालें: '{user_prompt}'. केवल एक शब्द में उत्तर दें।"
-    city_name = generate_gemini_response(city_extraction_prompt).strip()
+    # Fixed instruction first, the farmer's words last: the prompt prefix is the same every time
+    city_extraction_prompt = f"इस वाक्य से केवल शहर का नाम निकालें। केवल एक शब्द में उत्तर दें। वाक्य: '{user_prompt}'"
+    with metrics.span('city_extraction'):
+        city_name = generate_gemini_response(city_extraction_prompt).strip()
 
     if not city_name or "क्षमा करें" in city_name or len(city_name.split()) > 3:
         return "मैं आपका शहर समझ नहीं पाया। क्या आप कृपया फिर से बता सकते हैं।"
 
-    weather_data, error = get_weather_data(city_name)
+    with metrics.span('weather'):
+        weather_data, error = get_weather_data(city_name)
     if error:
         return f"मुझे '{city_name}' नाम کا شہر नहीं मिला। कृपया शहर का नाम जांच लें।"
 
+    def weather_template():
+        # Local summary used when Gemini cannot answer within the request budget
+        return (f"{weather_data.get('city') or city_name} में अभी तापमान {weather_data['temperature']}°C है, "
+                f"मौसम {weather_data['description']} है और नमी {weather_data['humidity']}% है।")
+
     final_prompt_list = [
-        PERSONA_PROMPT,
-        PERSONA_ACK,
-        *history,
+        *recent_history(history),
         {'role': 'user', 'parts': [f"""
         यहाँ '{city_name}' का वास्तविक मौसम डेटा है:
         - तापमान: {weather_data['temperature']}°C
@@ -94,33 +145,59 @@ def handle_weather_query(user_prompt, history):
         इस डेटा के आधार पर, किसान को एक सरल और स्वाभाविक सारांश (1-2 वाक्यों में) प्रदान करें।
         """]}
     ]
-    return generate_gemini_response(final_prompt_list)
+    with metrics.span('generate'):
+        return generate_gemini_response(final_prompt_list, fallback=weather_template,
+                                        system_instruction=PERSONA_INSTRUCTION)
 
 def handle_crop_recommendation(user_prompt, history):
-    final_prompt_list = [
-        PERSONA_PROMPT,
-        PERSONA_ACK,
-        {'role': 'user', 'parts': ['जब आप फसलों की सूची सुझाते हैं, तो हर फसल का नाम एक नई लाइन पर दें। सूची बनाने के लिए किसी भी बुलेट पॉइंट या नंबरिंग का प्रयोग न करें।']},
-        {'role': 'model', 'parts': ['जी, मैं हर फसल का नाम एक नई लाइन पर दूंगा, बिना किसी निशान के।']},
-        *history
-    ]
-    return generate_gemini_response(final_prompt_list)
+    with metrics.span('generate'):
+        return generate_gemini_response(recent_history(history), system_instruction=CROP_INSTRUCTION)
 
 def handle_government_scheme(user_prompt, history):
-    final_prompt_list = [
-        PERSONA_PROMPT,
-        PERSONA_ACK,
-        *history
-    ]
-    return generate_gemini_response(final_prompt_list)
+    with metrics.span('generate'):
+        return generate_gemini_response(recent_history(history), system_instruction=PERSONA_INSTRUCTION)
 
 def handle_general_conversation(user_prompt, history):
-    final_prompt_list = [
-        PERSONA_PROMPT,
-        PERSONA_ACK,
-        *history
-    ]
-    return generate_gemini_response(final_prompt_list)
+    with metrics.span('generate'):
+        return generate_gemini_response(recent_history(history), system_instruction=PERSONA_INSTRUCTION)
+
+def route_turn(user_prompt, history):
+    """The routed engine: classify the turn, then hand it to that category's handler."""
+    # --- Step 1: Classification (uses only the latest prompt) ---
+    classifier_prompt = f"""Classify this into: 'weather', 'crop_recommendation', 'government_scheme', 'general_conversation'. Respond only with the category name. User query: "{user_prompt}\"."""
+    with metrics.span('classify'):
+        category = generate_gemini_response(classifier_prompt).strip().lower()
+
+    # --- Step 2: Routing ---
+    if 'weather' in category:
+        # Pass the user's specific text and the full context
+        return handle_weather_query(user_prompt, history)
+    elif 'crop' in category:
+        return handle_crop_recommendation(user_prompt, history)
+    elif 'scheme' in category or 'yojana' in category or 'sarkari' in category:
+        return handle_government_scheme(user_prompt, history)
+    return handle_general_conversation(user_prompt, history)
+
+# The tool-routing engine (core/chat_tools.py): one call that may ask for the app's data,
+# and one follow-up that answers from it
+TOOLS_INSTRUCTION = CROP_INSTRUCTION + "\nमौसम, फसलों की सलाह और सरकारी योजनाओं के सवालों पर दिए गए फ़ंक्शन से जानकारी लें और उसी के आधार पर उत्तर दें।"
+
+
+def handle_with_tools(user_prompt, history, location=''):
+    try:
+        text = chat_tools.respond(MODEL, recent_history(history), system_instruction=TOOLS_INSTRUCTION,
+                                  location=location)
+    except llm.LLMTimeout:
+        text = ''
+    except Exception as e:
+        print(f"GEMINI API ERROR: {e}")
+        return "क्षमा करें, AI से कनेक्ट करते समय एक त्रुटि हुई।"
+    return clean_reply(text or TIMEOUT_MESSAGE)
+
+
+def _profile_location(request):
+    profile = getattr(request.user, 'profile', None) if request.user.is_authenticated else None
+    return getattr(profile, 'location', '') or ''
 
 # ==============================================================================
 #  MAIN DJANGO VIEWS
@@ -160,25 +237,15 @@ def process_voice(request):
         # Use the correct Gemini format for the user's latest message
         history.append({'role': 'user', 'parts': [user_prompt]})
 
-        # --- Step 1: Classification (uses only the latest prompt) ---
-        classifier_prompt = f"""User query: "{user_prompt}". Classify this into: 'weather', 'crop_recommendation', 'government_scheme', 'general_conversation'. Respond only with the category name."""
-        category = generate_gemini_response(classifier_prompt).strip().lower()
-
-        # 3. Create a **copy** of the history for the AI handlers to use.
-        # This ensures the classification prompt doesn't interfere with the main chat history.
-        conversation_context = list(history)
-        
-        # --- Step 2: Routing ---
-        final_response_text = ""
-        if 'weather' in category:
-            # Pass the user's specific text and the full context
-            final_response_text = handle_weather_query(user_prompt, conversation_context)
-        elif 'crop' in category:
-            final_response_text = handle_crop_recommendation(user_prompt, conversation_context)
-        elif 'scheme' in category or 'yojana' in category or 'sarkari' in category:
-            final_response_text = handle_government_scheme(user_prompt, conversation_context)
-        else:
-            final_response_text = handle_general_conversation(user_prompt, conversation_context)
+        # Every Gemini call in this turn shares one request budget, bounding the turn's latency
+        with llm.request_deadline():
+            # 3. Create a **copy** of the history for the AI handlers to use.
+            # This ensures the classification prompt doesn't interfere with the main chat history.
+            conversation_context = list(history)
+            if settings.CHAT_ENGINE == 'tools':
+                final_response_text = handle_with_tools(user_prompt, conversation_context, _profile_location(request))
+            else:
+                final_response_text = route_turn(user_prompt, conversation_context)
 
         # 4. Add the AI's response to the history list
         # Use the correct Gemini format for the model's response
@@ -200,4 +267,125 @@ def process_voice(request):
 def clear_chat(request):
     if 'chat_history' in request.session:
         del request.session['chat_history']
-    return JsonResponse({'status': 'success', 'message': 'Chat history cleared.'})
\ No newline at end of file
+    return JsonResponse({'status': 'success', 'message': 'Chat history cleared.'})
+
+
+def metrics_view(request):
+    # Prometheus scrape endpoint; merges the snapshots of all workers when METRICS_DIR is set
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def export_advisories(request):
+    # Recommended crops of every farmer with a location, streamed a chunk of profiles at a time
+    output_format = request.GET.get('format', 'csv')
+    if output_format not in advisories.FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(advisories.FORMATS)}"}, status=400)
+    if output_format == 'parquet' and not advisories.parquet_available():
+        return JsonResponse({'error': 'Parquet export needs pyarrow, which is not installed'}, status=501)
+    month = timezone.localdate().month
+    response = StreamingHttpResponse(advisories.export(output_format, month=month),
+                                     content_type=advisories.FORMATS[output_format])
+    filename = f'advisories-{timezone.localdate():%Y-%m-%d}.{output_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+# --- Media files ---
+# Names under these prefixes are content hashes (accounts/avatars.py), so their bytes never change
+IMMUTABLE_MEDIA_PREFIXES = ('avatars/',)
+MEDIA_MAX_AGE = 60 * 60
+MEDIA_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """(start, end) of a single byte range, None to send the whole file, False if unsatisfiable."""
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        # Multipart ranges aren't worth supporting for avatars; send the full file
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_chunks(fh, length):
+    try:
+        while length > 0:
+            chunk = fh.read(min(MEDIA_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def serve_media(request, path):
+    # Serves MEDIA_ROOT in every environment: validators for conditional GETs, long-lived
+    # caching of content-addressed files and single byte ranges (resumable downloads on flaky links)
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    if path.startswith(IMMUTABLE_MEDIA_PREFIXES):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = f'public, max-age={MEDIA_MAX_AGE}'
+    headers = {'ETag': etag, 'Last-Modified': last_modified, 'Cache-Control': cache_control}
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    else:
+        not_modified = not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime)
+    if not_modified:
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    byte_range = _parse_range(request.headers.get('Range'), stat.st_size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range.strip() not in (etag, last_modified):
+        # The client's partial copy is stale; it needs the whole file
+        byte_range = None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    fh = open(full_path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        fh.seek(start)
+        response = StreamingHttpResponse(_read_chunks(fh, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        # Whole files go through FileResponse, which gunicorn can hand to sendfile()
+        response = FileResponse(fh, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    for key, value in headers.items():
+        response[key] = value
+    return response
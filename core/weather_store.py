@@ -0,0 +1,246 @@
+# core/weather_store.py
+"""
+Local store of the weather we fetch from OpenWeather.
+
+Every current reading and forecast is written to WeatherObservation, one
+bulk upsert per fetch. Readers check here before calling upstream:
+
+* ``latest_current()`` returns a reading younger than CURRENT_MAX_AGE
+* ``latest_forecast()`` returns the steps of a forecast fetched within
+  FORECAST_MAX_AGE
+* ``history()`` returns daily aggregates plus the days still held raw, for
+  trends such as the last month's rainfall (``recent_rainfall()``, shown
+  on the weather page)
+
+A current reading's rainfall is OpenWeather's total over the last hour, and
+a place may be read several times an hour, so a day's rainfall sums the
+largest reading of each hour rather than every reading.
+
+``compact()`` (run by ``manage.py compact_weather``) folds current readings
+older than RAW_RETENTION into WeatherDaily rows, drops forecasts whose time
+has passed and deletes daily rows older than DAILY_RETENTION.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from core import metrics, soil
+from core.models import WeatherDaily, WeatherObservation
+
+CURRENT_MAX_AGE = timedelta(minutes=10)  # OpenWeather refreshes current data about this often
+FORECAST_MAX_AGE = timedelta(hours=1)
+RAW_RETENTION = timedelta(days=7)
+FORECAST_RETENTION = timedelta(days=1)  # past forecast steps kept this long
+DAILY_RETENTION = timedelta(days=2 * 365)
+BATCH_SIZE = 500
+
+OBSERVATION_FIELDS = ('lat', 'lon', 'place', 'temperature', 'temp_min', 'temp_max', 'humidity', 'pressure',
+                      'wind_speed', 'visibility', 'rainfall', 'description', 'icon')
+
+
+def location_key(location=None, lat=None, lon=None):
+    """Store key of a place: its normalized name, or its coordinates to ~1 km."""
+    if location:
+        return soil.normalize(location)[:64]
+    return f'{lat:.2f},{lon:.2f}'
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def current_row(data):
+    """Observation fields of an OpenWeather /weather response."""
+    weather = (data.get('weather') or [{}])[0]
+    return {
+        'observed_at': _timestamp(data['dt']) if data.get('dt') else timezone.now(),
+        'lat': data.get('coord', {}).get('lat'),
+        'lon': data.get('coord', {}).get('lon'),
+        'place': (data.get('name') or '')[:64],
+        'temperature': data['main'].get('temp'),
+        'temp_min': data['main'].get('temp_min'),
+        'temp_max': data['main'].get('temp_max'),
+        'humidity': data['main'].get('humidity'),
+        'pressure': data['main'].get('pressure'),
+        'wind_speed': data.get('wind', {}).get('speed'),
+        'visibility': data.get('visibility'),
+        'rainfall': data.get('rain', {}).get('1h'),
+        'description': (weather.get('description') or '')[:64],
+        'icon': (weather.get('icon') or '')[:4],
+    }
+
+
+def forecast_row(item):
+    """Observation fields of one step of an OpenWeather /forecast response."""
+    weather = (item.get('weather') or [{}])[0]
+    # dt_txt is the same instant as dt, as UTC text
+    observed_at = (datetime.strptime(item['dt_txt'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=dt_timezone.utc)
+                   if item.get('dt_txt') else _timestamp(item['dt']))
+    return {
+        'observed_at': observed_at,
+        'temperature': item['main'].get('temp'),
+        'temp_min': item['main'].get('temp_min'),
+        'temp_max': item['main'].get('temp_max'),
+        'humidity': item['main'].get('humidity'),
+        'pressure': item['main'].get('pressure'),
+        'wind_speed': item.get('wind', {}).get('speed'),
+        'visibility': item.get('visibility'),
+        'rainfall': item.get('rain', {}).get('3h'),
+        'description': (weather.get('description') or '')[:64],
+        'icon': (weather.get('icon') or '')[:4],
+    }
+
+
+def record(key, kind, rows, fetched_at=None):
+    """Upserts readings of one fetch in a single batched statement; failures are logged, not raised."""
+    fetched_at = fetched_at or timezone.now()
+    objects = [WeatherObservation(location=key, kind=kind, fetched_at=fetched_at, **row) for row in rows]
+    try:
+        with metrics.span('weather_store'):
+            WeatherObservation.objects.bulk_create(
+                objects, batch_size=BATCH_SIZE, update_conflicts=True,
+                unique_fields=['location', 'kind', 'observed_at'],
+                update_fields=['fetched_at', *OBSERVATION_FIELDS],
+            )
+    except Exception as e:
+        print(f"Weather store write failed: {e}")
+
+
+def latest_current(key, max_age=CURRENT_MAX_AGE):
+    """The newest current reading fetched within ``max_age`` (as a dict), or None."""
+    try:
+        observation = (WeatherObservation.objects
+                       .filter(location=key, kind=WeatherObservation.CURRENT,
+                               fetched_at__gte=timezone.now() - max_age)
+                       .order_by('-fetched_at')
+                       .values('observed_at', *OBSERVATION_FIELDS).first())
+    except Exception as e:
+        print(f"Weather store read failed: {e}")
+        observation = None
+    metrics.cache_event('weather_current', observation is not None)
+    return observation
+
+
+def latest_forecast(key, max_age=FORECAST_MAX_AGE):
+    """Steps (dicts) of the newest forecast fetched within ``max_age``, in time order; [] if none."""
+    try:
+        newest = (WeatherObservation.objects
+                  .filter(location=key, kind=WeatherObservation.FORECAST,
+                          fetched_at__gte=timezone.now() - max_age)
+                  .aggregate(newest=Max('fetched_at'))['newest'])
+        steps = list(WeatherObservation.objects
+                     .filter(location=key, kind=WeatherObservation.FORECAST, fetched_at=newest)
+                     .order_by('observed_at')
+                     .values('observed_at', *OBSERVATION_FIELDS)) if newest else []
+    except Exception as e:
+        print(f"Weather store read failed: {e}")
+        steps = []
+    metrics.cache_event('weather_forecast', bool(steps))
+    return steps
+
+
+def _daily_rainfall(observations):
+    """{(location, date): mm} of current readings, each hour counted once."""
+    hours = (observations.filter(rainfall__isnull=False)
+             .annotate(date=TruncDate('observed_at'), hour=TruncHour('observed_at'))
+             .values('location', 'date', 'hour')
+             .annotate(rainfall=Max('rainfall'))
+             .order_by())
+    totals = {}
+    for row in hours:
+        day = (row['location'], row['date'])
+        totals[day] = totals.get(day, 0.0) + row['rainfall']
+    return totals
+
+
+def _raw_daily(key, since):
+    observations = WeatherObservation.objects.filter(location=key, kind=WeatherObservation.CURRENT,
+                                                     observed_at__gte=since)
+    rainfall = _daily_rainfall(observations)
+    rows = (observations
+            .annotate(date=TruncDate('observed_at'))
+            .values('date')
+            .annotate(samples=Count('id'), temp_mean=Avg('temperature'), temp_min=Min('temperature'),
+                      temp_max=Max('temperature'), humidity_mean=Avg('humidity'))
+            .order_by('date'))
+    return [dict(row, rainfall=rainfall.get((key, row['date']))) for row in rows]
+
+
+def history(key, days=30):
+    """Daily rows for the last ``days`` days: compacted days plus those still held raw."""
+    since = timezone.now() - timedelta(days=days)
+    fields = ('date', 'samples', 'temp_mean', 'temp_min', 'temp_max', 'humidity_mean', 'rainfall')
+    rows = {row['date']: row for row in
+            WeatherDaily.objects.filter(location=key, date__gte=since.date()).values(*fields)}
+    for row in _raw_daily(key, since):
+        rows[row['date']] = _merge(rows.get(row['date']), row)
+    return [rows[date] for date in sorted(rows)]
+
+
+def recent_rainfall(key, days=30):
+    """{'days', 'rainfall', 'rainy_days'} over the days of the last ``days`` with readings; None if none."""
+    try:
+        rows = history(key, days=days)
+    except Exception as e:
+        print(f"Weather store read failed: {e}")
+        return None
+    if not rows:
+        return None
+    rainfall = [row['rainfall'] or 0.0 for row in rows]
+    return {'days': len(rows), 'rainfall': round(sum(rainfall), 1),
+            'rainy_days': sum(1 for mm in rainfall if mm >= 2.5)}  # IMD's threshold for a rainy day
+
+
+def _merge(existing, new):
+    """Combines two aggregates of the same day."""
+    if not existing:
+        return dict(new)
+    total = existing['samples'] + new['samples']
+
+    def mean(field):
+        pairs = [(row[field], row['samples']) for row in (existing, new) if row[field] is not None]
+        return sum(value * n for value, n in pairs) / sum(n for _, n in pairs) if pairs else None
+
+    def pick(field, choose):
+        values = [row[field] for row in (existing, new) if row[field] is not None]
+        return choose(values) if values else None
+
+    return {
+        'date': new['date'], 'samples': total,
+        'temp_mean': mean('temp_mean'), 'humidity_mean': mean('humidity_mean'),
+        'temp_min': pick('temp_min', min), 'temp_max': pick('temp_max', max),
+        'rainfall': pick('rainfall', sum),
+    }
+
+
+def compact(now=None):
+    """Downsamples and expires old rows; returns counts of what was done."""
+    now = now or timezone.now()
+    # Whole days only, so a day is never split between raw rows and its aggregate
+    cutoff = (now - RAW_RETENTION).replace(hour=0, minute=0, second=0, microsecond=0)
+    old = WeatherObservation.objects.filter(kind=WeatherObservation.CURRENT, observed_at__lt=cutoff)
+    aggregates = (old.annotate(date=TruncDate('observed_at'))
+                  .values('location', 'date')
+                  .annotate(samples=Count('id'), temp_mean=Avg('temperature'), temp_min=Min('temperature'),
+                            temp_max=Max('temperature'), humidity_mean=Avg('humidity')))
+    with transaction.atomic():
+        rainfall = _daily_rainfall(old)
+        days = 0
+        for row in aggregates:
+            location = row.pop('location')
+            row['rainfall'] = rainfall.get((location, row['date']))
+            existing = (WeatherDaily.objects.filter(location=location, date=row['date'])
+                        .values('date', 'samples', 'temp_mean', 'temp_min', 'temp_max', 'humidity_mean', 'rainfall')
+                        .first())
+            merged = _merge(existing, row)
+            WeatherDaily.objects.update_or_create(location=location, date=merged.pop('date'), defaults=merged)
+            days += 1
+        raw_deleted, _ = old.delete()
+    forecasts_deleted, _ = WeatherObservation.objects.filter(
+        kind=WeatherObservation.FORECAST, observed_at__lt=now - FORECAST_RETENTION).delete()
+    daily_deleted, _ = WeatherDaily.objects.filter(date__lt=(now - DAILY_RETENTION).date()).delete()
+    return {'days_aggregated': days, 'raw_deleted': raw_deleted,
+            'forecasts_deleted': forecasts_deleted, 'daily_deleted': daily_deleted}
@@ -0,0 +1,83 @@
+# gunicorn.conf.py
+"""
+Production worker profile.
+
+The app is preloaded in the master: Django, pandas, sklearn, the crop model
+forest and the Gemini SDK are imported once (core.startup.warm(), since the
+app itself imports them lazily) and shared copy-on-write with every worker
+instead of being loaded per worker. Workers are threaded
+(gthread) because most of a request is spent waiting on Gemini and
+OpenWeather, not on the CPU.
+
+Everything can be overridden from the environment, e.g.
+GUNICORN_WORKER_CLASS=sync GUNICORN_PRELOAD=0 to get the old behaviour.
+"""
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Threads are cheap while they wait on I/O; a few processes are enough for the CPU-bound parts
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() + 1, 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))  # async worker classes
+
+# Must stay above GEMINI_REQUEST_BUDGET_SECONDS so the app, not gunicorn, decides when to give up
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then; with preload a new worker is a cheap fork of the master
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mypage.settings')
+# Every worker writes its metrics snapshot here so /metrics can report all of them (core/metrics.py)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'agripath-metrics'))
+
+
+def on_starting(server):
+    # Snapshots left by a previous master would be counted again
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # wsgi.py only sets Django up; import the views and load what they load lazily (the crop
+    # model and the Gemini SDK) here in the master, before any worker is forked
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    from core import startup
+    startup.warm()
+    # Connections are persistent (CONN_MAX_AGE); one opened here must not be inherited by the workers
+    from django.db import connections
+    connections.close_all()
+    # Move everything loaded so far out of the GC's reach, so collections in the workers
+    # don't write to (and un-share) the pages holding the model
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from core import llm, metrics
+    llm.reinit_after_fork()
+    metrics.reset_after_fork()
+
+
+def child_exit(server, worker):
+    from core import metrics
+    metrics.mark_process_dead(worker.pid)
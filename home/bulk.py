@@ -0,0 +1,201 @@
+# home/bulk.py
+"""
+Bulk crop recommendations for many farm plots at once.
+
+An upload is a CSV file with a header row, or JSON lines (one object per
+line), holding the model features of each plot (N, P, K, temperature,
+humidity, ph, rainfall) and optionally an ``id``. It is spooled to a
+temporary file first (to disk past FILE_UPLOAD_MAX_MEMORY_SIZE), then
+parsed line by line and scored BULK_CHUNK_SIZE rows at a time through
+``crop_model.predict_batch``. Results are yielded chunk by chunk as CSV or
+NDJSON, so memory stays flat however many rows the file has.
+
+Spooling keeps the upload and the response from running at the same time:
+a client that sends the whole file before reading the answer would
+otherwise stall once the response filled the socket buffers.
+"""
+import codecs
+import csv
+import io
+import json
+import math
+import tempfile
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+
+from core import crop_model
+
+# Past ~2000 rows a bigger model call saves little per row
+BULK_CHUNK_SIZE = 2000
+BULK_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Request Content-Types (and upload file extensions) of each format
+INPUT_TYPES = {
+    'text/csv': 'csv', 'application/csv': 'csv', '.csv': 'csv',
+    'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson', 'application/json-lines': 'ndjson',
+    '.ndjson': 'ndjson', '.jsonl': 'ndjson',
+}
+OUTPUT_COLUMNS = ['row', 'id', 'crops', 'confidence', 'error']
+# Header names are matched case-insensitively
+FEATURE_NAMES = {name.lower(): name for name in crop_model.FEATURES}
+
+
+class BulkInputError(ValueError):
+    """The upload can't be read at all (as opposed to one bad row)."""
+
+
+class UploadTooLarge(BulkInputError):
+    pass
+
+
+def spool(stream, max_bytes=None):
+    """Copies a request body into a temporary file, in chunks; returns it rewound."""
+    max_bytes = max_bytes or BULK_MAX_UPLOAD_BYTES
+    spooled = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    copied = 0
+    while True:
+        chunk = stream.read(64 * 1024)
+        if not chunk:
+            break
+        copied += len(chunk)
+        if copied > max_bytes:
+            spooled.close()
+            raise UploadTooLarge(f'Upload is larger than {max_bytes} bytes')
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def text_lines(fh):
+    """Decoded lines of a binary file, without loading it (a UTF-8 BOM is dropped)."""
+    # Undecodable bytes fail their row's number parsing instead of the whole stream
+    return codecs.iterdecode(iter(fh.readline, b''), 'utf-8-sig', errors='replace')
+
+
+def _feature(value):
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+def _parse(record):
+    """Features of one plot in FEATURES order; ValueError says what is wrong with it."""
+    missing = [name for name in crop_model.FEATURES if record.get(name) in (None, '')]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        return [_feature(record[name]) for name in crop_model.FEATURES]
+    except (TypeError, ValueError):
+        raise ValueError('features must be numbers') from None
+
+
+def csv_records(lines):
+    """Plot records of a CSV upload; raises BulkInputError if the header lacks a feature."""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise BulkInputError('The file is empty')
+    columns = [FEATURE_NAMES.get(name.strip().lower(), name.strip().lower()) for name in header]
+    missing = [name for name in crop_model.FEATURES if name not in columns]
+    if missing:
+        raise BulkInputError(f"Missing columns: {', '.join(missing)}")
+
+    def records():
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            yield dict(zip(columns, values))
+    return records()
+
+
+def ndjson_records(lines):
+    """Plot records of a JSON-lines upload; a line that isn't a JSON object becomes an error row."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            yield {'_error': 'not a JSON object'}
+            continue
+        yield {FEATURE_NAMES.get(key.lower(), key): value for key, value in record.items()}
+
+
+def score(records, chunk_size=BULK_CHUNK_SIZE):
+    """Yields a list of result dicts per chunk of ``records``, each chunk scored in one model call."""
+    records = iter(records)
+    row = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        results, features = [], []
+        for record in chunk:
+            row += 1
+            result = {'row': row, 'id': record.get('id'), 'crops': None, 'confidence': None, 'error': None}
+            try:
+                if '_error' in record:
+                    raise ValueError(record['_error'])
+                features.append(_parse(record))
+            except ValueError as e:
+                result['error'] = str(e)
+            results.append(result)
+        if features:
+            crops, confidence = crop_model.predict_batch(np.array(features))
+            valid = (result for result in results if result['error'] is None)
+            for result, row_crops, row_confidence in zip(valid, crops, confidence):
+                result['crops'] = [str(crop) for crop in row_crops]
+                result['confidence'] = round(float(row_confidence), 4)
+        yield results
+
+
+def csv_output(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(OUTPUT_COLUMNS)
+    for results in chunks:
+        for result in results:
+            writer.writerow([
+                result['row'], '' if result['id'] is None else result['id'],
+                ';'.join(result['crops'] or ()), '' if result['confidence'] is None else result['confidence'],
+                result['error'] or '',
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_output(chunks):
+    for results in chunks:
+        yield ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in results).encode('utf-8')
+
+
+def stream(fh, input_format, output_format, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Response chunks for the upload in ``fh``; the file is closed when they are exhausted.
+
+    The CSV header is read before this returns, so a file without the
+    feature columns raises BulkInputError while an error status can still be sent.
+    """
+    lines = text_lines(fh)
+    try:
+        records = csv_records(lines) if input_format == 'csv' else ndjson_records(lines)
+    except BulkInputError:
+        fh.close()
+        raise
+    output = csv_output if output_format == 'csv' else ndjson_output
+
+    def chunks():
+        try:
+            yield from output(score(records, chunk_size))
+        finally:
+            fh.close()
+    return chunks()
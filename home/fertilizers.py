@@ -0,0 +1,177 @@
+# home/fertilizers.py
+"""
+Fertilizer catalog behind the Fertilizer page.
+
+The products, crop notes and UI strings live in data/fertilizer_catalog.json
+and are indexed once per process:
+
+* tdsRange and priceINR in interval trees, so a TDS reading or a price
+  band finds its products without scanning the catalog
+* suitableCrops and suitableSoilTypes in inverted indexes, with the
+  products marked "All" kept aside and added to every lookup
+
+``Catalog.search()`` intersects whichever filters are given and returns the
+products in catalog order; ``localize()`` and ``Catalog.meta()`` cut the
+bilingual records down to one language for the JSON API in home/views.py.
+"""
+import hashlib
+import json
+import math
+import os
+
+CATALOG_FILE = os.path.join(os.path.dirname(__file__), 'data', 'fertilizer_catalog.json')
+LANGUAGES = ('en', 'hi')
+LOCALIZED_FIELDS = ('name', 'type', 'unit', 'description', 'usage', 'safety')
+ANY = 'All'  # suitableCrops/suitableSoilTypes value meaning "every crop/soil"
+
+
+class IntervalTree:
+    """Static centered interval tree over closed intervals given as (low, high, item)."""
+
+    def __init__(self, intervals):
+        self.root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        endpoints = sorted(point for low, high, _ in intervals for point in (low, high))
+        center = endpoints[len(endpoints) // 2]
+        here = [iv for iv in intervals if iv[0] <= center <= iv[1]]
+        return (
+            center,
+            sorted(here, key=lambda iv: iv[0]),   # by low end, ascending
+            sorted(here, key=lambda iv: -iv[1]),  # by high end, descending
+            self._build([iv for iv in intervals if iv[1] < center]),
+            self._build([iv for iv in intervals if iv[0] > center]),
+        )
+
+    def overlapping(self, low, high):
+        """Items whose interval intersects [low, high]."""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, by_low, by_high, left, right = node
+            if high < center:
+                # Everything here reaches the center, so it overlaps iff it starts by `high`
+                for start, _, item in by_low:
+                    if start > high:
+                        break
+                    found.append(item)
+                stack.append(left)
+            elif low > center:
+                for _, end, item in by_high:
+                    if end < low:
+                        break
+                    found.append(item)
+                stack.append(right)
+            else:
+                found.extend(item for _, _, item in by_low)
+                stack.extend((left, right))
+        return found
+
+
+def _inverted(products, field):
+    index = {}
+    for position, product in enumerate(products):
+        for value in product[field]:
+            index.setdefault(value, set()).add(position)
+    return {value: frozenset(positions) for value, positions in index.items()}
+
+
+def parse_price(value):
+    """'500-1000' -> (500, 1000), '2000+' -> (2000, inf), 'all' or '' -> None."""
+    if not value or value == 'all':
+        return None
+    if value.endswith('+'):
+        return int(value[:-1]), math.inf
+    low, high = value.split('-')
+    return int(low), int(high)
+
+
+class Catalog:
+    def __init__(self, data):
+        self.products = data['products']
+        self.crop_info = {info['value']: info for info in data['crop_info']}
+        self.crop_options = data['crop_options']
+        self.translations = data['translations']
+        # Changes whenever the data file does; part of every ETag
+        self.version = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+        self.by_tds = IntervalTree(
+            (p['tdsRange']['min'], p['tdsRange']['max'], i) for i, p in enumerate(self.products))
+        self.by_price = IntervalTree(
+            (p['priceINR']['min'], p['priceINR']['max'], i) for i, p in enumerate(self.products))
+        self.by_crop = _inverted(self.products, 'suitableCrops')
+        self.by_soil = _inverted(self.products, 'suitableSoilTypes')
+
+    @staticmethod
+    def _suitable(index, value):
+        return index.get(value, frozenset()) | index.get(ANY, frozenset())
+
+    def search(self, tds=None, crop=None, soil=None, price=None):
+        """Products matching every given filter, in catalog order.
+
+        ``price`` is a (low, high) band; a product matches if its price range
+        reaches ``low`` and starts below ``high``, as on the original page.
+        """
+        candidates = None
+
+        def narrow(positions):
+            nonlocal candidates
+            positions = set(positions)
+            candidates = positions if candidates is None else candidates & positions
+
+        if crop:
+            narrow(self._suitable(self.by_crop, crop))
+        if soil:
+            narrow(self._suitable(self.by_soil, soil))
+        if tds is not None:
+            narrow(self.by_tds.overlapping(tds, tds))
+        if price is not None:
+            low, high = price
+            narrow(i for i in self.by_price.overlapping(low, high) if self.products[i]['priceINR']['min'] < high)
+        positions = range(len(self.products)) if candidates is None else sorted(candidates)
+        return [self.products[i] for i in positions]
+
+    def meta(self, lang):
+        """UI strings, crop choices and crop notes for one language."""
+        crops = [{'value': c['value'], 'name': c.get(f'name_{lang}') or c['name_en']} for c in self.crop_options]
+        return {
+            'lang': lang,
+            'translations': self.translations[lang],
+            'crops': sorted(crops, key=lambda c: c['name']),
+            'crop_info': {
+                value: {
+                    'optimal_tds': info.get(f'optimalTDS_{lang}'),
+                    'preferred_soil': info.get(f'preferredSoil_{lang}'),
+                    'general_advice': info.get(f'generalAdvice_{lang}'),
+                }
+                for value, info in self.crop_info.items()
+            },
+        }
+
+
+def localize(product, lang):
+    """A product with only the text of ``lang``."""
+    localized = {'id': product['id']}
+    for field in LOCALIZED_FIELDS:
+        localized[field] = product.get(f'{field}_{lang}') or product.get(f'{field}_en', '')
+    localized['price_inr'] = product['priceINR']
+    localized['tds_range'] = product['tdsRange']
+    localized['suitable_soil_types'] = product['suitableSoilTypes']
+    localized['suitable_crops'] = product['suitableCrops']
+    return localized
+
+
+CATALOG = None
+
+
+def get_catalog():
+    global CATALOG
+    if CATALOG is None:
+        with open(CATALOG_FILE, encoding='utf-8') as fh:
+            CATALOG = Catalog(json.load(fh))
+    return CATALOG
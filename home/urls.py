@@ -11,7 +11,10 @@ urlpatterns = [
     
     path('Weather', views.Weather, name='Weather'),
     path('Fertilizer',views.Fertilizer,name= 'Fertilizer'),
+    path('api/fertilizers', views.fertilizer_search, name='fertilizer_search'),
+    path('api/fertilizers/meta', views.fertilizer_meta, name='fertilizer_meta'),
     path('CropAdvisory', views.CropAdvisory, name='CropAdvisory'),
+    path('api/recommendations/bulk', views.bulk_recommendations, name='bulk_recommendations'),
     
 
     
@@ -1,53 +1,140 @@
+import hashlib
 import json
+import os
 import re
+from datetime import timedelta
 import requests
-import google.generativeai as genai
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from core.crop_model import predict_suitable_crops, get_soil_data_by_location, CROP_PREDICTOR_MODEL
+from core.crop_model import predict_suitable_crops, get_soil_data_by_location, build_model_input
+from core import advisories, climate, crop_model, llm, metrics, places, weather_store
+from core.models import WeatherObservation
+from core.pagecache import cached_page
+from home import bulk, fertilizers
 
 # --- Configure GenAI for this app ---
-try:
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-    # Using flash model for speed
-    POLICY_MODEL = genai.GenerativeModel('gemini-2.5-flash-lite') 
-except Exception as e:
-    print(f"Error configuring Gemini in home/views: {e}")
-    POLICY_MODEL = None
+# Using flash model for speed; the SDK is imported and configured on the first call
+POLICY_MODEL = llm.LazyModel('gemini-2.5-flash-lite')
 
 OPENWEATHER_API_KEY = getattr(settings, 'OPENWEATHER_API_KEY', None)
+# How old a stored reading may be and still adjust the climate normals in Crop Advisory
+ADVISORY_WEATHER_MAX_AGE = timedelta(hours=3)
+
+# Served when Gemini misses its deadline and no earlier answer for the location is cached.
+# These central schemes apply in every state, so the page stays useful during an outage.
+FALLBACK_POLICIES = [
+    {
+        "name": "प्रधानमंत्री किसान सम्मान निधि (PM-KISAN)",
+        "description": "सभी भूमिधारक किसान परिवारों को सीधी आय सहायता।",
+        "benefits": "हर साल 6000 रुपये, तीन किस्तों में सीधे बैंक खाते में।",
+        "link": "https://pmkisan.gov.in"
+    },
+    {
+        "name": "प्रधानमंत्री फसल बीमा योजना (PMFBY)",
+        "description": "प्राकृतिक आपदा, कीट और रोग से फसल नुकसान पर बीमा।",
+        "benefits": "कम प्रीमियम पर फसल नुकसान की भरपाई।",
+        "link": "https://pmfby.gov.in"
+    },
+    {
+        "name": "किसान क्रेडिट कार्ड (KCC)",
+        "description": "खेती और उससे जुड़े कामों के लिए आसान और सस्ता कर्ज।",
+        "benefits": "समय पर भुगतान करने पर कम ब्याज दर पर ऋण।",
+        "link": "https://www.myscheme.gov.in/schemes/kcc"
+    },
+    {
+        "name": "मृदा स्वास्थ्य कार्ड योजना",
+        "description": "खेत की मिट्टी की जांच और पोषक तत्वों की जानकारी।",
+        "benefits": "मिट्टी के अनुसार खाद की सही मात्रा की सलाह।",
+        "link": "https://soilhealth.dac.gov.in"
+    }
+]
+
+def _current_weather(observation):
+    return {
+        "lat": observation["lat"],
+        "lon": observation["lon"],
+        "city": observation["place"],
+        "temperature": observation["temperature"],
+        "description": observation["description"],
+        "humidity": observation["humidity"],
+        "pressure": observation["pressure"],
+        "wind_speed": observation["wind_speed"],
+        "visibility": observation["visibility"],
+    }
 
-def get_current_weather_data(city_name):
+
+def get_current_weather_data(city_name, place=None):
     if not OPENWEATHER_API_KEY: return None, "Weather API key not configured."
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
+    # A reading fetched in the last few minutes is as current as OpenWeather's
+    key = places.key_of(city_name, place)
+    stored = weather_store.latest_current(key)
+    if stored:
+        return _current_weather(stored), None
+
+    base_url = f"{settings.OPENWEATHER_BASE_URL}/data/2.5/weather"
     params = {'q': city_name, 'appid': OPENWEATHER_API_KEY, 'units': 'metric', 'lang': 'hi'}
+    if place is not None and place.lat is not None:
+        # A resolved place is looked up by its coordinates, not geocoded by name again
+        params = {'lat': place.lat, 'lon': place.lon, 'appid': OPENWEATHER_API_KEY, 'units': 'metric', 'lang': 'hi'}
     try:
-        response = requests.get(base_url, params=params)
+        with metrics.upstream('openweather') as call:
+            response = requests.get(base_url, params=params)
+            call.status = response.status_code
         if response.status_code == 404: return None, f"City '{city_name}' not found."
         response.raise_for_status()
         data = response.json()
-        return {
-            "lat": data["coord"]["lat"],
-            "lon": data["coord"]["lon"],
-            "city": data.get("name"), 
-            "temperature": data["main"]["temp"],
-            "description": data["weather"][0]["description"], 
-            "humidity": data["main"]["humidity"],
-            "pressure": data["main"]["pressure"], # <-- ADDED
-            "wind_speed": data["wind"]["speed"], # <-- ADDED
-            "visibility": data.get("visibility") # <-- ADDED (in meters)
-        }, None
+        observation = weather_store.current_row(data)
+        weather_store.record(key, WeatherObservation.CURRENT, [observation])
+        return _current_weather(observation), None
     except requests.exceptions.RequestException as e:
         print(f"🔴 Weather API request error: {e}")
         return None, "Could not connect to the current weather service."
 
+
+def daily_forecast(steps):
+    """
+    The free API returns data every 3 hours. We will only take the data for
+    noon (12:00 UTC) each day to simulate a daily forecast for the next 5 days.
+    """
+    forecast = []
+    processed_dates = set()
+    for step in steps:
+        observed_at = step['observed_at']
+        # Check if this is a new day and is close to noon (12:00:00)
+        if observed_at.date() not in processed_dates and (observed_at.hour, observed_at.minute) == (12, 0):
+            forecast.append({
+                'date': int(observed_at.timestamp()),
+                'max_temp': step['temp_max'],
+                'min_temp': step['temp_min'],
+                'description': step['description'],
+                'icon': step['icon'],
+                'humidity': step['humidity']
+            })
+            processed_dates.add(observed_at.date())
+
+        # Stop after 5 days
+        if len(forecast) >= 5:
+            break
+    return forecast
+
+
 # Update get_alerts_and_forecast to capture wind/pressure/humidity/min/max temp for forecast
-def get_alerts_and_forecast(lat, lon):
+def get_alerts_and_forecast(lat, lon, location=None, place=None):
     if not OPENWEATHER_API_KEY: return {'forecast': [], 'alerts': []}, "API key missing."
-    
+
+    # Forecasts only change every 3 hours; reuse one fetched recently
+    key = places.key_of(location, place) if location else weather_store.location_key(lat=lat, lon=lon)
+    stored = weather_store.latest_forecast(key)
+    if stored:
+        return {'forecast': daily_forecast(stored), 'alerts': []}, None
+
     # [FIXED] Use the Free Tier 5-Day / 3-Hour Forecast API endpoint
-    base_url = "http://api.openweathermap.org/data/2.5/forecast"
+    base_url = f"{settings.OPENWEATHER_BASE_URL}/data/2.5/forecast"
     params = {
         'lat': lat, 
         'lon': lon, 
@@ -57,38 +144,20 @@ def get_alerts_and_forecast(lat, lon):
     }
 
     try:
-        response = requests.get(base_url, params=params)
+        with metrics.upstream('openweather_forecast') as call:
+            response = requests.get(base_url, params=params)
+            call.status = response.status_code
         response.raise_for_status()
         data = response.json()
-        
-        forecast = []
-        # The free API returns data every 3 hours. We will only take the data for 
-        # noon (12:00) each day to simulate a daily forecast for the next 5 days.
-        processed_dates = set()
-        for item in data.get('list', []):
-            date_str = item['dt_txt'].split(' ')[0] # 'YYYY-MM-DD'
-            time_str = item['dt_txt'].split(' ')[1] # 'HH:MM:SS'
-            
-            # Check if this is a new day and is close to noon (12:00:00)
-            if date_str not in processed_dates and time_str == '12:00:00':
-                forecast.append({
-                    'date': item.get('dt'),
-                    'max_temp': item['main']['temp_max'],
-                    'min_temp': item['main']['temp_min'],
-                    'description': item['weather'][0]['description'],
-                    'icon': item['weather'][0]['icon'],
-                    'humidity': item['main']['humidity']
-                })
-                processed_dates.add(date_str)
-            
-            # Stop after 5 days
-            if len(forecast) >= 5:
-                break
-            
+
+        # Every 3-hour step is kept, not just the ones shown
+        steps = [weather_store.forecast_row(item) for item in data.get('list', [])]
+        weather_store.record(key, WeatherObservation.FORECAST, steps)
+
         # [ALERTS REMOVED] The free API does not include severe weather alerts
         alerts = [] 
 
-        return {'forecast': forecast, 'alerts': alerts}, None
+        return {'forecast': daily_forecast(steps), 'alerts': alerts}, None
 
     except requests.exceptions.RequestException as e:
         print(f"🔴 OpenWeatherMap Forecast API request error: {e}")
@@ -97,7 +166,8 @@ def get_alerts_and_forecast(lat, lon):
 @login_required
 def CropAdvisory(request):
     try:
-        location = request.user.profile.location
+        profile = request.user.profile
+        location = profile.location
     except:
         return render(request, 'crop_advisory.html', {'error': 'प्रोफ़ाइल स्थान आवश्यक है।'})
 
@@ -106,27 +176,51 @@ def CropAdvisory(request):
             'error': 'कृपया अपनी प्रोफाइल में अपना स्थान (Location) अपडेट करें ताकि हम आपके लिए सलाह दे सकें।'
         })
 
-    if not CROP_PREDICTOR_MODEL:
+    # 0. The nightly job (manage.py materialize_advisories) has usually computed this
+    #    location's page already; everything below is for locations it hasn't seen
+    with metrics.span('advisory_lookup'):
+        place = profile.place
+        stored = advisories.materialized(location, place=place)
+    metrics.cache_event('location_advisory', stored is not None)
+    if stored is not None:
+        with metrics.span('render'):
+            return render(request, 'crop_advisory.html', {
+                'location': location,
+                'suitable_crops': stored.crops,
+                'soil_data': stored.model_input,
+                'advisory': stored.advisory,
+            })
+
+    if not crop_model.ensure_loaded():
          return render(request, 'crop_advisory.html', {'error': 'फसल सलाहकार मॉडल लोड नहीं हो सका।'})
 
-    # 1. Get Real-time Weather Data for Model Input
-    current_weather, weather_error = get_current_weather_data(location)
-    if weather_error or not current_weather:
-         return render(request, 'crop_advisory.html', {'error': f'मौसम डेटा प्राप्त करने में विफलता: {weather_error}.'})
-
-    # 2. Get Soil Data (Mocked/Estimated NPK, pH, Rainfall)
-    soil_data = get_soil_data_by_location(location)
-    
-    # 3. Combine Real-time and Estimated Data for the Model Input
-    model_input = {
-        'N': soil_data['N'],
-        'P': soil_data['P'],
-        'K': soil_data['K'],
-        'temperature': current_weather['temperature'],
-        'humidity': current_weather['humidity'],
-        'ph': soil_data['ph'],
-        'rainfall': soil_data['rainfall']
-    }
+    # 1. Soil of the profile's district, from the bundled table; a resolved place
+    #    outside it gets the district nearest to its coordinates
+    key = places.key_of(location, place)
+    current_weather, lat, lon = None, None, None
+    if place is not None and not place.district:
+        lat, lon = place.lat, place.lon
+    with metrics.span('soil'):
+        soil_data = get_soil_data_by_location(location, lat=lat, lon=lon)
+
+    # 2. OpenWeather is only needed to geocode places that aren't a district we
+    #    know (or if the normals grid is missing); its reading then adjusts the normals
+    if soil_data['district'] is None or climate.get_grid() is None:
+        with metrics.span('weather'):
+            current_weather, weather_error = get_current_weather_data(location)
+        if weather_error or not current_weather:
+             return render(request, 'crop_advisory.html', {'error': f'मौसम डेटा प्राप्त करने में विफलता: {weather_error}.'})
+        lat, lon = current_weather.get('lat'), current_weather.get('lon')
+        if soil_data['district'] is None:
+            with metrics.span('soil'):
+                soil_data = get_soil_data_by_location(location, lat=lat, lon=lon)
+
+    # 3. Combine soil with this month's climate normals for the model input; a
+    #    reading stored in the last few hours adjusts them without an upstream call
+    if current_weather is None:
+        current_weather = weather_store.latest_current(key, max_age=ADVISORY_WEATHER_MAX_AGE)
+    model_input = build_model_input(soil_data, timezone.localdate().month, lat=lat, lon=lon,
+                                    live_weather=current_weather)
 
     # 4. Predict MULTIPLE Suitable Crops
     suitable_crops = predict_suitable_crops(model_input)
@@ -137,38 +231,35 @@ def CropAdvisory(request):
     crops_list_str = ", ".join(suitable_crops)
 
     # 5. Use Gemini to create the Year-Round Planting Calendar
-    gemini_prompt = f"""
-    आप एक विशेषज्ञ भारतीय कृषि वैज्ञानिक हैं।
-    आपके पास एक मॉडल से प्राप्त {location} क्षेत्र के लिए {len(suitable_crops)} सबसे उपयुक्त फसलों की सूची है: {crops_list_str}
-    
-    इस सूची का उपयोग करते हुए, एक संवादात्मक, हिंदी में, साल भर की बुवाई की योजना (Year-Round Planting Calendar) बनाएं।
-    
-    तालिका या जटिल संरचना का उपयोग न करें। प्रत्येक फसल के लिए निम्नलिखित जानकारी को एक छोटे पैराग्राफ में दें:
-    1.  फसल का नाम।
-    2.  बुवाई/रोपण के लिए सबसे अच्छा महीना या मौसम (जैसे "खरीफ की शुरुआत में").
-    3.  मुख्य देखभाल टिप या उपयुक्त मिट्टी का प्रकार।
-    """
+    gemini_prompt = advisories.planting_prompt(location, suitable_crops)
     
     advisory_text = "क्षमा करें, सलाह देने वाला AI इस समय अनुपलब्ध है।"
     if POLICY_MODEL:
         try:
-            response = POLICY_MODEL.generate_content(gemini_prompt)
-            advisory_text = response.text.strip()
+            with llm.request_deadline(), metrics.span('generate'):
+                advisory_text = llm.generate_text(
+                    POLICY_MODEL,
+                    gemini_prompt,
+                    cache_key=advisories.planting_cache_key(key, suitable_crops),
+                    fallback=f"आपके क्षेत्र {location} के लिए सबसे उपयुक्त फसलें हैं: {crops_list_str}। बुवाई के सही समय के लिए अपने नज़दीकी कृषि विज्ञान केंद्र से सलाह लें।",
+                ).strip()
         except Exception as e:
             print(f"Gemini Advisory Error: {e}")
 
     # 6. Return the final render
-    return render(request, 'crop_advisory.html', {
-        'location': location,
-        'suitable_crops': suitable_crops, # Pass the list of crops
-        'soil_data': model_input, 
-        'advisory': advisory_text
-    })
+    with metrics.span('render'):
+        return render(request, 'crop_advisory.html', {
+            'location': location,
+            'suitable_crops': suitable_crops, # Pass the list of crops
+            'soil_data': model_input, 
+            'advisory': advisory_text
+        })
 
 @login_required
 def Weather(request):
     try:
-        location = request.user.profile.location
+        profile = request.user.profile
+        location, place = profile.location, profile.place
     except:
         location = None
 
@@ -178,7 +269,8 @@ def Weather(request):
         })
 
     # Step 1: Get location coordinates and current conditions
-    current_data, error = get_current_weather_data(location)
+    with metrics.span('current_weather'):
+        current_data, error = get_current_weather_data(location, place=place)
     if error:
         return render(request, 'weather.html', {'error': f'{error}'})
 
@@ -186,29 +278,38 @@ def Weather(request):
     lon = current_data.get('lon')
     
     # Step 2: Get forecast and alerts using coordinates
-    weather_data, alert_error = get_alerts_and_forecast(lat, lon)
+    with metrics.span('forecast'):
+        weather_data, alert_error = get_alerts_and_forecast(lat, lon, location=location, place=place)
+
+    # Step 3: Last month's rainfall, from the readings stored for this place
+    with metrics.span('weather_history'):
+        rainfall = weather_store.recent_rainfall(places.key_of(location, place))
 
     if alert_error:
         # Render with a partial error if only the forecast/alert failed
         return render(request, 'weather.html', {
             'location': location,
             'current_data': current_data,
+            'rainfall': rainfall,
             'forecast': [],
             'alerts': [],
             'error': alert_error
         })
 
-    return render(request, 'weather.html', {
-        'location': location,
-        'current_data': current_data,
-        'forecast': weather_data.get('forecast', []),
-        'alerts': weather_data.get('alerts', [])
-    })
+    with metrics.span('render'):
+        return render(request, 'weather.html', {
+            'location': location,
+            'current_data': current_data,
+            'rainfall': rainfall,
+            'forecast': weather_data.get('forecast', []),
+            'alerts': weather_data.get('alerts', [])
+        })
 
 @login_required
 def Policies(request):
     try:
-        location = request.user.profile.location
+        profile = request.user.profile
+        location, place = profile.location, profile.place
     except:
         location = None
 
@@ -242,8 +343,13 @@ def Policies(request):
     """
 
     try:
-        response = POLICY_MODEL.generate_content(prompt)
-        text = response.text.strip()
+        with llm.request_deadline(), metrics.span('generate'):
+            text = llm.generate_text(
+                POLICY_MODEL,
+                prompt,
+                cache_key=f'policies:{places.key_of(location, place)}',
+                fallback=lambda: json.dumps(FALLBACK_POLICIES, ensure_ascii=False),
+            ).strip()
         text = re.sub(r'^```json', '', text)
         text = re.sub(r'^```', '', text)
         text = re.sub(r'```$', '', text)
@@ -265,9 +371,116 @@ def Policies(request):
 
 
 
+@cached_page('SFR.html', depends_on=[fertilizers.CATALOG_FILE])
 def Fertilizer(request):
-    return render(request,'SFR.html')
+    # The page is a shell; products come from fertilizer_search below
+    return render(request, 'SFR.html', {'catalog_meta': fertilizers.get_catalog().meta('en')})
+
+
+# --- Fertilizer catalog API ---
+FERTILIZER_FILTERS = ('lang', 'tds', 'crop', 'soil', 'price')
+
+
+def _catalog_etag(request):
+    # Same data version and same filters -> same body
+    query = '&'.join(f"{key}={request.GET.get(key, '')}" for key in FERTILIZER_FILTERS)
+    digest = hashlib.sha1(f'{request.path}?{query}'.encode()).hexdigest()[:16]
+    return f'{fertilizers.get_catalog().version}-{digest}'
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _requested_language(request):
+    lang = request.GET.get('lang', 'en')
+    return lang if lang in fertilizers.LANGUAGES else None
 
+
+@require_GET
+@cache_control(public=True, max_age=300)
+@etag(_catalog_etag)
+def fertilizer_search(request):
+    """Products matching ?tds=&crop=&soil=&price= (all optional), in the ?lang= language."""
+    lang = _requested_language(request)
+    if lang is None:
+        return _json({'error': f"lang must be one of {', '.join(fertilizers.LANGUAGES)}"}, status=400)
+    try:
+        tds = request.GET.get('tds', '').strip()
+        tds = int(tds) if tds else None
+        price = fertilizers.parse_price(request.GET.get('price', ''))
+    except ValueError:
+        return _json({'error': 'tds must be a whole number and price one of 0-500, 500-1000, 1000-2000, 2000+'},
+                     status=400)
+    crop = request.GET.get('crop', '')
+    soil = request.GET.get('soil', '')
+    catalog = fertilizers.get_catalog()
+    products = catalog.search(tds=tds, crop=None if crop in ('', 'all') else crop,
+                              soil=None if soil in ('', 'all') else soil, price=price)
+    return _json({
+        'lang': lang,
+        'count': len(products),
+        'products': [fertilizers.localize(product, lang) for product in products],
+    })
+
+
+@require_GET
+@cache_control(public=True, max_age=300)
+@etag(_catalog_etag)
+def fertilizer_meta(request):
+    """UI strings, crop choices and crop notes in the ?lang= language."""
+    lang = _requested_language(request)
+    if lang is None:
+        return _json({'error': f"lang must be one of {', '.join(fertilizers.LANGUAGES)}"}, status=400)
+    return _json(fertilizers.get_catalog().meta(lang))
+
+
+@require_POST
+def bulk_recommendations(request):
+    """
+    Crop recommendations for every plot in a CSV or JSON-lines upload (see home/bulk.py).
+
+    The upload is the request body (Content-Type text/csv or
+    application/x-ndjson) or a multipart ``file`` field. Results stream back
+    in the same format, or the one named by ?format=csv|ndjson.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Login required'}, status=401)
+    if not crop_model.ensure_loaded():
+        return JsonResponse({'error': 'Crop model is not loaded'}, status=503)
+
+    upload = request.FILES.get('file')
+    if upload is not None:
+        input_format = (bulk.INPUT_TYPES.get(os.path.splitext(upload.name or '')[1].lower())
+                        or bulk.INPUT_TYPES.get(upload.content_type))
+    else:
+        input_format = bulk.INPUT_TYPES.get(request.content_type)
+    if input_format is None:
+        return JsonResponse({'error': 'Send a CSV or JSON-lines file (text/csv or application/x-ndjson)'}, status=415)
+    output_format = request.GET.get('format', input_format)
+    if output_format not in bulk.FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(bulk.FORMATS)}"}, status=400)
+
+    try:
+        if upload is not None:
+            if upload.size > bulk.BULK_MAX_UPLOAD_BYTES:
+                raise bulk.UploadTooLarge(f'Upload is larger than {bulk.BULK_MAX_UPLOAD_BYTES} bytes')
+            fh = upload
+        else:
+            fh = bulk.spool(request)
+        chunks = bulk.stream(fh, input_format, output_format)
+    except bulk.UploadTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except bulk.BulkInputError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(chunks, content_type=bulk.FORMATS[output_format])
+    response['Content-Disposition'] = f'attachment; filename="recommendations.{output_format}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@cached_page('about.html')
 def about(request):
     return render(request,'about.html')
 
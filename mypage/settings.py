@@ -14,6 +14,8 @@ import environ
 from pathlib import Path
 import dj_database_url 
 
+from mypage import sqlite_profile
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,8 +52,9 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    # Before staticfiles so its collectstatic (which vendors assets first) takes precedence
     'core',
+    'django.contrib.staticfiles',
     'home',
     'accounts',
     'phonenumber_field',
@@ -60,12 +63,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.PageCacheMiddleware',
+    'core.middleware.TimedSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.AdmissionControlMiddleware',
     'accounts.middleware.ProfileCompletionMiddleware',
 ]
 
@@ -154,6 +161,77 @@ TWILIO_ACCOUNT_SID = env('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = env('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = env('TWILIO_PHONE_NUMBER')
 
+# --- Upstream endpoints ---
+# Overridable so load tests can point the app at the local fake servers (python -m benchmarks.fakes)
+OPENWEATHER_BASE_URL = env('OPENWEATHER_BASE_URL', default='http://api.openweathermap.org')
+GEMINI_API_ENDPOINT = env('GEMINI_API_ENDPOINT', default=None)
+TWILIO_API_BASE_URL = env('TWILIO_API_BASE_URL', default=None)
+
+# --- Gemini call deadlines (see core/llm.py) ---
+# Per-call timeout, and the total budget shared by all calls of one request
+GEMINI_TIMEOUT_SECONDS = env.float('GEMINI_TIMEOUT_SECONDS', default=8.0)
+GEMINI_REQUEST_BUDGET_SECONDS = env.float('GEMINI_REQUEST_BUDGET_SECONDS', default=15.0)
+# A hedged duplicate request is sent once a call is slower than this latency percentile (0 disables hedging)
+GEMINI_HEDGE_PERCENTILE = env.float('GEMINI_HEDGE_PERCENTILE', default=95.0)
+GEMINI_HEDGE_MIN_SECONDS = env.float('GEMINI_HEDGE_MIN_SECONDS', default=0.5)
+GEMINI_MAX_INFLIGHT = env.int('GEMINI_MAX_INFLIGHT', default=16)
+# How long successful answers are kept as fallbacks for when the budget runs out
+GEMINI_ANSWER_CACHE_SECONDS = env.int('GEMINI_ANSWER_CACHE_SECONDS', default=6 * 60 * 60)
+
+# --- Compression of rendered responses (see core/compression.py) ---
+COMPRESSION_MIN_BYTES = env.int('COMPRESSION_MIN_BYTES', default=1024)
+COMPRESSION_BROTLI_QUALITY = env.int('COMPRESSION_BROTLI_QUALITY', default=5)
+
+# --- Chat engine ---
+# 'routed': classify each turn, then a handler per category (up to three Gemini calls);
+# 'tools': one call with function declarations and one follow-up (see core/chat_tools.py)
+CHAT_ENGINE = env('CHAT_ENGINE', default='routed')
+
+# --- Admission control for the views that call Gemini (see core/admission.py) ---
+ADMISSION_ENABLED = env.bool('ADMISSION_ENABLED', default=True)
+# Per-view overrides of core.admission.DEFAULT_LIMITS, e.g. {'Policies': {'concurrency': 4}}
+ADMISSION_LIMITS = {}
+# Threads per worker the limited views may hold together (running or waiting)
+ADMISSION_MAX_THREADS = env.int('ADMISSION_MAX_THREADS', default=6)
+# Token buckets: requests per second and burst, per signed-in user and per client IP
+ADMISSION_USER_RATE = env.float('ADMISSION_USER_RATE', default=0.2)
+ADMISSION_USER_BURST = env.int('ADMISSION_USER_BURST', default=10)
+ADMISSION_IP_RATE = env.float('ADMISSION_IP_RATE', default=2.0)
+ADMISSION_IP_BURST = env.int('ADMISSION_IP_BURST', default=60)
+
+# --- Caches (see core/tiered_cache.py) ---
+# Shared by every worker on the host through SQLite files in CACHE_DIR, each behind a small
+# per-worker LRU whose entries are at most CACHE_L1_TIMEOUT seconds behind the shared copy
+CACHE_DIR = env('CACHE_DIR', default=os.path.join(BASE_DIR, 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'core.tiered_cache.TwoTierCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'L1_MAX_ENTRIES': 500,
+            'L1_TIMEOUT': env.float('CACHE_L1_TIMEOUT', default=5.0),
+        },
+    },
+    # Token buckets and stale pages; kept apart so they don't evict the page and answer caches.
+    # Workers update the buckets in turn, so they are always read from the shared file.
+    'admission': {
+        'BACKEND': 'core.tiered_cache.TwoTierCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'admission.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'L1_TIMEOUT': 0},
+    },
+}
+# Gives each test run cache files of its own and clears the caches before each test
+TEST_RUNNER = 'mypage.test_runner.TestRunner'
+
+# --- Metrics (see core/metrics.py) ---
+# Directory where each worker writes its metrics snapshot, so /metrics can merge all workers.
+# Leave unset to report only the process that serves the scrape.
+METRICS_DIR = env('METRICS_DIR', default=None)
+METRICS_FLUSH_SECONDS = env.float('METRICS_FLUSH_SECONDS', default=5.0)
+# If set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = env('METRICS_TOKEN', default=None)
+
 LOGIN_URL = '/accounts/login/'
 
 # URL that handles the media served from MEDIA_ROOT, used for managing stored files.
@@ -165,7 +243,12 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Static Files Configuration for Render
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Hashed file names (served by WhiteNoise with immutable cache headers) plus .gz/.br copies.
+# Django 5.1 dropped STATICFILES_STORAGE, so this has to go through STORAGES.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.StaticFilesStorage'},
+}
 
 # Database Configuration
 if env('DATABASE_URL', default=None):
@@ -179,4 +262,11 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+
+# --- SQLite profile (see mypage/sqlite_profile.py) ---
+# 'tuned' (WAL, pragmas, IMMEDIATE transactions, persistent connections) or 'default' (Django's defaults)
+SQLITE_PROFILE = env('SQLITE_PROFILE', default='tuned')
+SQLITE_BUSY_TIMEOUT = env.float('SQLITE_BUSY_TIMEOUT', default=sqlite_profile.DEFAULT_BUSY_TIMEOUT)
+if SQLITE_PROFILE == 'tuned':
+    DATABASES['default'] = sqlite_profile.tune(DATABASES['default'], busy_timeout=SQLITE_BUSY_TIMEOUT)
 # ... (rest of your settings) ...
\ No newline at end of file
@@ -0,0 +1,63 @@
+# mypage/sqlite_profile.py
+"""
+Production settings for the SQLite backend.
+
+Small deployments run on ``db.sqlite3``, and every chat turn writes its
+session. With the defaults (rollback journal, a deferred BEGIN, a new
+connection per request) concurrent writers block each other's readers and
+fail with "database is locked" instead of waiting their turn. The tuned
+profile:
+
+- switches to WAL, so readers never block on the writer, with
+  ``synchronous=NORMAL`` (durable across crashes of the app; a power cut
+  may lose the last commits but never corrupts the file). The journal mode
+  is stored in the database file, so it is set once, by a migration
+  (core/migrations/0004_sqlite_wal.py, ``use_wal()``), not on every
+  connection: a ``manage.py`` command that only connects leaves the file
+  as it is;
+- gives every connection a 20 MB page cache, a 128 MB memory map and
+  in-memory temp tables;
+- makes transactions take the write lock at BEGIN (``IMMEDIATE``), so a
+  writer waits in the busy handler for up to ``SQLITE_BUSY_TIMEOUT`` seconds
+  instead of failing when it upgrades a read lock;
+- keeps connections open between requests (``CONN_MAX_AGE``), so the
+  pragmas and the page cache are paid for once per thread.
+
+``python -m benchmarks.sqlite`` compares the profiles under concurrent
+session writes.
+"""
+JOURNAL_MODE = 'WAL'
+# Per connection; run by init_command
+PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,  # KiB
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+DEFAULT_BUSY_TIMEOUT = 20.0
+DEFAULT_CONN_MAX_AGE = 600
+
+
+def init_command(pragmas=PRAGMAS):
+    return ''.join(f'PRAGMA {name}={value};' for name, value in pragmas.items())
+
+
+def use_wal(connection):
+    """Switches the database file of ``connection`` to WAL (kept in the file); in-memory databases are left alone."""
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={JOURNAL_MODE}')
+
+
+def tune(database, busy_timeout=DEFAULT_BUSY_TIMEOUT, conn_max_age=DEFAULT_CONN_MAX_AGE):
+    """Returns the DATABASES entry ``database`` with the tuned profile applied (if it is SQLite)."""
+    if database.get('ENGINE') != 'django.db.backends.sqlite3':
+        return database
+    options = dict(database.get('OPTIONS') or {})
+    options.update({
+        'init_command': init_command(),
+        'timeout': busy_timeout,
+        'transaction_mode': 'IMMEDIATE',
+    })
+    return {**database, 'OPTIONS': options, 'CONN_MAX_AGE': conn_max_age, 'CONN_HEALTH_CHECKS': True}
@@ -0,0 +1,62 @@
+# mypage/test_runner.py
+"""
+Test runner that starts every test with empty caches of its own.
+
+The token buckets of core/admission.py are keyed by user id, and the test
+database hands the same ids to the users of one TestCase after another, so
+a bucket drained by one test would shed the requests of the next and the
+outcome would depend on the order the tests run in.
+
+The caches in settings are SQLite files shared by every process on the
+host (core/tiered_cache.py), so the runner also points them at a temporary
+directory. Without it a test run would read what the dev server or the
+previous run left there and clear the server's entries.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+FILE_BACKENDS = ('core.tiered_cache.TwoTierCache', 'core.tiered_cache.SQLiteCache')
+
+
+class ClearCachesResult:
+    def startTest(self, test):
+        for cache in caches.all():
+            cache.clear()
+        super().startTest(test)
+
+
+class TestRunner(DiscoverRunner):
+    def get_resultclass(self):
+        # Keeps --debug-sql and --pdb working
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type('ClearCachesTestResult', (ClearCachesResult, base), {})
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='agripath-test-cache-')
+        cache_settings = {
+            alias: dict(config, LOCATION=os.path.join(self.cache_dir, f'{alias}.sqlite3'))
+            if config['BACKEND'] in FILE_BACKENDS else config
+            for alias, config in settings.CACHES.items()
+        }
+        self.cache_settings = override_settings(CACHES=cache_settings)
+        self.cache_settings.enable()
+        # Processes the tests start (startup.profile()) read the settings afresh
+        self.saved_cache_dir = os.environ.get('CACHE_DIR')
+        os.environ['CACHE_DIR'] = self.cache_dir
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        if self.saved_cache_dir is None:
+            os.environ.pop('CACHE_DIR', None)
+        else:
+            os.environ['CACHE_DIR'] = self.saved_cache_dir
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
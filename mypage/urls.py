@@ -15,10 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path,include
+from django.urls import path, re_path, include
 from core import views as core_views
 from django.conf import settings         # <-- CHECK THIS IMPORT
-from django.conf.urls.static import static #
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,8 +27,9 @@ urlpatterns = [
     path('process/', core_views.process_voice, name='process_voice'), # API endpoint
     path('api/get-greeting/', core_views.get_greeting, name='get_greeting'),
     path('api/clear-chat/', core_views.clear_chat, name='clear_chat'),
+    path('metrics', core_views.metrics_view, name='metrics'), # Prometheus scrape endpoint
+    path('api/export-advisories/', core_views.export_advisories, name='export_advisories'), # Staff only
+    # Uploaded media, with cache headers and range support (also outside DEBUG)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), core_views.serve_media, name='media'),
     path('', include('home.urls')), # Include home URLs at root level
-]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
@@ -20,7 +20,25 @@ if __name__ == "__main__":
         'tests.test_forms', 
         'tests.test_views',
         'tests.test_utils',
-        'tests.test_integration'
+        'tests.test_integration',
+        'tests.test_llm',
+        'tests.test_metrics',
+        'tests.test_benchmarks',
+        'tests.test_assets',
+        'tests.test_media',
+        'tests.test_fertilizers',
+        'tests.test_pagecache',
+        'tests.test_weather_store',
+        'tests.test_bulk',
+        'tests.test_advisories',
+        'tests.test_startup',
+        'tests.test_sms',
+        'tests.test_admission',
+        'tests.test_sqlite_profile',
+        'tests.test_chat_tools',
+        'tests.test_compression',
+        'tests.test_places',
+        'tests.test_tiered_cache',
     ]
     
     failures = test_runner.run_tests(test_modules)
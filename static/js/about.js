@@ -0,0 +1,31 @@
+const swiper = new Swiper('.swiper', {
+    // Optional parameters
+    loop: true, // Enable continuous loop mode
+    autoplay: {
+        delay: 4000, // Delay between transitions (in ms)
+        disableOnInteraction: false, // Autoplay will not be disabled after user interactions
+        pauseOnMouseEnter: true, // Pause autoplay on mouse hover
+    },
+    effect: 'fade', // Add fade effect (optional)
+     fadeEffect: {
+         crossFade: true
+     },
+
+    // If we need pagination
+    pagination: {
+        el: '.swiper-pagination',
+        clickable: true, // Allow clicking on pagination bullets
+    },
+
+    // Navigation arrows
+    navigation: {
+        nextEl: '.swiper-button-next',
+        prevEl: '.swiper-button-prev',
+    },
+
+    // Optional: Add keyboard navigation
+    keyboard: {
+        enabled: true,
+        onlyInViewport: false,
+    },
+});
@@ -0,0 +1,199 @@
+// ==============================================================================
+//  COMPLETE JAVASCRIPT FOR PERSISTENT CHAT LOG FUNCTIONALITY
+// ==============================================================================
+
+// [NEW] Safely retrieve initial history from the hidden script element
+const historyScriptElement = document.getElementById('initial-history-data');
+const initialHistory = historyScriptElement ? JSON.parse(historyScriptElement.textContent) : [];
+
+// --- Element References ---
+const startButton = document.getElementById('startButton');
+const statusDiv = document.getElementById('status');
+const chatArea = document.getElementById('chatArea');
+const newChatButton = document.querySelector('.new-chat-btn');
+// URLs and the CSRF token are rendered into data attributes on <body> by core.html
+const pageData = document.body.dataset;
+const csrfToken = pageData.csrfToken;
+
+// --- TTS and STT Initialization ---
+const synth = window.speechSynthesis;
+const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+let recognition;
+let hindiVoice = null;
+
+function loadVoices() {
+    hindiVoice = synth.getVoices().find(voice => voice.lang === 'hi-IN' || voice.lang.startsWith('hi'));
+}
+if (synth.onvoiceschanged !== undefined) {
+    synth.onvoiceschanged = loadVoices;
+}
+loadVoices();
+
+/**
+ * Creates and displays a message in the chat log.
+ */
+function addMessageToLog(text, sender) {
+    const messageElement = document.createElement('div');
+    messageElement.classList.add('chat-message', `${sender}-message`);
+    messageElement.textContent = text;
+    chatArea.appendChild(messageElement);
+    chatArea.scrollTop = chatArea.scrollHeight; // Auto-scroll
+    return messageElement;
+}
+
+/**
+ * Handles the "New Chat" button click (clears session history).
+ */
+async function startNewChat() {
+    try {
+        // Call the backend endpoint to clear the session
+        await fetch(pageData.clearChatUrl, { method: 'POST', headers: {'X-CSRFToken': csrfToken }});
+
+        // Visually clear the chat log on the screen
+        chatArea.innerHTML = '';
+
+        // Fetch and display the new greeting
+        await fetchAndDisplayGreeting();
+        resetUIState();
+        statusDiv.textContent = 'Status: नया चैट शुरू हुआ (New Chat Started)';
+    } catch (error) {
+        console.error('Error starting new chat:', error);
+    }
+}
+
+// --- Speech Recognition Logic (Unchanged) ---
+if (SpeechRecognition) {
+    recognition = new SpeechRecognition();
+    recognition.continuous = false;
+    recognition.lang = 'hi-IN';
+    recognition.interimResults = false;
+    recognition.onstart = () => {
+        statusDiv.textContent = 'Status: सुन रहा हूँ... (Listening...)';
+        startButton.classList.add('listening');
+        startButton.disabled = true;
+    };
+    recognition.onresult = (event) => {
+        const transcript = event.results[0][0].transcript;
+        addMessageToLog(transcript, 'user');
+        sendTextToBackend(transcript);
+    };
+    recognition.onerror = (event) => {
+        console.error("Speech Recognition Error:", event);
+        addMessageToLog(`Speech recognition error: ${event.error}`, 'ai');
+        resetUIState();
+    };
+} else {
+    statusDiv.textContent = "Status: Speech Recognition is not supported by this browser.";
+    startButton.disabled = true;
+}
+
+// --- Text To Speech Logic (Unchanged) ---
+function speak(textToSpeak) {
+    if (synth.speaking) { synth.cancel(); }
+    const lastAiMessage = chatArea.querySelector('.ai-message:last-child');
+    const utterThis = new SpeechSynthesisUtterance(textToSpeak);
+    utterThis.lang = 'hi-IN';
+    utterThis.voice = hindiVoice;
+    utterThis.rate = 0.95;
+    utterThis.onstart = () => {
+        if (lastAiMessage) lastAiMessage.classList.add('talking');
+        statusDiv.textContent = 'Status: बोल रहा हूँ... (Speaking...)';
+        startButton.disabled = true;
+    };
+    utterThis.onend = () => {
+        if (lastAiMessage) lastAiMessage.classList.remove('talking');
+        resetUIState();
+    };
+    utterThis.onerror = (event) => {
+        console.error('TTS error:', event);
+        if (lastAiMessage) lastAiMessage.classList.remove('talking');
+        resetUIState();
+    };
+    synth.speak(utterThis);
+}
+
+// --- Backend Communication (Unchanged) ---
+async function sendTextToBackend(text) {
+    statusDiv.textContent = 'Status: प्रसंस्करण (Processing)...';
+    try {
+        const response = await fetch(pageData.processVoiceUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
+            body: JSON.stringify({ text: text })
+        });
+        // 429: the server is busy and sends a message to show instead of an answer
+        if (!response.ok && response.status !== 429) throw new Error(`HTTP error! status: ${response.status}`);
+        const data = await response.json();
+        addMessageToLog(data.response, 'ai');
+        speak(data.response);
+    } catch (error) {
+        console.error('Error sending/receiving backend data:', error);
+        addMessageToLog("क्षमा करें, सर्वर से कनेक्ट करने में कोई त्रुटि हुई।", 'ai');
+        resetUIState();
+    }
+}
+
+/**
+ * Fetches and displays the initial greeting.
+ */
+async function fetchAndDisplayGreeting() {
+    try {
+        const response = await fetch(pageData.greetingUrl);
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const data = await response.json();
+        if (data.greeting) {
+            addMessageToLog(data.greeting, 'ai');
+        }
+    } catch (error) {
+        console.error('Error fetching greeting:', error);
+        addMessageToLog("नमस्ते! मैं आपकी मदद के लिए तैयार हूँ।", 'ai');
+    }
+}
+
+/**
+ * [NEW] Function to load history from the context variable
+ */
+function loadInitialHistory() {
+    if (initialHistory && initialHistory.length > 0) {
+        initialHistory.forEach(message => {
+            // Check for the correct Gemini format
+            if (message.parts && message.parts[0] && message.role) {
+                // Map Gemini's 'model' role to 'ai' for CSS
+                const sender = message.role === 'user' ? 'user' : 'ai';
+                addMessageToLog(message.parts[0], sender);
+            }
+        });
+    } else {
+        // If no history exists, fetch the initial greeting
+        fetchAndDisplayGreeting();
+    }
+}
+
+// --- UI State Management (Unchanged) ---
+function resetUIState() {
+    startButton.classList.remove('listening');
+    startButton.disabled = false;
+    statusDiv.textContent = 'Status: तैयार (Ready)';
+    const talkingMessage = chatArea.querySelector('.ai-message.talking');
+    if (talkingMessage) talkingMessage.classList.remove('talking');
+}
+
+// --- Event Listeners (Unchanged) ---
+startButton.addEventListener('click', () => {
+    if (synth.speaking) { synth.cancel(); }
+    if (recognition) { recognition.start(); }
+});
+
+newChatButton.addEventListener('click', startNewChat);
+
+document.addEventListener('DOMContentLoaded', () => {
+    loadInitialHistory(); // <-- THIS LOADS THE PERSISTENT CHAT
+
+    // Sidebar Logic
+    const sidebar = document.getElementById('sidebar');
+    const toggleBtn = document.getElementById('toggle-sidebar-btn');
+    toggleBtn.addEventListener('click', () => sidebar.classList.toggle('collapsed'));
+    if (window.innerWidth <= 768) {
+        sidebar.classList.add('collapsed');
+    }
+});
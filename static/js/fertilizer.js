@@ -0,0 +1,209 @@
+// Products, crop notes and UI strings are served by the catalog API
+// (home/views.py fertilizer_search / fertilizer_meta); the English strings
+// come embedded in the page so the first render needs no request.
+const pageData = document.body.dataset;
+const metaByLang = { en: JSON.parse(document.getElementById('catalog-meta').textContent) };
+
+const loadMeta = async (lang) => {
+    if (!metaByLang[lang]) {
+        const response = await fetch(`${pageData.metaUrl}?lang=${encodeURIComponent(lang)}`);
+        if (!response.ok) throw new Error(`Catalog meta request failed: ${response.status}`);
+        metaByLang[lang] = await response.json();
+    }
+    return metaByLang[lang];
+};
+
+
+// --- SCRIPT Logic ---
+document.addEventListener('DOMContentLoaded', () => {
+    let currentLang = 'en';
+    let meta = metaByLang.en;
+    let currentInputMethod = 'tds';
+    let currentResults = [];
+    let searchSeq = 0;
+    const langEnBtn = document.getElementById('lang-en');
+    const langHiBtn = document.getElementById('lang-hi');
+    const getStartedBtn = document.getElementById('get-started-btn');
+    const recommendationToolSection = document.getElementById('recommendation-tool');
+    const chooseTdsBtn = document.getElementById('choose-tds');
+    const chooseCropBtn = document.getElementById('choose-crop');
+    const tdsInputArea = document.getElementById('tds-input-area');
+    const cropInputArea = document.getElementById('crop-input-area');
+    const tdsLevelInput = document.getElementById('tds-level');
+    const cropTypeSelect = document.getElementById('crop-type');
+    const priceFilterSelect = document.getElementById('price-filter');
+    const soilTypeFilterSelect = document.getElementById('soil-type-filter');
+    const cropFilterArea = document.getElementById('crop-filter-area');
+    const cropFilterSelect = document.getElementById('crop-filter');
+    const findRecommendationsBtn = document.getElementById('find-recommendations-btn');
+    const resultsListDiv = document.getElementById('results-list');
+    const cropInfoDisplayDiv = document.getElementById('crop-info-display');
+    const cropInfoTDS = document.getElementById('crop-info-tds');
+    const cropInfoSoil = document.getElementById('crop-info-soil');
+    const cropInfoAdvice = document.getElementById('crop-info-advice');
+    const detailsModal = document.getElementById('details-modal');
+    const closeModalBtn = document.getElementById('close-modal-btn');
+    const modalProductName = document.getElementById('modal-product-name');
+    const modalProductType = document.getElementById('modal-product-type');
+    const modalProductSuitability = document.getElementById('modal-product-suitability');
+    const modalProductPrice = document.getElementById('modal-product-price');
+    const modalPriceUnitNote = detailsModal.querySelector('.price-unit-note');
+    const modalProductDescription = document.getElementById('modal-product-description');
+    const modalProductUsage = document.getElementById('modal-product-usage');
+    const modalProductSafety = document.getElementById('modal-product-safety');
+
+     const setLanguage = async (lang) => {
+        try {
+            meta = await loadMeta(lang);
+        } catch (error) {
+            console.error(error);
+            return;
+        }
+        currentLang = lang;
+        document.documentElement.lang = lang;
+        langEnBtn.classList.toggle('active-lang', lang === 'en');
+        langHiBtn.classList.toggle('active-lang', lang === 'hi');
+        document.querySelectorAll('[data-lang-key]').forEach(el => {
+            const key = el.getAttribute('data-lang-key');
+            if (meta.translations[key]) {
+                el.innerHTML = meta.translations[key];
+            }
+        });
+        populateCropDropdowns();
+        updateCropInfoDisplay();
+        if (resultsListDiv.querySelector('.product-card')) {
+            findRecommendations();
+        } else {
+            clearResults();
+        }
+     };
+
+     const populateCropDropdowns = () => {
+        const populate = (selectElement, defaultKey) => {
+            const currentValue = selectElement.value;
+            selectElement.innerHTML = '';
+            const defaultOption = document.createElement('option');
+            defaultOption.value = "";
+            if (defaultKey === 'select_option') defaultOption.value = "";
+            if (defaultKey === 'filter_all_crops') defaultOption.value = "all";
+            defaultOption.textContent = meta.translations[defaultKey] || '...';
+            selectElement.appendChild(defaultOption);
+
+            meta.crops.forEach(crop => {
+                const option = document.createElement('option');
+                option.value = crop.value;
+                option.textContent = crop.name;
+                selectElement.appendChild(option);
+            });
+            selectElement.value = currentValue;
+        };
+        populate(cropTypeSelect, 'select_option');
+        populate(cropFilterSelect, 'filter_all_crops');
+     };
+
+     const displayCropInfo = (cropValue) => {
+         if (!cropValue) { cropInfoDisplayDiv.classList.add('hidden'); return; }
+         const info = meta.crop_info[cropValue];
+         if (info) {
+            cropInfoTDS.textContent = info.optimal_tds || 'N/A';
+            cropInfoSoil.textContent = info.preferred_soil || 'N/A';
+            cropInfoAdvice.textContent = info.general_advice || 'N/A';
+            cropInfoDisplayDiv.classList.remove('hidden');
+         } else { cropInfoDisplayDiv.classList.add('hidden'); }
+     };
+
+     const updateCropInfoDisplay = () => {
+         if (currentInputMethod === 'crop' && !cropInfoDisplayDiv.classList.contains('hidden')) {
+             displayCropInfo(cropTypeSelect.value);
+         }
+     };
+
+     const setInputMethod = (method) => {
+        currentInputMethod = method;
+        chooseTdsBtn.classList.toggle('active', method === 'tds');
+        chooseCropBtn.classList.toggle('active', method === 'crop');
+        tdsInputArea.classList.toggle('hidden', method !== 'tds');
+        cropInputArea.classList.toggle('hidden', method !== 'crop');
+        cropFilterArea.classList.toggle('hidden', method !== 'tds');
+        if(method === 'crop') displayCropInfo(cropTypeSelect.value);
+        else cropInfoDisplayDiv.classList.add('hidden');
+        clearResults();
+     };
+
+    const findRecommendations = async () => {
+        const params = new URLSearchParams({ lang: currentLang, price: priceFilterSelect.value, soil: soilTypeFilterSelect.value });
+        if (currentInputMethod === 'tds') {
+            const tds = tdsLevelInput.value.trim();
+            if (tds && isNaN(parseInt(tds, 10))) { displayResults([]); return; }
+            if (tds) params.set('tds', parseInt(tds, 10));
+            params.set('crop', cropFilterSelect.value);
+        } else {
+            if (!cropTypeSelect.value) { displayResults([]); return; }
+            params.set('crop', cropTypeSelect.value);
+        }
+
+        // Only the latest request may update the list
+        const seq = ++searchSeq;
+        try {
+            const response = await fetch(`${pageData.searchUrl}?${params}`);
+            const data = response.ok ? await response.json() : { products: [] };
+            if (seq === searchSeq) displayResults(data.products);
+        } catch (error) {
+            console.error(error);
+            if (seq === searchSeq) displayResults([]);
+        }
+    };
+
+    const displayResults = (products) => {
+        currentResults = products;
+        resultsListDiv.innerHTML = '';
+        if (products.length === 0) {
+            resultsListDiv.innerHTML = `<p data-lang-key="no_results">${meta.translations.no_results}</p>`; return;
+        }
+        products.forEach(p => {
+            const card = document.createElement('div'); card.className = 'product-card';
+            card.innerHTML = `
+                <h5>${p.name}</h5>
+                <p><strong>${meta.translations.product_type}:</strong> ${p.type}</p>
+                <p><strong>${meta.translations.product_price_inr}:</strong> <span class="price-info">₹${p.price_inr.min} - ₹${p.price_inr.max}</span> <span class="unit-note">${p.unit ? `(${p.unit})` : ''}</span></p>
+                <button class="view-details-btn" data-product-id="${p.id}">${meta.translations.view_details_btn}</button>`;
+            resultsListDiv.appendChild(card);
+        });
+        resultsListDiv.querySelectorAll('.view-details-btn').forEach(b => b.addEventListener('click', e => showDetailsModal(e.target.dataset.productId)));
+    };
+
+    const clearResults = () => {
+        currentResults = [];
+        resultsListDiv.innerHTML = `<p data-lang-key="results_placeholder">${meta.translations.results_placeholder}</p>`;
+    };
+
+    const showDetailsModal = (productId) => {
+        const p = currentResults.find(prod => prod.id === productId); if (!p) return;
+        modalProductName.textContent = p.name;
+        modalProductType.textContent = p.type;
+        modalProductPrice.textContent = `₹${p.price_inr.min} - ₹${p.price_inr.max}`;
+        modalPriceUnitNote.textContent = p.unit || '';
+        modalProductSuitability.textContent = `${p.suitable_soil_types.join(', ')} | TDS: ${p.tds_range.min}-${p.tds_range.max}ppm`;
+        modalProductDescription.textContent = p.description;
+        modalProductUsage.textContent = p.usage;
+        modalProductSafety.textContent = p.safety;
+        detailsModal.classList.remove('hidden');
+    };
+
+    const hideDetailsModal = () => detailsModal.classList.add('hidden');
+
+    langEnBtn.addEventListener('click', () => setLanguage('en'));
+    langHiBtn.addEventListener('click', () => setLanguage('hi'));
+    getStartedBtn.addEventListener('click', () => recommendationToolSection.scrollIntoView({ behavior: 'smooth' }));
+    chooseTdsBtn.addEventListener('click', () => setInputMethod('tds'));
+    chooseCropBtn.addEventListener('click', () => setInputMethod('crop'));
+    cropTypeSelect.addEventListener('change', (e) => displayCropInfo(e.target.value));
+    findRecommendationsBtn.addEventListener('click', findRecommendations);
+    closeModalBtn.addEventListener('click', hideDetailsModal);
+    detailsModal.addEventListener('click', e => { if(e.target === detailsModal) hideDetailsModal() });
+    document.addEventListener('keydown', e => { if (e.key === 'Escape') hideDetailsModal() });
+
+    populateCropDropdowns();
+    setLanguage(currentLang);
+    setInputMethod(currentInputMethod);
+});
@@ -0,0 +1,113 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from unittest.mock import patch, Mock
+import json
+import threading
+
+from core import admission, metrics
+
+LIMITS = {'concurrency': 1, 'queue': 1, 'queue_timeout': 0.05}
+
+
+class GatesTest(TestCase):
+    def test_concurrency_and_queue(self):
+        """Test a full view sheds once its queue is full and admits a waiter when a slot frees"""
+        gates = admission.Gates()
+        self.assertEqual(gates.acquire('Policies', LIMITS, 6), 'admitted')
+        self.assertEqual(gates.acquire('Policies', LIMITS, 6), 'shed_queue_timeout')
+
+        outcomes = []
+        waiter = threading.Thread(target=lambda: outcomes.append(
+            gates.acquire('Policies', dict(LIMITS, queue_timeout=5.0), 6)))
+        waiter.start()
+        while not gates.waiting.get('Policies'):
+            pass
+        self.assertEqual(gates.acquire('Policies', LIMITS, 6), 'shed_queue_full')
+        gates.release('Policies')
+        waiter.join()
+        self.assertEqual(outcomes, ['queued'])
+        self.assertEqual(gates.acquire('CropAdvisory', LIMITS, 6), 'admitted')
+
+    def test_thread_share(self):
+        """Test the limited views together never hold more than their share of threads"""
+        gates = admission.Gates()
+        self.assertEqual(gates.acquire('Policies', LIMITS, 2), 'admitted')
+        self.assertEqual(gates.acquire('CropAdvisory', LIMITS, 2), 'admitted')
+        self.assertEqual(gates.acquire('process_voice', LIMITS, 2), 'shed_threads')
+        gates.release('Policies')
+        self.assertEqual(gates.acquire('process_voice', LIMITS, 2), 'admitted')
+
+
+class TokenBucketTest(TestCase):
+    def setUp(self):
+        caches['admission'].clear()
+
+    def test_refills_at_rate(self):
+        """Test a bucket allows its burst, then one request per 1/rate seconds"""
+        self.assertEqual([admission.take_token('t', rate=0.5, burst=2, now=100.0) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(admission.take_token('t', rate=0.5, burst=2, now=100.0), 2.0)
+        self.assertAlmostEqual(admission.take_token('t', rate=0.5, burst=2, now=101.0), 1.0)
+        self.assertEqual(admission.take_token('t', rate=0.5, burst=2, now=102.0), 0)
+
+
+@override_settings(ADMISSION_USER_RATE=0.01, ADMISSION_USER_BURST=2)
+class AdmissionMiddlewareTest(TestCase):
+    def setUp(self):
+        caches['admission'].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='+919876543210')
+        self.user.profile.location = 'Delhi'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+
+    @patch('core.views.generate_gemini_response', return_value='general_conversation')
+    def test_user_bucket_returns_429(self, mock_generate):
+        """Test a user over their bucket gets a fast 429 with Retry-After and no Gemini call"""
+        body = json.dumps({'text': 'नमस्ते'})
+        for _ in range(2):
+            self.assertEqual(self.client.post('/process/', body, content_type='application/json').status_code, 200)
+        calls = mock_generate.call_count
+        response = self.client.post('/process/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 90)
+        self.assertEqual(json.loads(response.content)['response'], admission.BUSY_MESSAGE)
+        self.assertEqual(mock_generate.call_count, calls)
+        self.assertIn('agripath_admission_total{result="shed_rate",view="process_voice"}',
+                      metrics.render_prometheus())
+
+    @patch('home.views.POLICY_MODEL')
+    def test_stale_page_when_shed(self, mock_model):
+        """Test a shed page request gets the user's last copy, marked as degraded"""
+        mock_model.generate_content.return_value = Mock(text='[{"name": "PM-KISAN", "description": "d", '
+                                                             '"benefits": "b", "link": "https://pmkisan.gov.in"}]')
+        first = self.client.get('/home/Policies')
+        self.assertEqual(first.status_code, 200)
+        self.client.get('/home/Policies')
+        response = self.client.get('/home/Policies')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response[admission.DEGRADED_HEADER], 'stale')
+        self.assertEqual(response.content, first.content)
+        self.assertEqual(mock_model.generate_content.call_count, 2)
+
+    def test_busy_page_without_copy(self):
+        """Test a shed page with no stored copy gets the busy page with Retry-After"""
+        with patch.object(admission.GATES, 'acquire', return_value='shed_threads'):
+            response = self.client.get('/home/CropAdvisory')
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, 'सर्वर अभी व्यस्त है', status_code=429)
+        self.assertEqual(response['Retry-After'], str(admission.DEFAULT_RETRY_AFTER))
+
+    def test_slot_released_after_view(self):
+        """Test the slot is given back even when the view fails"""
+        with patch('core.views.generate_gemini_response', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.get('/api/get-greeting/')
+        self.assertEqual(admission.GATES.occupied, 0)
+
+    @override_settings(ADMISSION_ENABLED=False)
+    @patch('core.views.generate_gemini_response', return_value='नमस्ते')
+    def test_disabled(self, mock_generate):
+        """Test nothing is limited when admission control is off"""
+        for _ in range(4):
+            self.assertEqual(self.client.get('/api/get-greeting/').status_code, 200)
@@ -0,0 +1,172 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from unittest import skipUnless
+from unittest.mock import patch
+from datetime import timedelta
+import csv
+import io
+import os
+import tempfile
+
+from accounts.models import Profile
+from core import advisories, crop_model, llm, weather_store
+from core.models import LocationAdvisory, Place, PlaceName, WeatherObservation
+
+
+def make_farmers(locations):
+    for i, location in enumerate(locations, start=User.objects.count()):
+        user = User.objects.create_user(username=f'+9190000{i:05d}')
+        user.profile.name = f'Farmer {i}'
+        user.profile.location = location
+        user.profile.save()
+
+
+def read_csv(pieces):
+    return list(csv.DictReader(io.StringIO(b''.join(pieces).decode())))
+
+
+class AdvisoryExportTest(TestCase):
+    def test_rows_for_every_located_profile(self):
+        """Test every farmer with a location gets a row with the crops of their district"""
+        make_farmers(['Patna', 'Nashik', 'Ludhiana', ''])
+        rows = read_csv(advisories.export('csv', month=7))
+        self.assertEqual([row['location'] for row in rows], ['Patna', 'Nashik', 'Ludhiana'])
+        self.assertEqual(rows[0]['district'], 'Patna')
+        soil_data = crop_model.get_soil_data_by_location('Patna')
+        expected = crop_model.predict_suitable_crops(crop_model.build_model_input(soil_data, 7))
+        self.assertEqual(rows[0]['crops'], ';'.join(expected))
+
+    def test_query_count_independent_of_chunks(self):
+        """Test known districts cost one query in all, and a chunk with unknown places one more"""
+        make_farmers(['Patna', 'Nashik'] * 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(read_csv(advisories.export('csv', month=7, chunk_size=3))), 10)
+        make_farmers(['Nowhere Village'] * 2)
+        with self.assertNumQueries(2):  # both are in the last of four chunks
+            rows = read_csv(advisories.export('csv', month=7, chunk_size=3))
+        self.assertEqual(rows[-1]['crops'], '')
+
+    def test_unknown_place_uses_stored_coordinates(self):
+        """Test a place geocoded by an earlier weather fetch gets its nearest district's advice"""
+        make_farmers(['Danapur Cantonment'])
+        weather_store.record(weather_store.location_key('Danapur Cantonment'), WeatherObservation.CURRENT,
+                             [{'observed_at': timezone.now(), 'lat': 25.62, 'lon': 85.05}])
+        rows = read_csv(advisories.export('csv', month=7))
+        self.assertEqual(rows[0]['district'], 'Patna')
+        self.assertNotEqual(rows[0]['crops'], '')
+
+    def test_spreadsheet_formulas_escaped(self):
+        """Test free-text cells can't run as spreadsheet formulas and phone numbers open as text"""
+        make_farmers(['Patna'])
+        Profile.objects.update(name='=HYPERLINK("x")')
+        rows = read_csv(advisories.export('csv', month=7))
+        self.assertEqual(rows[0]['name'], '\'=HYPERLINK("x")')
+        self.assertEqual(rows[0]['phone'], "'" + User.objects.get().username)
+
+    def test_endpoint_staff_only(self):
+        """Test the export is streamed to staff and refused to farmers"""
+        make_farmers(['Patna'])
+        client = Client()
+        client.force_login(User.objects.get())
+        self.assertEqual(client.get('/api/export-advisories/').status_code, 302)
+
+        staff = User.objects.create_user(username='officer', is_staff=True)
+        staff.profile.location = 'Patna'
+        staff.profile.save()
+        client.force_login(staff)
+        response = client.get('/api/export-advisories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(read_csv(response.streaming_content)), 2)
+        self.assertEqual(client.get('/api/export-advisories/?format=xlsx').status_code, 400)
+
+    @skipUnless(advisories.parquet_available(), 'pyarrow is not installed')
+    def test_parquet_command(self):
+        """Test the command writes one Parquet row group per chunk"""
+        import pyarrow.parquet as pq
+
+        make_farmers(['Patna', 'Nashik', 'Ludhiana'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'advisories.parquet')
+            call_command('export_advisories', '--output', path, '--chunk-size', '2', '--month', '7',
+                         stderr=io.StringIO())
+            parquet = pq.ParquetFile(path)
+            self.assertEqual(parquet.num_row_groups, 2)
+            table = parquet.read().to_pylist()
+        self.assertEqual([row['location'] for row in table], ['Patna', 'Nashik', 'Ludhiana'])
+        self.assertIsInstance(table[0]['crops'], list)
+
+
+class LocationAdvisoryTest(TestCase):
+    def test_distinct_locations_scored_in_one_call(self):
+        """Test each distinct location gets one row, all scored in a single model call"""
+        make_farmers(['Patna', ' patna ', 'Nashik', 'Nowhere Village'])
+        with patch('core.crop_model.predict_batch', wraps=crop_model.predict_batch) as mock_predict:
+            result = advisories.materialize()
+        self.assertEqual(mock_predict.call_count, 1)
+        self.assertEqual(result, {'locations': 3, 'materialized': 2, 'deleted': 0})
+        row = LocationAdvisory.objects.get(location='district:bihar:patna')
+        self.assertEqual(row.district, 'Patna')
+        self.assertEqual(row.crops, crop_model.predict_suitable_crops(row.model_input))
+
+    def test_unplaced_spellings_looked_up_together(self):
+        """Test unplaced spellings no district matches cost one PlaceName query in all"""
+        make_farmers(['Patna', 'Danapur', 'Nowhere Village', 'Another Village'])
+        danapur = Place.objects.create(key='25.63,85.05', name='Danapur', state='Bihar', lat=25.63, lon=85.05)
+        PlaceName.objects.create(name='danapur', place=danapur)
+        with self.assertNumQueries(2):
+            located = advisories.profile_locations()
+        self.assertEqual(set(located), {'district:bihar:patna', '25.63,85.05', 'nowhere village',
+                                        'another village'})
+
+    @patch('core.advisories.time.sleep')
+    @patch('core.advisories.llm.generate_text', return_value='  बुवाई योजना  ')
+    def test_calendars_within_budget(self, mock_generate, mock_sleep):
+        """Test missing calendars are generated up to the call budget and kept while crops don't change"""
+        make_farmers(['Patna', 'Nashik'])
+        advisories.materialize()
+        result = advisories.generate_missing(model=None, max_calls=1, per_minute=60)
+        self.assertEqual(result, {'calls': 1, 'generated': 1, 'remaining': 1})
+        self.assertEqual(LocationAdvisory.objects.get(location='district:bihar:patna').advisory, 'बुवाई योजना')
+
+        advisories.materialize()
+        self.assertEqual(LocationAdvisory.objects.get(location='district:bihar:patna').advisory, 'बुवाई योजना')
+        advisories.generate_missing(model=None, max_calls=5, per_minute=60)
+        self.assertEqual(mock_generate.call_count, 2)
+        self.assertFalse(LocationAdvisory.objects.filter(advisory='').exists())
+
+    @patch('core.advisories.llm.generate_text', side_effect=llm.LLMTimeout('slow'))
+    def test_failed_calendar_left_blank(self, mock_generate):
+        """Test a calendar Gemini doesn't answer is retried next run rather than stored"""
+        make_farmers(['Patna'])
+        call_command('materialize_advisories', '--per-minute', '6000', stdout=io.StringIO(),
+                     stderr=io.StringIO())
+        self.assertEqual(LocationAdvisory.objects.get().advisory, '')
+        self.assertIsNone(advisories.materialized('Patna'))
+
+    @patch('home.views.POLICY_MODEL')
+    @patch('home.views.get_current_weather_data')
+    def test_page_served_from_row(self, mock_weather, mock_model):
+        """Test Crop Advisory is a row lookup for a materialized location"""
+        make_farmers(['Patna'])
+        advisories.materialize()
+        LocationAdvisory.objects.update(advisory='रात में बनी योजना')
+        client = Client()
+        client.force_login(User.objects.get())
+        response = client.get('/home/CropAdvisory')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'रात में बनी योजना')
+        mock_weather.assert_not_called()
+        mock_model.generate_content.assert_not_called()
+
+    def test_stale_rows_ignored(self):
+        """Test rows from an earlier month or too long ago aren't served"""
+        make_farmers(['Patna'])
+        advisories.materialize()
+        LocationAdvisory.objects.update(advisory='योजना')
+        today = timezone.localdate()
+        self.assertIsNotNone(advisories.materialized('Patna', today=today))
+        self.assertIsNone(advisories.materialized('Patna', today=today + advisories.MATERIALIZED_MAX_AGE
+                                                  + timedelta(days=1)))
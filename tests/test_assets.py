@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.templatetags.static import static
+from unittest.mock import patch, Mock
+from io import BytesIO
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
+from core import assets, images
+from core.templatetags.responsive import responsive_image
+
+FONTS_CSS = """/* devanagari */
+@font-face {
+  font-family: 'Poppins';
+  font-style: normal;
+  font-weight: 400;
+  font-display: swap;
+  src: url(https://fonts.gstatic.com/s/poppins/v21/dev400.woff2) format('woff2');
+  unicode-range: U+0900-097F;
+}
+/* latin-ext */
+@font-face {
+  font-family: 'Poppins';
+  font-style: normal;
+  font-weight: 400;
+  font-display: swap;
+  src: url(https://fonts.gstatic.com/s/poppins/v21/ext400.woff2) format('woff2');
+  unicode-range: U+0100-02AF;
+}
+/* latin */
+@font-face {
+  font-family: 'Poppins';
+  font-style: normal;
+  font-weight: 400;
+  font-display: swap;
+  src: url(https://fonts.gstatic.com/s/poppins/v21/lat400.woff2) format('woff2');
+  unicode-range: U+0000-00FF;
+}
+"""
+
+
+def fake_download(url, **kwargs):
+    response = Mock()
+    response.raise_for_status.return_value = None
+    if url.startswith('https://fonts.googleapis.com/'):
+        response.text = FONTS_CSS
+    elif url.startswith('https://openweathermap.org/'):
+        buffer = BytesIO()
+        Image.new('RGBA', (100, 100), (255, 0, 0, 255)).save(buffer, 'PNG')
+        response.content = buffer.getvalue()
+    else:
+        response.content = b'/* swiper */\n//# sourceMappingURL=swiper-bundle.min.js.map'
+    return response
+
+
+class AssetBuildTest(TestCase):
+    def setUp(self):
+        self.vendor_dir = tempfile.mkdtemp()
+        patcher = patch('core.assets.VENDOR_DIR', self.vendor_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.vendor_dir)
+
+    def test_subset_font_css_keeps_latin_and_devanagari(self):
+        """Test only the latin and devanagari faces are kept and pointed at local files"""
+        css, downloads = assets.subset_font_css(FONTS_CSS)
+        self.assertEqual([name for _, name in downloads],
+                         ['poppins-400-devanagari.woff2', 'poppins-400-latin.woff2'])
+        self.assertNotIn('latin-ext', css)
+        self.assertNotIn('https://', css)
+        self.assertIn('url(poppins-400-latin.woff2)', css)
+
+    @patch('core.assets.requests.get', side_effect=fake_download)
+    def test_build_writes_vendor_files(self, mock_get):
+        """Test a build vendors fonts, Swiper and the icon sprite, and skips them next time"""
+        vendored = ['fonts', 'swiper', 'weather-icons']
+        results = assets.build(only=vendored)
+        self.assertTrue(os.path.exists(os.path.join(self.vendor_dir, 'fonts', 'fonts.css')))
+        self.assertTrue(os.path.exists(os.path.join(self.vendor_dir, 'fonts', 'poppins-400-devanagari.woff2')))
+        with open(os.path.join(self.vendor_dir, 'swiper', 'swiper-bundle.min.js'), 'rb') as fh:
+            self.assertNotIn(b'sourceMappingURL', fh.read())
+        with Image.open(os.path.join(self.vendor_dir, 'weather-icons', 'weather-icons.png')) as sprite:
+            self.assertEqual(sprite.size, (100 * len(assets.weather_icon_names()), 100))
+        self.assertEqual(len(results['weather-icons']), 2)
+
+        calls = mock_get.call_count
+        self.assertEqual(assets.build(only=vendored), {'fonts': [], 'swiper': [], 'weather-icons': []})
+        self.assertEqual(mock_get.call_count, calls)
+
+    @patch('core.assets.requests.get', side_effect=assets.requests.ConnectionError('offline'))
+    def test_offline_build_raises(self, mock_get):
+        """Test a failed download is reported rather than leaving half-written assets"""
+        with self.assertRaises(assets.AssetBuildError):
+            assets.build(only=['fonts'])
+        self.assertFalse(os.path.exists(os.path.join(self.vendor_dir, 'fonts', 'fonts.css')))
+
+    def test_sprite_css_offsets(self):
+        """Test every icon gets a class with a percentage offset into the sprite"""
+        css = assets.sprite_css(['01d', '01n', '02d'])
+        self.assertIn('.wi-01d { background-position: 0% 0; }', css)
+        self.assertIn('.wi-01n { background-position: 50% 0; }', css)
+        self.assertIn('.wi-02d { background-position: 100% 0; }', css)
+
+
+class ResponsiveImageTest(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir)
+        Image.new('RGB', (800, 400), (0, 128, 0)).save(os.path.join(self.source_dir, 'field.jpg'), quality=95)
+        for patcher in (
+            patch('core.images.SOURCE_DIR', self.source_dir),
+            patch('core.images.OUTPUT_DIR', os.path.join(self.source_dir, 'responsive')),
+            patch('core.images.RESPONSIVE_IMAGES', {'field.jpg': (200, 400, 1600)}),
+            patch('core.images.MODERN_FORMATS', ('webp',)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_build_variants(self):
+        """Test every width below the original is written in WebP and JPEG, once per source change"""
+        written = images.build_variants()
+        entry = images.load_manifest()['field.jpg']
+        self.assertEqual(sorted((v['format'], v['width'], v['height']) for v in entry['variants']),
+                         [('jpeg', 200, 100), ('jpeg', 400, 200), ('webp', 200, 100), ('webp', 400, 200)])
+        self.assertEqual(len(written), 5)  # four variants and the manifest
+        self.assertEqual(images.build_variants(), [])
+
+    def test_tag_renders_picture(self):
+        """Test the template tag emits sources with srcset/sizes and a lazy fallback <img>"""
+        images.build_variants()
+        html = responsive_image('field.jpg', alt='Field', sizes='50vw')
+        self.assertIn('<source type="image/webp" srcset="/static/responsive/field-200.webp 200w, '
+                      '/static/responsive/field-400.webp 400w" sizes="50vw">', html)
+        self.assertIn('src="/static/responsive/field-400.jpg"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('width="400" height="200"', html)
+
+    def test_tag_without_variants(self):
+        """Test the tag falls back to the original when the build hasn't run"""
+        html = responsive_image('field.jpg', alt='Field')
+        self.assertEqual(html, '<img src="/static/field.jpg" alt="Field" loading="lazy" decoding="async">')
+
+    def test_page_report(self):
+        """Test the report sums original and served bytes for each page"""
+        images.build_variants()
+        manifest = images.load_manifest()
+        report = images.page_report({'about.html': ['field.jpg']}, manifest)['about.html']
+        self.assertEqual(report['original_bytes'], manifest['field.jpg']['source_bytes'])
+        self.assertGreater(report['mobile_saved_bytes'], 0)
+
+
+class SelfHostedAssetsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='+919876543210')
+        self.user.profile.location = 'Delhi'
+        self.user.profile.save()
+
+    def test_variants_only_for_shown_images(self):
+        """Test variants are built only for images a template shows with {% responsive_image %}"""
+        template_dirs = [str(d) for t in settings.TEMPLATES for d in t.get('DIRS', [])]
+        shown = {name for names in images.template_images(template_dirs).values() for name in names}
+        self.assertLessEqual(set(images.RESPONSIVE_IMAGES), shown)
+
+    def test_uncollected_files_fall_back_to_plain_names(self):
+        """Test {% static %} works before collectstatic has built a manifest"""
+        self.assertEqual(static('css/core.css'), '/static/css/core.css')
+
+    def test_core_page_uses_local_assets(self):
+        """Test the chat page loads no third-party CSS/JS and no inline script"""
+        self.client.force_login(self.user)
+        response = self.client.get('/')
+        content = response.content.decode()
+        self.assertNotIn('fonts.googleapis.com', content)
+        self.assertNotIn('<script>', content)
+        self.assertIn('/static/vendor/fonts/fonts.css', content)
+        self.assertIn('data-process-voice-url="/process/"', content)
+
+    @patch('home.views.get_current_weather_data')
+    @patch('home.views.get_alerts_and_forecast')
+    def test_weather_icons_use_sprite(self, mock_forecast, mock_weather):
+        """Test weather icons come from the local sprite instead of openweathermap.org"""
+        mock_weather.return_value = ({
+            'lat': 28.6, 'lon': 77.2, 'city': 'Delhi', 'temperature': 25, 'feels_like': 26,
+            'description': 'clear sky', 'icon': '01d', 'humidity': 60, 'pressure': 1013,
+            'wind_speed': 5, 'visibility': 10000,
+        }, None)
+        mock_forecast.return_value = ({'forecast': [{
+            'date': 1640995200, 'max_temp': 25, 'min_temp': 15, 'description': 'clear sky',
+            'icon': '01n', 'humidity': 60, 'pressure': 1013, 'wind_speed': 5,
+        }], 'alerts': []}, None)
+        self.client.force_login(self.user)
+        response = self.client.get('/home/Weather')
+        self.assertContains(response, 'class="wi wi-01d"')
+        self.assertContains(response, 'class="wi wi-01n"')
+        self.assertNotContains(response, 'openweathermap.org/img')
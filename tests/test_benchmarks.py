@@ -0,0 +1,94 @@
+from django.test import TestCase
+
+from benchmarks.stats import compare, measure, percentile, summarize
+
+
+class BenchmarkStatsTest(TestCase):
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        samples = list(range(0, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize_in_milliseconds(self):
+        """Test latency summary is reported in milliseconds"""
+        summary = summarize([0.001, 0.002, 0.003])
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['p50_ms'], 2.0)
+
+    def test_measure_reports_queries_and_allocations(self):
+        """Test measure counts calls, queries and allocations"""
+        calls = []
+        result = measure(lambda: calls.append(bytearray(1024)), iterations=5, warmup=1)
+        self.assertEqual(result['count'], 5)
+        self.assertEqual(result['queries_per_call'], 0)
+        self.assertGreater(result['peak_alloc_kib'], 0)
+
+    def test_compare_flags_regressions(self):
+        """Test comparison against a baseline flags slow benchmarks"""
+        baseline = {'a': {'p95_ms': 10.0}, 'b': {'p95_ms': 10.0}}
+        current = {'a': {'p95_ms': 15.0}, 'b': {'p95_ms': 10.5}, 'c': {'p95_ms': 1.0}}
+        rows, regressions = compare(current, baseline, threshold=0.2)
+        self.assertEqual(regressions, ['a'])
+        self.assertEqual(len(rows), 3)
+
+
+class FakeUpstreamTest(TestCase):
+    def setUp(self):
+        from benchmarks import fakes
+        self.fakes = fakes
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def _start(self, name, **options):
+        server, fake = self.fakes.start(name, port=0, **options)
+        self.servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}', fake
+
+    def test_latency_model(self):
+        """Test latency distributions stay within their bounds"""
+        uniform = self.fakes.LatencyModel('uniform', low=0.1, high=0.2, seed=1)
+        self.assertTrue(all(0.1 <= uniform.sample() <= 0.2 for _ in range(100)))
+        self.assertEqual(self.fakes.LatencyModel('fixed', seconds=0.3).sample(), 0.3)
+
+    def test_fake_gemini_shape(self):
+        """Test the fake Gemini server answers in the generateContent shape"""
+        import requests
+        url, _ = self._start('gemini', latency={'dist': 'fixed'})
+        body = {'contents': [{'role': 'user', 'parts': [{'text': "User query: \"x\". Classify this into: 'weather'"}]}]}
+        response = requests.post(f'{url}/v1beta/models/gemini-2.5-flash-lite:generateContent', json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['candidates'][0]['content']['parts'][0]['text'], 'weather')
+
+    def test_fake_twilio_keeps_messages(self):
+        """Test SMS sent to the fake Twilio server can be read back"""
+        import requests
+        url, _ = self._start('twilio', latency={'dist': 'fixed'})
+        response = requests.post(f'{url}/2010-04-01/Accounts/AC1/Messages.json',
+                                 data={'To': '+919876543210', 'From': '+1555', 'Body': 'code: 123456'})
+        self.assertEqual(response.status_code, 201)
+        messages = requests.get(f'{url}/_fake/messages', params={'to': '+919876543210'}).json()
+        self.assertEqual(messages[0]['body'], 'code: 123456')
+
+    def test_error_rate(self):
+        """Test the configured error rate is applied"""
+        import requests
+        url, _ = self._start('openweather', latency={'dist': 'fixed'}, error_rate=1.0)
+        response = requests.get(f'{url}/data/2.5/weather', params={'q': 'Delhi'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_record_and_replay(self):
+        """Test recorded responses are served back in replay mode"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = self.fakes.Recorder(directory, 'openweather')
+            key = recorder.key('GET', '/data/2.5/weather', 'q=Patna&appid=secret')
+            recorder.save(key, 200, 'application/json', b'{"recorded": true}')
+            fake = self.fakes.FakeOpenWeather(replay_dir=directory)
+            status, _, body = fake.handle('GET', '/data/2.5/weather', 'q=Patna&appid=other', {}, b'')
+            self.assertEqual((status, body), (200, b'{"recorded": true}'))
@@ -0,0 +1,109 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest.mock import patch
+import csv
+import io
+import json
+
+import pandas as pd
+
+from core import crop_model
+from home import bulk
+
+URL = '/home/api/recommendations/bulk'
+
+
+def sample_rows(n=5):
+    df = pd.read_csv(crop_model.DATA_FILE).sample(n=n, random_state=7)
+    return df[crop_model.FEATURES].to_dict('records')
+
+
+def as_csv(rows, extra_columns=()):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=[*extra_columns, *crop_model.FEATURES])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class BatchPredictionTest(TestCase):
+    def test_batch_matches_single_predictions(self):
+        """Test one vectorized call ranks crops exactly as per-row prediction does"""
+        rows = sample_rows(50)
+        crops, confidence = crop_model.predict_batch([[row[name] for name in crop_model.FEATURES] for row in rows])
+        self.assertEqual([list(map(str, row_crops)) for row_crops in crops],
+                         [crop_model.predict_suitable_crops(row) for row in rows])
+        self.assertTrue(all(0 < value <= 1 for value in confidence))
+
+
+class BulkRecommendationsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='+919876543210')
+        self.user.profile.location = 'Delhi'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+
+    def post(self, body, content_type='text/csv', query=''):
+        return self.client.post(URL + query, body, content_type=content_type)
+
+    def test_requires_login(self):
+        """Test anonymous uploads are refused"""
+        self.client.logout()
+        response = self.post(as_csv(sample_rows(1)))
+        self.assertEqual(response.status_code, 401)
+
+    def test_csv_in_csv_out(self):
+        """Test a CSV upload streams back one result per plot, ids kept"""
+        rows = sample_rows(5)
+        for i, row in enumerate(rows):
+            row['id'] = f'plot-{i}'
+        response = self.post(as_csv(rows, extra_columns=['id']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        results = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([result['id'] for result in results], [f'plot-{i}' for i in range(5)])
+        expected = [';'.join(crop_model.predict_suitable_crops(row)) for row in rows]
+        self.assertEqual([result['crops'] for result in results], expected)
+
+    def test_ndjson_with_bad_rows(self):
+        """Test invalid lines become error rows without stopping the stream"""
+        rows = sample_rows(2)
+        body = '\n'.join([json.dumps(rows[0]), 'not json', json.dumps({'N': 1}),
+                          json.dumps({**rows[1], 'ph': 'acidic'}), json.dumps(rows[1])])
+        response = self.post(body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        results = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([result['row'] for result in results], [1, 2, 3, 4, 5])
+        self.assertIsNone(results[0]['error'])
+        self.assertEqual(results[1]['error'], 'not a JSON object')
+        self.assertTrue(results[2]['error'].startswith('missing P'))
+        self.assertEqual(results[3]['error'], 'features must be numbers')
+        self.assertEqual(results[4]['crops'], crop_model.predict_suitable_crops(rows[1]))
+
+    def test_multipart_upload_and_output_format(self):
+        """Test a multipart file upload can be answered in the other format"""
+        upload = SimpleUploadedFile('plots.csv', as_csv(sample_rows(3)).encode(), content_type='text/csv')
+        response = self.client.post(URL + '?format=ndjson', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+    def test_scored_in_chunks(self):
+        """Test rows are scored one chunk per model call"""
+        with patch('core.crop_model.predict_batch', wraps=crop_model.predict_batch) as mock_predict:
+            chunks = bulk.stream(io.BytesIO(as_csv(sample_rows(10)).encode()), 'csv', 'ndjson', chunk_size=4)
+            self.assertEqual(len(list(chunks)), 3)
+        self.assertEqual([len(call.args[0]) for call in mock_predict.call_args_list], [4, 4, 2])
+
+    def test_rejected_uploads(self):
+        """Test missing columns, unknown types and oversized bodies are refused before streaming"""
+        response = self.post('N,P,K\n1,2,3\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('temperature', json.loads(response.content)['error'])
+        self.assertEqual(self.post('{}', content_type='application/json').status_code, 415)
+        self.assertEqual(self.post(as_csv(sample_rows(1)), query='?format=xml').status_code, 400)
+        with patch.object(bulk, 'BULK_MAX_UPLOAD_BYTES', 10):
+            self.assertEqual(self.post(as_csv(sample_rows(1))).status_code, 413)
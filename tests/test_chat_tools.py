@@ -0,0 +1,144 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+import json
+import threading
+import time
+
+from benchmarks.stubs import StubFunctionCall, StubPart, StubResponse
+from core import chat_tools, llm
+
+
+class ToolModel:
+    """Fake Gemini model: asks for ``calls`` when tools may be called, else answers ``text``."""
+
+    def __init__(self, calls=(), text='जवाब', follow_up_delay=0.0):
+        self.calls = list(calls)
+        self.text = text
+        self.follow_up_delay = follow_up_delay
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def generate_content(self, contents, request_options=None, tools=None, tool_config=None):
+        with self.lock:
+            self.requests.append({'contents': contents, 'tools': tools, 'tool_config': tool_config})
+        if tools and not tool_config and self.calls:
+            return StubResponse(parts=[StubPart(function_call=StubFunctionCall(name, args)) for name, args in self.calls])
+        time.sleep(self.follow_up_delay)
+        return StubResponse(self.text)
+
+
+WEATHER = {'city': 'Delhi', 'temperature': 25, 'description': 'साफ आसमान', 'humidity': 60, 'wind_speed': 5}
+TURN = [{'role': 'user', 'parts': ['Delhi ka mausam kaisa hai?']}]
+
+
+@override_settings(GEMINI_HEDGE_PERCENTILE=0)
+class RespondTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_answer_without_calls_is_one_round_trip(self):
+        """Test a turn that needs no data is answered by the first call"""
+        model = ToolModel(text='नमस्ते!')
+        self.assertEqual(chat_tools.respond(model, TURN), 'नमस्ते!')
+        self.assertEqual(len(model.requests), 1)
+        self.assertEqual(model.requests[0]['tools'], chat_tools.TOOLS)
+
+    def test_function_call_then_follow_up(self):
+        """Test requested functions run locally and one follow-up answers from their results"""
+        model = ToolModel(calls=[('get_weather', {})], text='दिल्ली में धूप है।')
+        with patch.dict(chat_tools.FUNCTIONS, get_weather=lambda place: dict(WEATHER, city=place)):
+            answer = chat_tools.respond(model, TURN, location='Jaipur')
+
+        self.assertEqual(answer, 'दिल्ली में धूप है।')
+        self.assertEqual(len(model.requests), 2)
+        follow_up = model.requests[1]
+        self.assertEqual(follow_up['tool_config'], chat_tools.FOLLOW_UP_CONFIG)
+        self.assertEqual(follow_up['tools'], chat_tools.TOOLS)
+        response = follow_up['contents'][-1]['parts'][0]['function_response']
+        self.assertEqual(response['name'], 'get_weather')
+        self.assertEqual(response['response']['city'], 'Jaipur')  # no place named: the profile's
+
+    def test_calls_run_in_parallel(self):
+        """Test several requested functions run at the same time"""
+        def slow(place):
+            time.sleep(0.3)
+            return {'place': place, 'crops': ['rice']}
+
+        model = ToolModel(calls=[('get_weather', {'place': 'Delhi'}), ('recommend_crops', {'place': 'Delhi'})])
+        with patch.dict(chat_tools.FUNCTIONS, get_weather=slow, recommend_crops=slow):
+            started = time.monotonic()
+            chat_tools.respond(model, TURN)
+        self.assertLess(time.monotonic() - started, 0.5)
+        names = [part['function_response']['name'] for part in model.requests[1]['contents'][-1]['parts']]
+        self.assertEqual(names, ['get_weather', 'recommend_crops'])
+
+    def test_follow_up_timeout_answers_from_results(self):
+        """Test the results are summarized locally when the follow-up misses the deadline"""
+        model = ToolModel(calls=[('get_weather', {'place': 'Delhi'})], follow_up_delay=1.0)
+        with patch.dict(chat_tools.FUNCTIONS, get_weather=lambda place: WEATHER), llm.request_deadline(0.3):
+            answer = chat_tools.respond(model, TURN)
+        self.assertIn('25°C', answer)
+
+    def test_first_call_timeout_raises(self):
+        """Test a first call out of budget raises LLMTimeout"""
+        with llm.request_deadline(0):
+            with self.assertRaises(llm.LLMTimeout):
+                chat_tools.respond(ToolModel(), TURN)
+
+
+class FunctionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_errors_are_results(self):
+        """Test unknown functions, missing places and failures come back as error results"""
+        self.assertIn('error', chat_tools.run_call('get_rainfall', {'place': 'Delhi'}))
+        self.assertEqual(chat_tools.run_call('get_weather', {}), {'error': chat_tools.NO_PLACE})
+
+        def broken(place):
+            raise RuntimeError('boom')
+
+        with patch.dict(chat_tools.FUNCTIONS, get_weather=broken):
+            self.assertIn('error', chat_tools.run_call('get_weather', {'place': 'Delhi'}))
+
+    def test_recommend_crops_for_district(self):
+        """Test crops of a known district come from the crop model"""
+        result = chat_tools.recommend_crops('Delhi')
+        self.assertEqual(result['district'], 'New Delhi')
+        self.assertTrue(result['crops'])
+        self.assertTrue(all(isinstance(crop, str) for crop in result['crops']))
+
+    def test_list_schemes_prefers_policies_answer(self):
+        """Test the Policies page's cached answer is used, else the central schemes"""
+        from home.views import FALLBACK_POLICIES
+
+        self.assertEqual(chat_tools.list_schemes('Patna')['schemes'], FALLBACK_POLICIES)
+        schemes = [{'name': 'मुख्यमंत्री योजना', 'benefits': 'सब्सिडी', 'link': 'https://example.gov.in'}]
+        llm._remember('policies:district:bihar:patna', '```json\n' + json.dumps(schemes, ensure_ascii=False) + '\n```')
+        self.assertEqual(chat_tools.list_schemes('Patna')['schemes'], schemes)
+
+
+@override_settings(CHAT_ENGINE='tools', GEMINI_HEDGE_PERCENTILE=0)
+class ToolsEngineViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='+919876543210')
+        self.user.profile.location = 'Delhi'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+
+    @patch('core.views.get_weather_data', return_value=(WEATHER, None))
+    def test_weather_turn_takes_two_calls(self, mock_weather):
+        """Test a weather turn is one call with tools and one follow-up, without classification"""
+        model = ToolModel(calls=[('get_weather', {'place': 'Delhi'})], text='**दिल्ली** में धूप है।')
+        with patch('core.views.MODEL', model):
+            response = self.client.post('/process/', json.dumps({'text': 'Delhi ka mausam kaisa hai?'}),
+                                        content_type='application/json')
+
+        self.assertEqual(response.json()['response'], 'दिल्ली में धूप है।')
+        self.assertEqual(len(model.requests), 2)
+        mock_weather.assert_called_once_with('Delhi')
+        history = self.client.session['chat_history']
+        self.assertEqual([turn['role'] for turn in history], ['user', 'model'])
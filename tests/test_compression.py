@@ -0,0 +1,99 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+import brotli
+import gzip
+import json
+import zlib
+
+from core import compression, metrics
+
+
+class NegotiationTest(TestCase):
+    def test_prefers_brotli_then_gzip(self):
+        """Test brotli is chosen when accepted, gzip otherwise, and q-values are honoured"""
+        self.assertEqual(compression.negotiate('gzip, deflate, br'), 'br')
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(compression.negotiate('br;q=0, *'), 'gzip')
+        self.assertIsNone(compression.negotiate('identity'))
+        self.assertIsNone(compression.negotiate(''))
+
+    def test_compressible_types(self):
+        """Test only text bodies that aren't encoded or partial are compressed"""
+        self.assertTrue(compression.compressible(HttpResponse(content_type='text/html; charset=utf-8')))
+        self.assertTrue(compression.compressible(HttpResponse(content_type='application/json')))
+        self.assertFalse(compression.compressible(HttpResponse(content_type='image/webp')))
+        partial = HttpResponse(content_type='text/plain', status=206)
+        self.assertFalse(compression.compressible(partial))
+
+    def test_chunks_are_flushed(self):
+        """Test each streamed chunk can be decoded as soon as it arrives"""
+        chunks = compression.compress_chunks(iter([b'first line\n' * 50, b'second line\n' * 50]), 'gzip')
+        decoder = zlib.decompressobj(31)
+        self.assertEqual(decoder.decompress(next(chunks)), b'first line\n' * 50)
+        self.assertEqual(decoder.decompress(b''.join(chunks)), b'second line\n' * 50)
+
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_page_compressed_per_accept_encoding(self):
+        """Test a cached page is sent as brotli, gzip or identity to match the request"""
+        plain = self.client.get('/Fertilizer')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        br = self.client.get('/Fertilizer', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(br['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(br.content), plain.content)
+        self.assertEqual(int(br['Content-Length']), len(br.content))
+        self.assertLess(len(br.content), len(plain.content) / 2)
+
+        gz = self.client.get('/Fertilizer', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gz['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gz.content), plain.content)
+
+    def test_weak_etag_still_revalidates(self):
+        """Test a compressed page's ETag is weak and still gets a 304"""
+        first = self.client.get('/Fertilizer', HTTP_ACCEPT_ENCODING='br')
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        response = self.client.get('/Fertilizer', HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_response_not_compressed(self):
+        """Test bodies under COMPRESSION_MIN_BYTES are sent as they are"""
+        response = self.client.post('/api/clear-chat/', HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @override_settings(COMPRESSION_MIN_BYTES=100)
+    def test_page_with_csrf_token_not_compressed(self):
+        """Test a page that renders a CSRF token is never compressed"""
+        response = self.client.get('/accounts/login/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertIn(b'csrfmiddlewaretoken', response.content)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response_compressed(self):
+        """Test a streamed response is compressed without a Content-Length and counted"""
+        user = User.objects.create_user(username='+919876543210')
+        user.profile.location = 'Delhi'
+        user.profile.save()
+        self.client.force_login(user)
+        rows = '\n'.join(json.dumps({'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82.0,
+                                     'ph': 6.5, 'rainfall': 202.9}) for _ in range(200))
+        before = metrics.REGISTRY.snapshot()['counters']
+        response = self.client.post('/home/api/recommendations/bulk', rows, content_type='application/x-ndjson',
+                                    HTTP_ACCEPT_ENCODING='gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(len(body.splitlines()), 200)
+        sent = {tuple(labels): value for name, labels, value in metrics.REGISTRY.snapshot()['counters']
+                if name == 'agripath_response_uncompressed_bytes_total'}
+        earlier = {tuple(labels): value for name, labels, value in before
+                   if name == 'agripath_response_uncompressed_bytes_total'}
+        key = (('view', 'bulk_recommendations'),)
+        self.assertEqual(sent[key] - earlier.get(key, 0), len(body))
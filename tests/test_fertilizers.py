@@ -0,0 +1,114 @@
+from django.test import TestCase
+import math
+
+from home import fertilizers
+
+
+def brute_force(products, tds=None, crop=None, soil=None, price=None):
+    """The filters as the Fertilizer page used to apply them in the browser."""
+    matches = []
+    for p in products:
+        if tds is not None and not p['tdsRange']['min'] <= tds <= p['tdsRange']['max']:
+            continue
+        if crop and 'All' not in p['suitableCrops'] and crop not in p['suitableCrops']:
+            continue
+        if soil and 'All' not in p['suitableSoilTypes'] and soil not in p['suitableSoilTypes']:
+            continue
+        if price and not (p['priceINR']['max'] >= price[0] and p['priceINR']['min'] < price[1]):
+            continue
+        matches.append(p)
+    return matches
+
+
+class IntervalTreeTest(TestCase):
+    def test_overlapping_matches_scan(self):
+        """Test interval queries return exactly the intervals a full scan finds"""
+        intervals = [(0, 10, 'a'), (5, 5, 'b'), (8, 30, 'c'), (20, 25, 'd'), (40, 100, 'e'), (0, 1000, 'f')]
+        tree = fertilizers.IntervalTree(intervals)
+        for low, high in [(5, 5), (11, 19), (26, 39), (0, 0), (101, 200), (-5, -1), (25, 40)]:
+            expected = {item for start, end, item in intervals if start <= high and end >= low}
+            self.assertEqual(set(tree.overlapping(low, high)), expected, (low, high))
+
+    def test_empty_tree(self):
+        """Test an empty tree finds nothing"""
+        self.assertEqual(fertilizers.IntervalTree([]).overlapping(0, 10), [])
+
+
+class CatalogSearchTest(TestCase):
+    def setUp(self):
+        self.catalog = fertilizers.get_catalog()
+
+    def test_search_matches_original_filters(self):
+        """Test every filter combination agrees with the old client-side filtering"""
+        products = self.catalog.products
+        crops = [None, 'Wheat', 'Rice', 'Tomato', 'Unknown']
+        soils = [None, 'Loamy', 'Saline', 'Peat']
+        prices = [None, (0, 500), (500, 1000), (1000, 2000), (2000, math.inf)]
+        for tds in [None, 0, 150, 800, 1500, 5000]:
+            for crop in crops:
+                for soil in soils:
+                    for price in prices:
+                        found = self.catalog.search(tds=tds, crop=crop, soil=soil, price=price)
+                        self.assertEqual([p['id'] for p in found],
+                                         [p['id'] for p in brute_force(products, tds, crop, soil, price)],
+                                         (tds, crop, soil, price))
+
+    def test_parse_price(self):
+        """Test the price filter values of the page"""
+        self.assertIsNone(fertilizers.parse_price('all'))
+        self.assertEqual(fertilizers.parse_price('500-1000'), (500, 1000))
+        self.assertEqual(fertilizers.parse_price('2000+'), (2000, math.inf))
+        with self.assertRaises(ValueError):
+            fertilizers.parse_price('cheap')
+
+    def test_localize(self):
+        """Test localized products carry one language only"""
+        product = fertilizers.localize(self.catalog.products[0], 'hi')
+        self.assertEqual(product['name'], self.catalog.products[0]['name_hi'])
+        self.assertNotIn('name_en', product)
+
+
+class FertilizerApiTest(TestCase):
+    def test_search_endpoint(self):
+        """Test the endpoint returns only the matching products"""
+        response = self.client.get('/api/fertilizers', {'tds': '800', 'crop': 'Wheat', 'price': '0-500'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        expected = fertilizers.get_catalog().search(tds=800, crop='Wheat', price=(0, 500))
+        self.assertEqual([p['id'] for p in data['products']], [p['id'] for p in expected])
+        self.assertEqual(data['count'], len(expected))
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_language(self):
+        """Test products come back in the requested language"""
+        data = self.client.get('/api/fertilizers', {'lang': 'hi'}).json()
+        self.assertEqual(data['products'][0]['name'], fertilizers.get_catalog().products[0]['name_hi'])
+
+    def test_bad_input(self):
+        """Test unknown languages and malformed numbers are rejected"""
+        self.assertEqual(self.client.get('/api/fertilizers', {'lang': 'fr'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/fertilizers', {'tds': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/fertilizers', {'price': 'cheap'}).status_code, 400)
+
+    def test_etag(self):
+        """Test a repeated query gets 304 and a different query a different ETag"""
+        first = self.client.get('/api/fertilizers', {'tds': '800'})
+        self.assertTrue(first.has_header('ETag'))
+        repeat = self.client.get('/api/fertilizers', {'tds': '800'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        other = self.client.get('/api/fertilizers', {'tds': '801'})
+        self.assertNotEqual(other['ETag'], first['ETag'])
+
+    def test_meta_endpoint(self):
+        """Test the meta endpoint returns one language's strings and crops"""
+        data = self.client.get('/api/fertilizers/meta', {'lang': 'hi'}).json()
+        self.assertEqual(data['lang'], 'hi')
+        self.assertEqual(data['translations']['find_btn'], 'सिफ़ारिशें खोजें')
+        self.assertIn('Wheat', data['crop_info'])
+
+    def test_page_is_a_shell(self):
+        """Test the Fertilizer page embeds the English strings and API URLs but no products"""
+        response = self.client.get('/Fertilizer')
+        self.assertContains(response, 'id="catalog-meta"')
+        self.assertContains(response, 'data-search-url="/')
+        self.assertNotContains(response, fertilizers.get_catalog().products[0]['description_en'])
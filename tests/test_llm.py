@@ -0,0 +1,184 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from unittest.mock import patch, Mock
+import threading
+import time
+
+from core import llm, metrics
+
+
+class SlowModel:
+    """Fake Gemini model whose calls take the given delays, in order."""
+
+    def __init__(self, *delays, text='answer'):
+        self.delays = list(delays)
+        self.text = text
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, request_options=None):
+        with self.lock:
+            delay = self.delays[min(self.calls, len(self.delays) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        return Mock(text=self.text)
+
+
+@override_settings(GEMINI_HEDGE_SECONDS=0.05, GEMINI_HEDGE_MIN_SECONDS=0.05)
+class GenerateTextTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_returns_model_text(self):
+        """Test a fast call returns the model text and passes a timeout"""
+        model = Mock()
+        model.generate_content.return_value = Mock(text='hello')
+        self.assertEqual(llm.generate_text(model, 'prompt', timeout=1), 'hello')
+        _, kwargs = model.generate_content.call_args
+        self.assertEqual(kwargs['request_options']['timeout'], 1)
+
+    def test_hedged_request_wins(self):
+        """Test a slow first attempt is hedged and the faster duplicate answers"""
+        model = SlowModel(1.0, 0.0)
+        started = time.monotonic()
+        result = llm.generate_text(model, 'prompt', timeout=2)
+        self.assertEqual(result, 'answer')
+        self.assertEqual(model.calls, 2)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_timeout_uses_fallback(self):
+        """Test the template fallback answers when the deadline passes"""
+        model = SlowModel(1.0)
+        result = llm.generate_text(model, 'prompt', timeout=0.1, fallback='template')
+        self.assertEqual(result, 'template')
+
+    def test_timeout_prefers_cached_answer(self):
+        """Test the last good answer for the same key beats the template"""
+        fast = Mock()
+        fast.generate_content.return_value = Mock(text='cached answer')
+        llm.generate_text(fast, 'prompt', cache_key='k')
+
+        result = llm.generate_text(SlowModel(1.0), 'prompt', timeout=0.1, cache_key='k', fallback='template')
+        self.assertEqual(result, 'cached answer')
+
+    def test_timeout_without_fallback_raises(self):
+        """Test LLMTimeout is raised when nothing can answer"""
+        with self.assertRaises(llm.LLMTimeout):
+            llm.generate_text(SlowModel(1.0), 'prompt', timeout=0.1)
+
+    def test_model_errors_propagate(self):
+        """Test model exceptions are re-raised, not hidden behind the fallback"""
+        model = Mock()
+        model.generate_content.side_effect = Exception('API Error')
+        with self.assertRaises(Exception):
+            llm.generate_text(model, 'prompt', timeout=1, fallback='template')
+
+    def test_request_budget_caps_call_timeout(self):
+        """Test calls inside a request share its remaining budget"""
+        model = SlowModel(1.0)
+        started = time.monotonic()
+        with llm.request_deadline(0.1):
+            result = llm.generate_text(model, 'prompt', timeout=5, fallback='template')
+        self.assertEqual(result, 'template')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    @override_settings(GEMINI_MAX_INFLIGHT=1, GEMINI_HEDGE_PERCENTILE=0)
+    def test_abandoned_call_holds_its_slot(self):
+        """Test a call left running after its deadline keeps its slot, so the next one falls back at once"""
+        fast = Mock()
+        fast.generate_content.return_value = Mock(text='answer')
+        with patch.object(llm, '_executor', None), patch.object(llm, '_slots', None):
+            self.assertEqual(llm.generate_text(SlowModel(0.5), 'prompt', timeout=0.05, fallback='template'),
+                             'template')
+            self.assertEqual(llm.generate_text(fast, 'prompt', timeout=1, fallback='template'), 'template')
+            fast.generate_content.assert_not_called()
+            time.sleep(0.6)
+            self.assertEqual(llm.generate_text(fast, 'prompt', timeout=1, fallback='template'), 'answer')
+
+    def test_exhausted_budget_skips_call(self):
+        """Test no upstream call is made once the budget is spent"""
+        model = Mock()
+        with llm.request_deadline(0):
+            result = llm.generate_text(model, 'prompt', fallback='template')
+        self.assertEqual(result, 'template')
+        model.generate_content.assert_not_called()
+
+
+class LatencyTrackerTest(TestCase):
+    def test_percentile_needs_samples(self):
+        """Test the tracker waits for enough samples before reporting"""
+        tracker = llm.LatencyTracker()
+        tracker.record(1.0)
+        self.assertIsNone(tracker.percentile(95))
+
+    def test_percentile(self):
+        """Test percentile over the rolling window"""
+        tracker = llm.LatencyTracker()
+        for i in range(1, 101):
+            tracker.record(i / 100)
+        self.assertAlmostEqual(tracker.percentile(95), 0.95, places=2)
+        self.assertAlmostEqual(tracker.percentile(50), 0.5, places=1)
+
+
+class PoliciesFallbackTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        cache.clear()
+        self.user = User.objects.create_user(username='+919876543210')
+        self.user.profile.location = 'Delhi'
+        self.user.profile.save()
+
+    @patch('home.views.POLICY_MODEL', SlowModel(1.0))
+    @override_settings(GEMINI_REQUEST_BUDGET_SECONDS=0.1)
+    def test_policies_fallback_on_timeout(self):
+        """Test the policies page renders the local scheme list when Gemini is too slow"""
+        self.client.force_login(self.user)
+        response = self.client.get('/home/Policies')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'PM-KISAN')
+
+
+class ForkSafetyTest(TestCase):
+    def test_reinit_after_fork_drops_clients(self):
+        """Test models forget their gRPC client and the pool is recreated after a fork"""
+        model = Mock()
+        model._client = object()
+        pool = llm._get_executor()
+        with patch.dict(llm._MODELS, {'test-model': model}), patch('core.llm.configure_genai') as configure:
+            llm.reinit_after_fork()
+        configure.assert_called_once()
+        self.assertIsNone(model._client)
+        self.assertIsNot(llm._get_executor(), pool)
+
+    def test_executor_is_per_process(self):
+        """Test a pool inherited from another pid is replaced"""
+        pool = llm._get_executor()
+        with patch('core.llm.os.getpid', return_value=-1):
+            self.assertIsNot(llm._get_executor(), pool)
+        llm.reinit_after_fork()
+
+
+class SystemInstructionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lazy_model_built_with_instruction(self):
+        """Test a call with a system instruction goes to a shared model built with it"""
+        with patch.dict(llm._MODELS, clear=True), patch('core.llm.configure_genai') as configure:
+            genai = configure.return_value
+            genai.GenerativeModel.return_value.generate_content.return_value = Mock(text='नमस्ते', usage_metadata=None)
+            model = llm.LazyModel('test-model')
+            for _ in range(2):
+                self.assertEqual(llm.generate_text(model, 'hello', system_instruction='persona'), 'नमस्ते')
+        genai.GenerativeModel.assert_called_once_with('test-model', system_instruction='persona')
+        self.assertEqual(genai.GenerativeModel.return_value.generate_content.call_args[0][0], 'hello')
+
+    def test_tokens_recorded(self):
+        """Test the prompt, cached and output token counts Gemini reports are counted per model"""
+        usage = Mock(prompt_token_count=1200, cached_content_token_count=1024, candidates_token_count=40)
+        model = Mock(model_name='models/gemini-2.5-flash-lite')
+        model.generate_content.return_value = Mock(text='ok', usage_metadata=usage)
+        llm.generate_text(model, 'prompt', timeout=1)
+        text = metrics.render_prometheus()
+        for kind in ('prompt', 'cached', 'output'):
+            self.assertIn(f'agripath_llm_tokens_total{{kind="{kind}",model="gemini-2.5-flash-lite"}}', text)
@@ -0,0 +1,145 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from io import BytesIO, StringIO
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
+from accounts import avatars
+from accounts.forms import ProfileEditForm
+
+
+def photo_upload(name='photo.jpg', color=(200, 30, 30), size=(1600, 1200)):
+    """A JPEG like a phone photo, with camera EXIF tags."""
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'  # Make
+    exif[0x0110] = 'PhoneModel'  # Model
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class MediaRootTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class AvatarUploadTest(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='+919876543210')
+
+    def upload(self, user, upload):
+        form = ProfileEditForm(data={'name': 'Ram', 'location': 'Patna'}, files={'profile_picture': upload},
+                               instance=user.profile)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_upload_is_resized_and_stripped(self):
+        """Test uploads are stored by content hash, capped in size and without EXIF"""
+        profile = self.upload(self.user, photo_upload())
+        name = profile.profile_picture.name
+        self.assertTrue(avatars.is_content_addressed(name))
+        with default_storage.open(name) as fh, Image.open(fh) as image:
+            self.assertLessEqual(max(image.size), avatars.MAX_SIZE)
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_thumbnails_are_square(self):
+        """Test every thumbnail size is written and linked from the profile"""
+        profile = self.upload(self.user, photo_upload())
+        digest = os.path.splitext(os.path.basename(profile.profile_picture.name))[0]
+        for size, pixels in avatars.THUMBNAIL_SIZES.items():
+            with default_storage.open(avatars.content_name(digest, size)) as fh, Image.open(fh) as image:
+                self.assertEqual(image.size, (pixels, pixels))
+        self.assertTrue(profile.avatar_url.endswith(f'{digest}-md.jpg'))
+        self.assertTrue(profile.avatar_url_2x.endswith(f'{digest}-lg.jpg'))
+
+    def test_duplicate_uploads_stored_once(self):
+        """Test the same photo uploaded by two users is stored once"""
+        other = User.objects.create_user(username='+919876543211')
+        first = self.upload(self.user, photo_upload())
+        second = self.upload(other, photo_upload())
+        self.assertEqual(first.profile_picture.name, second.profile_picture.name)
+        directory = os.path.dirname(os.path.join(self.media_root, first.profile_picture.name))
+        self.assertEqual(len(os.listdir(directory)), 1 + len(avatars.THUMBNAIL_SIZES))
+
+    def test_default_avatar_is_static(self):
+        """Test profiles without a picture share the static default"""
+        self.assertEqual(self.user.profile.profile_picture.name, '')
+        self.assertEqual(self.user.profile.avatar_url, '/static/default_profile.png')
+
+    def test_rebuild_converts_legacy_uploads(self):
+        """Test rebuild_avatars moves old full-size uploads to content-addressed storage"""
+        legacy = default_storage.save('profile_pics/photo.jpg', photo_upload())
+        self.user.profile.profile_picture = legacy
+        self.user.profile.save()
+        call_command('rebuild_avatars', '--delete-originals', stdout=StringIO())
+        self.user.profile.refresh_from_db()
+        self.assertTrue(avatars.is_content_addressed(self.user.profile.profile_picture.name))
+        self.assertFalse(default_storage.exists(legacy))
+
+    def test_oversized_upload_rejected(self):
+        """Test uploads above the size limit fail validation"""
+        upload = photo_upload()
+        upload.size = avatars.MAX_UPLOAD_BYTES + 1
+        form = ProfileEditForm(data={'name': 'Ram'}, files={'profile_picture': upload}, instance=self.user.profile)
+        self.assertFalse(form.is_valid())
+        self.assertIn('profile_picture', form.errors)
+
+
+class ServeMediaTest(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'avatars', 'ab'))
+        with open(os.path.join(self.media_root, 'avatars', 'ab', 'abc.jpg'), 'wb') as fh:
+            fh.write(b'0123456789')
+        with open(os.path.join(self.media_root, 'report.txt'), 'wb') as fh:
+            fh.write(b'hello')
+
+    def test_content_addressed_files_are_immutable(self):
+        """Test avatars are cached forever and other media briefly"""
+        response = self.client.get('/media/avatars/ab/abc.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response = self.client.get('/media/report.txt')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_conditional_get(self):
+        """Test a matching ETag gets 304 Not Modified"""
+        etag = self.client.get('/media/avatars/ab/abc.jpg')['ETag']
+        response = self.client.get('/media/avatars/ab/abc.jpg', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        """Test single byte ranges, suffix ranges and unsatisfiable ranges"""
+        response = self.client.get('/media/avatars/ab/abc.jpg', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get('/media/avatars/ab/abc.jpg', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get('/media/avatars/ab/abc.jpg', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_stale_if_range_sends_full_file(self):
+        """Test a range whose If-Range validator doesn't match gets the whole file"""
+        response = self.client.get('/media/avatars/ab/abc.jpg', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_path_traversal_rejected(self):
+        """Test paths outside MEDIA_ROOT are not served"""
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,84 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from unittest.mock import patch, Mock
+import json
+import os
+import tempfile
+
+from core import metrics
+
+
+class SpanTest(TestCase):
+    def test_span_records_into_request(self):
+        """Test spans are collected for the current request"""
+        token = metrics.start_request()
+        with metrics.span('classify'):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.upstream('openweather'):
+                raise ValueError('boom')
+        spans = metrics.end_request(token)
+        self.assertEqual([name for name, _ in spans], ['classify', 'openweather-error'])
+
+    def test_server_timing_header(self):
+        """Test Server-Timing header formatting"""
+        header = metrics.server_timing_header([('classify', 0.0123)], total=0.05)
+        self.assertEqual(header, 'classify;dur=12.3, total;dur=50.0')
+
+    def test_render_prometheus(self):
+        """Test histograms and counters are exposed in Prometheus text format"""
+        metrics.observe('agripath_stage_seconds', 0.2, stage='unit_test')
+        metrics.cache_event('unit_test', True)
+        text = metrics.render_prometheus()
+        self.assertIn('# TYPE agripath_stage_seconds histogram', text)
+        self.assertIn('agripath_stage_seconds_bucket{stage="unit_test",le="0.25"}', text)
+        self.assertIn('agripath_cache_requests_total{cache="unit_test",result="hit"}', text)
+
+    def test_merges_worker_snapshots(self):
+        """Test the scrape sums the snapshots of every worker"""
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = {'histograms': [], 'counters': [['agripath_cache_requests_total', [['cache', 'x'], ['result', 'hit']], 2]]}
+            for pid in (101, 102):
+                with open(os.path.join(directory, f'worker-{pid}.json'), 'w') as fh:
+                    json.dump(snapshot, fh)
+            with override_settings(METRICS_DIR=directory):
+                metrics.mark_process_dead(101)
+                text = metrics.render_prometheus()
+            self.assertIn('agripath_cache_requests_total{cache="x",result="hit"} 4', text)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'worker-101.json')))
+
+
+class MetricsEndpointTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='+919876543210')
+        self.user.profile.location = 'Delhi'
+        self.user.profile.save()
+
+    def test_metrics_endpoint(self):
+        """Test the metrics endpoint serves Prometheus text"""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        """Test the metrics endpoint checks the bearer token when configured"""
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @patch('core.views.MODEL')
+    @patch('core.views.get_weather_data')
+    def test_process_voice_server_timing(self, mock_weather, mock_model):
+        """Test a chat turn reports its stages in the Server-Timing header"""
+        self.client.force_login(self.user)
+        mock_weather.return_value = ({'city': 'Delhi', 'temperature': 25, 'description': 'clear sky',
+                                      'humidity': 60, 'wind_speed': 5}, None)
+        mock_model.generate_content.side_effect = [Mock(text='weather'), Mock(text='Delhi'), Mock(text='साफ मौसम')]
+
+        response = self.client.post('/process/', json.dumps({'text': 'Delhi ka mausam?'}),
+                                    content_type='application/json')
+        header = response['Server-Timing']
+        for stage in ('classify', 'city_extraction', 'weather', 'generate', 'gemini-ok', 'session_write', 'total'):
+            self.assertIn(f'{stage};dur=', header)
@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.shortcuts import render
+from django.test import TestCase
+from unittest.mock import patch
+import os
+import tempfile
+
+from core import metrics, pagecache
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_second_visit_is_a_hit(self):
+        """Test the page is rendered once and then served from the cache"""
+        with patch('home.views.render', wraps=render) as mock_render:
+            first = self.client.get('/about')
+            second = self.client.get('/about')
+        self.assertEqual(mock_render.call_count, 1)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_query_string_shares_the_entry(self):
+        """Test query strings don't add cache entries for the same page"""
+        with patch('core.pagecache.store', wraps=pagecache.store) as store:
+            first = self.client.get('/about?x=1')
+            second = self.client.get('/about?x=2')
+        self.assertEqual(store.call_count, 1)
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+
+    def test_conditional_get(self):
+        """Test a repeat visit with the ETag or Last-Modified gets 304 without a body"""
+        first = self.client.get('/Fertilizer')
+        response = self.client.get('/Fertilizer', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get('/Fertilizer', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_source_change_invalidates(self):
+        """Test changing a file the page depends on gives a fresh render"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as fh:
+            fh.write('{"v": 1}')
+        self.addCleanup(os.remove, fh.name)
+        spec = {'templates': ('about.html',), 'depends_on': (fh.name,)}
+        before, _ = pagecache.page_version(spec)
+        with open(fh.name, 'w') as data:
+            data.write('{"v": 2}')
+        os.utime(fh.name, (1, 1))
+        after, _ = pagecache.page_version(spec)
+        self.assertNotEqual(before, after)
+
+    def test_hits_are_counted(self):
+        """Test hits and misses are recorded for the metrics endpoint"""
+        self.client.get('/about')
+        self.client.get('/about')
+        text = metrics.render_prometheus()
+        self.assertIn('agripath_cache_requests_total{cache="page",result="hit"}', text)
+        self.assertIn('agripath_cache_requests_total{cache="page",result="miss"}', text)
+
+    def test_hit_skips_user_lookup(self):
+        """Test a cached page is served to signed-in users without loading the session"""
+        user = User.objects.create_user(username='+919876543210')
+        user.profile.location = 'Delhi'
+        user.profile.save()
+        self.client.get('/about')
+        self.client.force_login(user)
+        with self.assertNumQueries(0):
+            response = self.client.get('/about')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_other_pages_not_cached(self):
+        """Test only pages marked with cached_page are cached"""
+        response = self.client.get('/Policies')
+        self.assertFalse(response.has_header('X-Page-Cache'))
@@ -0,0 +1,155 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from unittest.mock import patch
+
+from accounts.forms import ProfileEditForm
+from benchmarks.stubs import StubHTTPResponse, stub_requests_get
+from core import admission, advisories, llm, places, weather_store
+from core.models import LocationAdvisory, Place, PlaceName, WeatherObservation
+
+PATNA = 'district:bihar:patna'
+
+
+def geocoder(*found):
+    """Fake requests.get answering the geocoding API with ``found``."""
+    return patch('core.places.requests.get', return_value=StubHTTPResponse(list(found)))
+
+
+class ResolveTest(TestCase):
+    def test_spellings_share_one_place(self):
+        """Test spellings of a known district resolve to one place without geocoding"""
+        with geocoder() as get:
+            spellings = ('Patna', 'patna ', 'Patna, Bihar', 'PATNA district')
+            keys = {places.resolve(spelling).key for spelling in spellings}
+        self.assertEqual(keys, {PATNA})
+        self.assertEqual(Place.objects.count(), 1)
+        get.assert_not_called()
+
+    def test_other_spellings_geocoded_once(self):
+        """Test a spelling the soil table lacks is geocoded on first sight only"""
+        with geocoder({'name': 'Patna', 'state': 'Bihar', 'lat': 25.6, 'lon': 85.1}) as get:
+            self.assertEqual(places.resolve('पटना').key, PATNA)
+            self.assertEqual(places.resolve(' पटना ').key, PATNA)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(places.key_of('पटना'), PATNA)
+
+    def test_place_outside_districts_keyed_by_coordinates(self):
+        """Test a geocoded place that isn't a district keeps its own coordinates"""
+        with geocoder({'name': 'Danapur', 'state': 'Bihar', 'lat': 25.634, 'lon': 85.046}):
+            place = places.resolve('Danapur')
+        self.assertEqual(place.key, '25.63,85.05')
+        self.assertEqual((place.district, place.state), ('', 'Bihar'))
+
+    def test_unresolved_spelling_keeps_its_name(self):
+        """Test a spelling nothing resolves is keyed by its normalized name, as before"""
+        with geocoder():
+            self.assertIsNone(places.resolve('Nowhere Village'))
+        self.assertIsNone(places.resolve('Nowhere Village', offline=True))
+        self.assertEqual(places.key_of('Nowhere  Village'), 'nowhere village')
+        self.assertFalse(PlaceName.objects.exists())
+
+
+class ProfilePlaceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='+919876543210')
+
+    def save_location(self, location):
+        form = ProfileEditForm(data={'name': 'Ram', 'location': location}, instance=self.user.profile)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_form_stores_place(self):
+        """Test saving the profile form resolves and stores the canonical place"""
+        self.assertEqual(self.save_location('patna, Bihar').place_id, PATNA)
+        with patch('core.places.resolve') as resolve:
+            self.save_location('patna, Bihar')
+        resolve.assert_not_called()
+        self.assertEqual(self.save_location('Nashik').place.district, 'Nashik')
+
+    def test_unplaced_profile_resolved_offline(self):
+        """Test an unplaced profile isn't geocoded on every save but by the resolve_places command"""
+        with geocoder():
+            self.assertIsNone(self.save_location('Danapur').place_id)
+        with patch('core.places.resolve') as resolve:
+            self.save_location('Danapur')
+        resolve.assert_not_called()
+
+        out = io.StringIO()
+        with geocoder({'name': 'Danapur', 'state': 'Bihar', 'lat': 25.63, 'lon': 85.05}):
+            call_command('resolve_places', stdout=out)
+        self.assertIn('1 profile(s) placed', out.getvalue())
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.place_id, '25.63,85.05')
+
+    def test_move_drops_stale_pages(self):
+        """Test the stale copies admission control keeps of the farmer's pages are dropped when they move"""
+        self.save_location('Patna')
+        request = RequestFactory().get('/home/Policies')
+        request.user = self.user
+        admission.remember(request, 'Policies', HttpResponse('Patna schemes'))
+        self.save_location('Patna, Bihar')  # same place
+        self.assertEqual(admission.shed(request, 'Policies', 'rate').content, b'Patna schemes')
+        self.save_location('Nashik')
+        self.assertEqual(admission.shed(request, 'Policies', 'rate').status_code, 429)
+
+    def test_spellings_share_materialized_advisory(self):
+        """Test farmers spelling one district differently get the same stored advisory"""
+        self.save_location('Patna')
+        neighbour = User.objects.create_user(username='+919876543211')
+        form = ProfileEditForm(data={'location': 'PATNA, bihar'}, instance=neighbour.profile)
+        form.is_valid()
+        form.save()
+        self.assertEqual(advisories.materialize()['materialized'], 1)
+        LocationAdvisory.objects.update(advisory='साझा योजना')
+
+        self.client.force_login(neighbour)
+        with patch('home.views.get_current_weather_data') as weather:
+            response = self.client.get('/home/CropAdvisory')
+        self.assertContains(response, 'साझा योजना')
+        weather.assert_not_called()
+
+    def test_weather_fetched_by_coordinates(self):
+        """Test a resolved place's weather is fetched by coordinates and stored under its key"""
+        self.user.profile.location = 'पटना'
+        self.user.profile.place = Place.objects.create(key=PATNA, name='Patna', district='Patna', state='Bihar',
+                                                       lat=25.59, lon=85.14)
+        self.user.profile.save()
+        self.client.force_login(self.user)
+        with patch('home.views.OPENWEATHER_API_KEY', 'test_key'), \
+                patch('home.views.requests.get', side_effect=stub_requests_get) as get:
+            self.assertEqual(self.client.get('/home/Weather').status_code, 200)
+        current = get.call_args_list[0].kwargs['params']
+        self.assertEqual((current['lat'], current['lon']), (25.59, 85.14))
+        self.assertNotIn('q', current)
+        self.assertTrue(WeatherObservation.objects.filter(location=PATNA).exists())
+
+
+class PlaceChangedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.place = Place.objects.create(key='25.63,85.05', name='Danapur', state='Bihar', lat=25.63, lon=85.05)
+        weather_store.record(self.place.key, WeatherObservation.CURRENT,
+                             [{'observed_at': timezone.now(), 'lat': 25.63, 'lon': 85.05}])
+        llm._remember(f'policies:{self.place.key}', '[]')
+
+    def test_renaming_keeps_entries(self):
+        """Test a change that doesn't move the place keeps what is stored under its key"""
+        self.place.name = 'Danapur Cantonment'
+        self.place.save()
+        self.assertTrue(WeatherObservation.objects.filter(location=self.place.key).exists())
+        self.assertEqual(llm.cached_answer(f'policies:{self.place.key}'), '[]')
+
+    def test_moving_drops_entries(self):
+        """Test corrected coordinates drop the weather and answers stored under the key"""
+        place = Place.objects.get(key=self.place.key)  # loaded fresh, as an edit would
+        place.lat = 25.64
+        place.save()
+        self.assertFalse(WeatherObservation.objects.filter(location=place.key).exists())
+        self.assertIsNone(llm.cached_answer(f'policies:{place.key}'))
@@ -0,0 +1,114 @@
+from django.test import TestCase, Client, override_settings
+from django.core.management import call_command
+from django.utils import timezone
+from unittest.mock import patch, Mock
+from datetime import timedelta
+import io
+
+from accounts import sms
+from accounts.models import OutboundSMS
+from core import metrics
+
+TWILIO = {'TWILIO_ACCOUNT_SID': 'AC123', 'TWILIO_AUTH_TOKEN': 'token', 'TWILIO_PHONE_NUMBER': '+15550000000'}
+
+
+class TwilioError(Exception):
+    def __init__(self, status):
+        super().__init__(f'HTTP {status}')
+        self.status = status
+
+
+def twilio_client(side_effect=None):
+    client = Mock()
+    client.messages.create.return_value = Mock(sid='SM123')
+    client.messages.create.side_effect = side_effect
+    return client
+
+
+@override_settings(**TWILIO)
+class OutboxTest(TestCase):
+    @patch('accounts.views.get_twilio_client')
+    def test_request_only_enqueues(self, mock_twilio):
+        """Test requesting an OTP queues the SMS without touching Twilio"""
+        response = Client().post('/accounts/login/', {'phone_number': '+919876543210'})
+        self.assertEqual(response.status_code, 302)
+        mock_twilio.assert_not_called()
+        message = OutboundSMS.objects.get()
+        self.assertEqual(message.to, '+919876543210')
+        self.assertIn(str(Client().session.get('otp', '')), message.body)
+        self.assertEqual(sms.queue_depth(), 1)
+
+    def test_sent_with_one_client(self):
+        """Test a batch is sent with the given client and the codes aren't kept"""
+        for i in range(3):
+            sms.enqueue(f'+91987654321{i}', f'code {i}')
+        client = twilio_client()
+        self.assertEqual(sms.send_due(client), {'sent': 3})
+        self.assertEqual(client.messages.create.call_count, 3)
+        client.messages.create.assert_any_call(body='code 0', from_='+15550000000', to='+919876543210')
+        message = OutboundSMS.objects.first()
+        self.assertEqual((message.status, message.provider_id, message.body), (OutboundSMS.SENT, 'SM123', ''))
+        self.assertEqual(sms.send_due(client), {})
+
+    def test_retried_with_backoff(self):
+        """Test a failed send waits out its backoff and fails for good after MAX_ATTEMPTS"""
+        sms.enqueue('+919876543210', 'code')
+        client = twilio_client(side_effect=ConnectionError('timed out'))
+        self.assertEqual(sms.send_due(client), {'retry': 1})
+        message = OutboundSMS.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertEqual(sms.send_due(client), {})  # not due yet
+
+        self.assertEqual(sms.backoff(2), 2 * sms.backoff(1))
+        self.assertEqual(sms.backoff(50), sms.RETRY_MAX)
+        for _ in range(sms.MAX_ATTEMPTS - 1):
+            OutboundSMS.objects.update(next_attempt_at=timezone.now())
+            sms.send_due(client)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundSMS.FAILED, sms.MAX_ATTEMPTS))
+        self.assertIn('timed out', message.last_error)
+
+    def test_permanent_error_not_retried(self):
+        """Test an error Twilio will repeat (a bad number) fails at once, a 429 is retried"""
+        sms.enqueue('+919876543210', 'code')
+        sms.enqueue('+919876543211', 'code')
+        self.assertEqual(sms.send_due(twilio_client(side_effect=TwilioError(400)), limit=1), {'failed': 1})
+        self.assertEqual(sms.send_due(twilio_client(side_effect=TwilioError(429))), {'retry': 1})
+
+    def test_stale_otp_dropped(self):
+        """Test an OTP queued longer than MAX_AGE ago is not sent late"""
+        sms.enqueue('+919876543210', 'code', now=timezone.now() - sms.MAX_AGE - timedelta(minutes=1))
+        client = twilio_client()
+        self.assertEqual(sms.send_due(client), {'expired': 1})
+        client.messages.create.assert_not_called()
+
+    def test_claim_is_leased(self):
+        """Test a claimed message isn't claimed again until its lease runs out"""
+        sms.enqueue('+919876543210', 'code')
+        self.assertEqual(len(sms.claim()), 1)
+        self.assertEqual(sms.claim(), [])
+        self.assertEqual(len(sms.claim(now=timezone.now() + sms.LEASE + timedelta(seconds=1))), 1)
+
+    def test_purge_keeps_pending(self):
+        """Test finished messages are deleted after RETENTION and pending ones kept"""
+        old = timezone.now() - sms.RETENTION - timedelta(hours=1)
+        sms.enqueue('+919876543210', 'code', now=old)
+        sms.enqueue('+919876543211', 'code', now=old)
+        OutboundSMS.objects.filter(to='+919876543210').update(status=OutboundSMS.SENT)
+        self.assertEqual(sms.purge(), 1)
+        self.assertEqual(OutboundSMS.objects.get().to, '+919876543211')
+
+    @patch('accounts.management.commands.sms_worker.get_twilio_client')
+    def test_worker_command(self, mock_twilio):
+        """Test the worker drains the outbox and the metrics report depth and latency"""
+        mock_twilio.return_value = twilio_client()
+        sms.enqueue('+919876543210', 'code')
+        self.assertIn('agripath_sms_queue_depth 1', metrics.render_prometheus())
+        out = io.StringIO()
+        call_command('sms_worker', '--once', stdout=out)
+        self.assertIn('1 sent', out.getvalue())
+        text = metrics.render_prometheus()
+        self.assertIn('agripath_sms_queue_depth 0', text)
+        self.assertIn('agripath_sms_delivery_seconds_count', text)
+        self.assertIn('agripath_upstream_seconds_count{status="ok",upstream="twilio"}', text)
@@ -0,0 +1,62 @@
+from django.test import TestCase
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from contextlib import closing
+from unittest import skipUnless
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from mypage import sqlite_profile
+
+
+def journal_mode(path):
+    with closing(sqlite3.connect(path)) as database:
+        return database.execute('PRAGMA journal_mode').fetchone()[0]
+
+
+class SQLiteProfileTest(TestCase):
+    def test_tune_sqlite_only(self):
+        """Test the profile sets the pragmas, IMMEDIATE transactions and persistent connections on SQLite only"""
+        tuned = sqlite_profile.tune({'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'}, busy_timeout=7)
+        self.assertEqual(tuned['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(tuned['OPTIONS']['timeout'], 7)
+        self.assertIn('PRAGMA synchronous=NORMAL;', tuned['OPTIONS']['init_command'])
+        self.assertNotIn('journal_mode', tuned['OPTIONS']['init_command'])  # set once, by a migration
+        self.assertEqual(tuned['CONN_MAX_AGE'], sqlite_profile.DEFAULT_CONN_MAX_AGE)
+
+        postgres = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'agripath'}
+        self.assertIs(sqlite_profile.tune(postgres), postgres)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_pragmas_applied_on_connect(self):
+        """Test every new connection runs the profile's pragmas"""
+        if 'init_command' not in connection.settings_dict['OPTIONS']:
+            self.skipTest('SQLITE_PROFILE is not tuned')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], sqlite_profile.PRAGMAS['cache_size'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_wal_set_once_in_the_file(self):
+        """Test use_wal switches a database file to WAL and connecting alone leaves the file as it is"""
+        directory = tempfile.mkdtemp(prefix='agripath-test-sqlite-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'db.sqlite3')
+        settings_dict = sqlite_profile.tune({**connection.settings_dict, 'NAME': path})
+
+        database = DatabaseWrapper(settings_dict)
+        with database.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (id INTEGER)')
+        database.close()
+        self.assertEqual(journal_mode(path), 'delete')
+
+        database = DatabaseWrapper(settings_dict)
+        sqlite_profile.use_wal(database)
+        database.close()
+        self.assertEqual(journal_mode(path), 'wal')
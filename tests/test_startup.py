@@ -0,0 +1,42 @@
+from django.test import TestCase
+from unittest.mock import patch
+
+from core import llm, startup
+
+IMPORTTIME_SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _io
+import time:      2000 |       2500 |   pandas.core
+import time:      5000 |       7500 | pandas
+import time:       300 |        300 | json
+"""
+
+
+class StartupProfileTest(TestCase):
+    def test_boot_imports_no_heavy_modules(self):
+        """Test booting the app and serving a page imports none of the heavy SDKs"""
+        report = startup.profile(paths=['/home/about'])
+        self.assertEqual(report['heavy_at_boot'], [])
+        self.assertEqual(report['heavy_after_requests'], [])
+        self.assertEqual(report['requests'][0]['status'], 200)
+        self.assertTrue(report['slowest_imports'])
+
+    def test_importtime_parsed(self):
+        """Test -X importtime output is summarized per top-level import and package"""
+        rows = startup.parse_importtime(IMPORTTIME_SAMPLE)
+        self.assertEqual(rows[2], ('pandas', 5000, 7500, 0))
+        summary = startup.import_summary(rows)
+        self.assertEqual(summary['slowest_imports'][0], {'module': 'pandas', 'cumulative_ms': 7.5})
+        self.assertEqual(summary['packages'][0], {'package': 'pandas', 'ms': 7.0})
+
+
+class LazyModelTest(TestCase):
+    def test_sdk_configured_on_first_use(self):
+        """Test a lazy model configures the SDK only when it is first used"""
+        with patch.dict(llm._MODELS, clear=True), patch('core.llm.configure_genai') as configure:
+            model = llm.LazyModel('test-model')
+            configure.assert_not_called()
+            model.generate_content('hello')
+            model.generate_content('again')
+        configure.assert_called_once()
+        configure.return_value.GenerativeModel.assert_called_once_with('test-model')
+        self.assertEqual(configure.return_value.GenerativeModel.return_value.generate_content.call_count, 2)
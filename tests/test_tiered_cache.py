@@ -0,0 +1,132 @@
+from django.test import SimpleTestCase
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from core import metrics
+from core.tiered_cache import SQLiteCache, TwoTierCache, namespace
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='agripath-test-cache-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+
+    def worker(self, **options):
+        """A TwoTierCache on the shared file, as one gunicorn worker would open it."""
+        cache = TwoTierCache(self.location, {'TIMEOUT': 300, 'OPTIONS': options})
+        self.addCleanup(cache.close)
+        return cache
+
+
+class TwoTierCacheTest(TieredCacheTestCase):
+    def test_l1_hit_skips_shared_store(self):
+        """Test a value this worker read recently is served without touching L2"""
+        cache = self.worker()
+        cache.set('page:/Fertilizer', b'<html>')
+        with patch.object(cache.shared, 'get', side_effect=AssertionError('L2 read')):
+            self.assertEqual(cache.get('page:/Fertilizer'), b'<html>')
+        self.assertEqual(cache.stats()['page']['l1_hit'], 1)
+
+    def test_workers_share_entries(self):
+        """Test a value set by one worker is a hit in another"""
+        first, second = self.worker(), self.worker()
+        first.set('llm:answer', 'धान की रोपाई')
+        self.assertEqual(second.get('llm:answer'), 'धान की रोपाई')
+        self.assertEqual(second.get('llm:answer'), 'धान की रोपाई')
+        self.assertEqual(second.stats()['llm'], {'l1_hit': 1, 'l2_hit': 1, 'miss': 0, 'evictions': 0})
+
+    def test_l1_timeout_bounds_staleness(self):
+        """Test another worker's change is seen once L1_TIMEOUT has passed"""
+        first, second = self.worker(L1_TIMEOUT=0.05), self.worker(L1_TIMEOUT=0.05)
+        first.set('page:/Policies', 'old')
+        self.assertEqual(second.get('page:/Policies'), 'old')
+        first.set('page:/Policies', 'new')
+        self.assertEqual(second.get('page:/Policies'), 'old')
+        time.sleep(0.1)
+        self.assertEqual(second.get('page:/Policies'), 'new')
+
+    def test_l1_off_reads_shared_store(self):
+        """Test L1_TIMEOUT 0 sends every read to L2, as the admission cache needs"""
+        first, second = self.worker(L1_TIMEOUT=0), self.worker(L1_TIMEOUT=0)
+        first.set('bucket:user:1', 5)
+        self.assertEqual(second.get('bucket:user:1'), 5)
+        first.set('bucket:user:1', 4)
+        self.assertEqual(second.get('bucket:user:1'), 4)
+        self.assertEqual(second.stats()['bucket']['l1_hit'], 0)
+
+    def test_versioned_keys(self):
+        """Test versions are separate entries and incr_version moves a value across workers"""
+        first, second = self.worker(), self.worker()
+        first.set('llm:policies', 'v1 answer')
+        first.set('llm:policies', 'v2 answer', version=2)
+        self.assertEqual(second.get('llm:policies'), 'v1 answer')
+        self.assertEqual(second.get('llm:policies', version=2), 'v2 answer')
+        self.assertEqual(first.incr_version('llm:policies', version=2), 3)
+        self.assertIsNone(first.get('llm:policies', version=2))
+        self.assertEqual(second.get('llm:policies', version=3), 'v2 answer')
+
+    def test_lru_evictions_counted_per_namespace(self):
+        """Test L1 keeps the most recently used entries and counts evictions by namespace"""
+        cache = self.worker(L1_MAX_ENTRIES=2)
+        before = dict(((name, tuple(labels)), value) for name, labels, value in metrics.REGISTRY.snapshot()['counters'])
+        cache.set('page:a', 1)
+        cache.set('page:b', 2)
+        cache.get('page:a')
+        cache.set('llm:c', 3)  # evicts page:b, the least recently used
+        with patch.object(cache.shared, 'get', side_effect=AssertionError('L2 read')):
+            self.assertEqual(cache.get('page:a'), 1)
+            self.assertEqual(cache.get('llm:c'), 3)
+        self.assertEqual(cache.stats()['page']['evictions'], 1)
+        self.assertEqual(cache.stats()['llm']['evictions'], 0)
+        key = ('agripath_cache_evictions_total', (('namespace', 'page'), ('tier', 'l1')))
+        after = dict(((name, tuple(labels)), value) for name, labels, value in metrics.REGISTRY.snapshot()['counters'])
+        self.assertEqual(after[key] - before.get(key, 0), 1)
+        self.assertEqual(cache.get('page:b'), 2)  # still in L2
+        self.assertEqual(cache.stats()['page']['l2_hit'], 1)
+
+    def test_cache_api(self):
+        """Test add, incr, expiry and the *_many calls behave as Django's caches do"""
+        first, second = self.worker(), self.worker()
+        self.assertTrue(first.add('rate:1', 1))
+        self.assertFalse(second.add('rate:1', 5))
+        self.assertEqual(first.incr('rate:1', 2), 3)
+        self.assertEqual(first.get('rate:1'), 3)
+        self.assertEqual(second.get('rate:1'), 3)
+        with self.assertRaises(ValueError):
+            first.incr('rate:missing')
+
+        first.set('page:short', 'x', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(second.get('page:short'))
+        self.assertIsNone(first.get('page:short'))
+
+        first.set_many({'page:a': 1, 'page:b': 2})
+        self.assertEqual(second.get_many(['page:a', 'page:b', 'page:c']), {'page:a': 1, 'page:b': 2})
+        second.delete_many(['page:a'])
+        self.assertFalse(second.has_key('page:a'))
+        first.clear()
+        self.assertIsNone(first.get('page:b'))
+
+
+class SQLiteCacheTest(TieredCacheTestCase):
+    def test_culls_over_max_entries(self):
+        """Test the shared store culls entries soonest to expire once over MAX_ENTRIES"""
+        cache = SQLiteCache(self.location, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        self.addCleanup(cache.close)
+        for n in range(15):
+            cache.set(f'page:{n}', n, timeout=100 + n)
+        cache.cull()
+        self.assertLessEqual(sum(cache.has_key(f'page:{n}') for n in range(15)), 10)
+        self.assertTrue(cache.has_key('page:14'))
+        self.assertFalse(cache.has_key('page:0'))
+        self.assertGreaterEqual(cache.culled['page'], 5)
+
+    def test_namespace(self):
+        """Test metrics are labelled with the key's first part after prefix and version"""
+        self.assertEqual(namespace(':1:llm:policies:district:bihar:patna'), 'llm')
+        self.assertEqual(namespace('app:2:page:/Fertilizer'), 'page')
+        self.assertEqual(namespace(':1:singleton'), 'other')
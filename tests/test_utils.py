@@ -3,6 +3,9 @@ from unittest.mock import patch, Mock
 import requests
 from core.views import generate_gemini_response, get_weather_data
 from home.views import get_current_weather_data, get_alerts_and_forecast
+from core import climate, soil
+from core.crop_model import build_model_input, get_soil_data_by_location
+import numpy as np
 
 
 class GeminiUtilsTest(TestCase):
@@ -138,4 +141,64 @@ class HomeWeatherUtilsTest(TestCase):
             
         self.assertIsNone(error)
         self.assertEqual(len(result['forecast']), 1)
-        self.assertEqual(result['forecast'][0]['max_temp'], 25)
\ No newline at end of file
+        self.assertEqual(result['forecast'][0]['max_temp'], 25)
+
+
+class SoilLookupTest(TestCase):
+    def test_same_location_same_soil(self):
+        """Test soil data is deterministic per location"""
+        self.assertEqual(get_soil_data_by_location('Patna'), get_soil_data_by_location('Patna'))
+
+    def test_district_names_and_aliases(self):
+        """Test districts are found by name, old name or state qualifier"""
+        self.assertEqual(get_soil_data_by_location('  patna ')['district'], 'Patna')
+        self.assertEqual(get_soil_data_by_location('Allahabad')['district'], 'Prayagraj')
+        self.assertEqual(get_soil_data_by_location('Aurangabad, Maharashtra')['state'], 'Maharashtra')
+        self.assertEqual(get_soil_data_by_location('Aurangabad, Bihar')['state'], 'Bihar')
+
+    def test_unknown_place_uses_coordinates(self):
+        """Test places not in the table resolve to the nearest district centroid"""
+        self.assertEqual(get_soil_data_by_location('Danapur', lat=25.63, lon=85.05)['district'], 'Patna')
+
+    def test_unknown_place_without_coordinates(self):
+        """Test a location that matches nothing gets the typical soil, not random values"""
+        data = get_soil_data_by_location('Atlantis')
+        self.assertIsNone(data['district'])
+        self.assertEqual(data, get_soil_data_by_location('Atlantis'))
+        for name in soil.PROPERTIES:
+            self.assertIn(name, data)
+
+
+class ClimateNormalsTest(TestCase):
+    def test_grid_reproduces_station(self):
+        """Test the interpolated grid matches a station's normals in its own cell"""
+        coords = np.array([[25.5, 85.0], [20.0, 75.0]])
+        values = np.zeros((2, 12, 3))
+        values[0, :, 0], values[1, :, 0] = 30.0, 20.0
+        values[0, 6, 2] = 300.0  # July rain at the first station
+        grid = climate.build_grid(coords, values)
+        i, j = climate.cell(25.5, 85.0)
+        self.assertAlmostEqual(float(grid[i, j, 0, 0]), 30.0, places=3)
+        # July is a kharif month; the season total is the sum of June-September
+        self.assertAlmostEqual(float(grid[i, j, 6, climate.VARIABLES.index('season_rainfall')]), 300.0, places=1)
+
+    def test_bundled_normals(self):
+        """Test the bundled grid gives a wet July and a dry November in Patna"""
+        july = climate.normals(25.6, 85.1, 7)
+        november = climate.normals(25.6, 85.1, 11)
+        self.assertEqual(july['season'], 'kharif')
+        self.assertGreater(july['rainfall'], 10 * november['rainfall'])
+        self.assertGreater(july['annual_rainfall'], 800)
+
+    def test_live_reading_adjusts_normals(self):
+        """Test a live reading is blended into the normals, not substituted for them"""
+        normal = climate.model_weather(25.6, 85.1, 7)
+        adjusted = climate.model_weather(25.6, 85.1, 7, live={'temperature': normal['temperature'] + 10})
+        self.assertAlmostEqual(adjusted['temperature'], normal['temperature'] + 10 * climate.LIVE_WEIGHT, places=1)
+        self.assertEqual(adjusted['rainfall'], normal['rainfall'])
+
+    def test_model_input_is_local(self):
+        """Test the model input for a known district needs no weather reading"""
+        model_input = build_model_input(get_soil_data_by_location('Patna'), 7)
+        self.assertEqual(set(model_input), {'N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall'})
+        self.assertEqual(model_input, build_model_input(get_soil_data_by_location('Patna'), 7))
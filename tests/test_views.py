@@ -4,6 +4,8 @@ from django.contrib.auth.models import User
 from unittest.mock import patch, Mock
 import json
 
+from core import views
+
 
 class CoreViewsTest(TestCase):
     def setUp(self):
@@ -77,6 +79,33 @@ class CoreViewsTest(TestCase):
         response_data = json.loads(response.content)
         self.assertIn('response', response_data)
 
+    @patch('core.views.llm.generate_text', side_effect=['general_conversation', 'जी, बताइए।'])
+    def test_persona_is_system_instruction(self, mock_generate):
+        """Test the persona is sent as the system instruction and old history is trimmed"""
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['chat_history'] = [{'role': role, 'parts': [f'turn {i}']}
+                                   for i in range(30) for role in ('user', 'model')]
+        session.save()
+        self.client.post('/process/', json.dumps({'text': 'नमस्ते'}), content_type='application/json')
+
+        (_, contents), kwargs = mock_generate.call_args
+        self.assertEqual(kwargs['system_instruction'], views.PERSONA_INSTRUCTION)
+        self.assertLessEqual(len(contents), views.CHAT_CONTEXT_MESSAGES)
+        self.assertEqual(contents[0]['role'], 'user')
+        self.assertEqual(contents[-1]['parts'], ['नमस्ते'])
+        self.assertNotIn(views.PERSONA_INSTRUCTION, json.dumps(contents, ensure_ascii=False))
+        self.assertEqual(len(self.client.session['chat_history']), 62)
+
+    def test_fallback_key_ignores_history(self):
+        """Test a conversation's fallback key is its handler and last user turn, not the whole history"""
+        earlier = [{'role': 'user', 'parts': ['गेहूं']}, {'role': 'model', 'parts': ['जी']}]
+        last = {'role': 'user', 'parts': ['खाद कब डालें?']}
+        key = views._prompt_cache_key(earlier + [last], views.CROP_INSTRUCTION)
+        self.assertEqual(views._prompt_cache_key([last], views.CROP_INSTRUCTION), key)
+        self.assertNotEqual(views._prompt_cache_key([last], views.PERSONA_INSTRUCTION), key)
+        self.assertNotIn('गेहूं', key)
+
 
 class AccountsViewsTest(TestCase):
     def setUp(self):
@@ -155,6 +184,28 @@ class HomeViewsTest(TestCase):
         response = self.client.get('/home/Weather')
         self.assertEqual(response.status_code, 200)
         
+    @patch('home.views.POLICY_MODEL', None)
+    @patch('home.views.get_current_weather_data')
+    def test_crop_advisory_known_district_skips_weather(self, mock_weather):
+        """Test crop advisory for a known district is built from local soil and climate data"""
+        self.client.force_login(self.user)
+        response = self.client.get('/home/CropAdvisory')
+        self.assertEqual(response.status_code, 200)
+        mock_weather.assert_not_called()
+        self.assertTrue(response.context['suitable_crops'])
+
+    @patch('home.views.POLICY_MODEL', None)
+    @patch('home.views.get_current_weather_data')
+    def test_crop_advisory_unknown_place_geocoded(self, mock_weather):
+        """Test places outside the soil table are located through the weather API"""
+        self.user.profile.location = 'Danapur'
+        self.user.profile.save()
+        mock_weather.return_value = ({'lat': 25.63, 'lon': 85.05, 'temperature': 31, 'humidity': 70}, None)
+        self.client.force_login(self.user)
+        response = self.client.get('/home/CropAdvisory')
+        self.assertEqual(response.status_code, 200)
+        mock_weather.assert_called_once_with('Danapur')
+
     def test_policies_requires_login(self):
         """Test policies page requires authentication"""
         response = self.client.get('/home/Policies')
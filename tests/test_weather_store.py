@@ -0,0 +1,128 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from unittest.mock import patch, Mock
+from datetime import timedelta
+
+from benchmarks.stubs import stub_requests_get
+from core import places, weather_store
+from core.models import WeatherDaily, WeatherObservation
+from home.views import get_alerts_and_forecast, get_current_weather_data
+
+
+def current_response(temp=25, dt=1700000000):
+    return {
+        'dt': dt, 'name': 'Delhi', 'coord': {'lat': 28.61, 'lon': 77.21},
+        'main': {'temp': temp, 'humidity': 60, 'pressure': 1013},
+        'weather': [{'description': 'clear sky', 'icon': '01d'}],
+        'wind': {'speed': 5}, 'visibility': 10000, 'rain': {'1h': 0.5},
+    }
+
+
+def mock_get(payload):
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = payload
+    return patch('requests.get', return_value=response)
+
+
+class WeatherStoreReadTest(TestCase):
+    def test_current_reading_reused(self):
+        """Test a fresh stored reading is served without another upstream call"""
+        with patch('home.views.OPENWEATHER_API_KEY', 'test_key'), mock_get(current_response()) as get:
+            first, _ = get_current_weather_data('Delhi')
+            second, _ = get_current_weather_data(' delhi ')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(WeatherObservation.objects.count(), 1)
+
+    def test_stale_reading_refetched(self):
+        """Test readings older than the freshness window are fetched again"""
+        with patch('home.views.OPENWEATHER_API_KEY', 'test_key'), mock_get(current_response()) as get:
+            get_current_weather_data('Delhi')
+            WeatherObservation.objects.update(fetched_at=timezone.now() - 2 * weather_store.CURRENT_MAX_AGE)
+            get_current_weather_data('Delhi')
+        self.assertEqual(get.call_count, 2)
+
+    def test_forecast_steps_stored_in_one_batch(self):
+        """Test every 3-hour step is stored and a recent forecast is reused"""
+        start = 1700006400  # 2023-11-15 00:00 UTC
+        steps = [{'dt': start + 10800 * i, 'main': {'temp': 20 + i, 'temp_min': 18, 'temp_max': 22 + i,
+                                                         'humidity': 50},
+                  'weather': [{'description': 'clear sky', 'icon': '01d'}], 'wind': {'speed': 3}}
+                 for i in range(16)]  # two days of 3-hour steps
+        with patch('home.views.OPENWEATHER_API_KEY', 'test_key'), mock_get({'list': steps}) as get:
+            with self.assertNumQueries(2):  # the store lookup and one bulk insert
+                first, _ = get_alerts_and_forecast(28.61, 77.21, location='Delhi')
+            second, _ = get_alerts_and_forecast(28.61, 77.21, location='Delhi')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(WeatherObservation.objects.filter(kind=WeatherObservation.FORECAST).count(), 16)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first['forecast']), 2)  # the two noon steps
+
+
+class WeatherStoreCompactionTest(TestCase):
+    def add_reading(self, when, temp, rain=0.0, location='delhi'):
+        weather_store.record(location, WeatherObservation.CURRENT, [{
+            'observed_at': when, 'temperature': temp, 'humidity': 60, 'rainfall': rain,
+        }], fetched_at=when)
+
+    def test_old_readings_downsampled(self):
+        """Test readings past the raw retention become one daily aggregate"""
+        now = timezone.now()
+        day = (now - timedelta(days=10)).replace(hour=6, minute=0, second=0, microsecond=0)
+        self.add_reading(day, 20, rain=1.0)
+        self.add_reading(day + timedelta(hours=6), 30, rain=2.0)
+        self.add_reading(now - timedelta(hours=1), 25)
+
+        result = weather_store.compact(now)
+        self.assertEqual(result['raw_deleted'], 2)
+        daily = WeatherDaily.objects.get()
+        self.assertEqual((daily.samples, daily.temp_mean, daily.temp_min, daily.temp_max, daily.rainfall),
+                         (2, 25.0, 20.0, 30.0, 3.0))
+        self.assertEqual(WeatherObservation.objects.count(), 1)
+
+    def test_history_combines_daily_and_raw(self):
+        """Test history returns compacted days and recent raw days"""
+        now = timezone.now()
+        self.add_reading(now - timedelta(days=10), 20)
+        self.add_reading(now - timedelta(hours=1), 26)
+        weather_store.compact(now)
+        history = weather_store.history('delhi', days=30)
+        self.assertEqual([row['temp_mean'] for row in history], [20.0, 26.0])
+
+    def test_rainfall_counts_each_hour_once(self):
+        """Test several readings of one hour's rolling rainfall add up to that hour's total once"""
+        hour = (timezone.now() - timedelta(days=1)).replace(hour=6, minute=0, second=0, microsecond=0)
+        for minutes, rain in ((5, 1.0), (20, 1.2), (50, 1.1)):
+            self.add_reading(hour + timedelta(minutes=minutes), 25, rain=rain)
+        self.add_reading(hour + timedelta(hours=1, minutes=10), 25, rain=0.5)
+
+        self.assertAlmostEqual(weather_store.history('delhi')[0]['rainfall'], 1.7)
+        weather_store.compact(timezone.now() + timedelta(days=10))
+        self.assertAlmostEqual(WeatherDaily.objects.get().rainfall, 1.7)
+
+    def test_weather_page_shows_recent_rainfall(self):
+        """Test the weather page shows the last month's rainfall from the stored readings"""
+        user = User.objects.create_user(username='+919876543210')
+        user.profile.location = 'Delhi'
+        user.profile.save()
+        key = places.key_of('Delhi')
+        now = timezone.now()
+        for days, rain in ((3, 12.0), (5, 0.4)):
+            self.add_reading(now - timedelta(days=days), 25, rain=rain, location=key)
+
+        self.client.force_login(user)
+        with patch('home.views.OPENWEATHER_API_KEY', 'test_key'), \
+                patch('home.views.requests.get', side_effect=stub_requests_get):
+            response = self.client.get('/home/Weather')
+        self.assertEqual(response.context['rainfall'], {'days': 3, 'rainfall': 12.4, 'rainy_days': 1})
+        self.assertContains(response, '12.4 mm')
+
+    def test_retention(self):
+        """Test expired forecasts and aggregates are deleted"""
+        now = timezone.now()
+        WeatherDaily.objects.create(location='delhi', date=(now - timedelta(days=800)).date(), samples=1)
+        weather_store.record('delhi', WeatherObservation.FORECAST, [{'observed_at': now - timedelta(days=2)}])
+        result = weather_store.compact(now)
+        self.assertEqual((result['daily_deleted'], result['forecasts_deleted']), (1, 1))